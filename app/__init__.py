@@ -5,7 +5,7 @@ from flask import Flask
 from flask_login import LoginManager
 from flask_talisman import Talisman
 from flask_wtf.csrf import CSRFProtect
-from flask_migrate import Migrate
+from flask_migrate import Migrate, stamp, upgrade
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from app.config import config_by_name
@@ -17,9 +17,14 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 csrf = CSRFProtect()
 talisman = Talisman()
-migrate = Migrate()
+migrate = Migrate(render_as_batch=True)  # SQLite can only alter tables by copying them
 scheduler = BackgroundScheduler()
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+# Revision of the schema db.create_all() made before migrations were added
+BASELINE_REVISION = 'b840a8172c2c'
+
 @login_manager.user_loader
 def load_user(user_id):
     return Player.query.get(user_id)
@@ -37,7 +42,7 @@ def create_app(config_name='default'):
     if config_name == 'production':
         talisman.init_app(app, force_https=False, content_security_policy=None)
     
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR)
     
     # Ensure upload and backup directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -75,8 +80,8 @@ def create_app(config_name='default'):
     
     # Initialize the scheduler
     with app.app_context():
-        # Create database tables if they don't exist
-        db.create_all()
+        # Create or migrate the database tables
+        upgrade_database()
         
         # Initialize game state if it doesn't exist
         if not GameState.query.first():
@@ -89,8 +94,17 @@ def create_app(config_name='default'):
             db.session.commit()
         
         # Start the scheduler
-        from app.services.game_service import schedule_round_transitions
+        from app.services.game_service import schedule_round_transitions, schedule_kill_expiry
         schedule_round_transitions(app)
+        schedule_kill_expiry(app)
+
+        # Pick up kill videos whose processing was interrupted
+        from app.services.submission_service import resume_kill_processing
+        resume_kill_processing(app)
+
+        # Send whatever was left in the outbox
+        from app.services.outbox_service import resume_outbox
+        resume_outbox(app)
         
         if not scheduler.running:
             scheduler.start()
@@ -104,5 +118,61 @@ def create_app(config_name='default'):
             minute=0, 
             args=[app]
         )
+
+        # Clear out resumable uploads that were never finished
+        from app.services.upload_service import purge_stale_uploads
+        scheduler.add_job(
+            purge_stale_uploads,
+            'interval',
+            hours=1,
+            args=[app]
+        )
+
+        # Keep the outbox table from growing without end
+        from app.services.outbox_service import purge_sent_emails
+        scheduler.add_job(
+            purge_sent_emails,
+            'cron',
+            hour=4,
+            minute=0,
+            args=[app]
+        )
+
+        # Events stay after their digest only to stop them being held twice
+        from app.services.notification_service import purge_sent_notifications
+        scheduler.add_job(
+            purge_sent_notifications,
+            'cron',
+            hour=4,
+            minute=15,
+            args=[app]
+        )
+
+        # Send the digests of players who asked for grouped notifications
+        from app.services.email_service import send_notification_digests
+        scheduler.add_job(
+            send_notification_digests,
+            'interval',
+            minutes=1,
+            args=[app]
+        )
     
     return app
+
+def upgrade_database():
+    """
+    Bring the database schema up to date.
+
+    An empty database gets every table straight from the models. One made by
+    db.create_all() before migrations were added is taken to be at the
+    baseline revision and migrated from there.
+    """
+    tables = db.inspect(db.engine).get_table_names()
+    if not tables:
+        db.create_all()
+        stamp(revision='head')
+        return
+
+    if 'alembic_version' not in tables:
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
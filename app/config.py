@@ -4,6 +4,8 @@ from datetime import timedelta
 class Config:
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'default-secret-key-for-development'
+    # Site root for links in emails sent outside a request, such as https://assassin.example.com/
+    BASE_URL = os.environ.get('BASE_URL')
     
     # SQLAlchemy configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///senior_assassin.db'
@@ -14,7 +16,11 @@ class Config:
     
     # Game configuration
     VOTING_THRESHOLD = int(os.environ.get('VOTING_THRESHOLD') or 3)
+    VOTING_PAGE_SIZE = int(os.environ.get('VOTING_PAGE_SIZE') or 20)
+    FREE_FOR_ALL_PAGE_SIZE = int(os.environ.get('FREE_FOR_ALL_PAGE_SIZE') or 25)
     ROUND_SCHEDULE = os.environ.get('ROUND_SCHEDULE') or 'schedule.json'
+    TARGET_ASSIGNMENT_ENGINE = os.environ.get('TARGET_ASSIGNMENT_ENGINE') or 'history'  # history, shuffle
+    TARGET_HISTORY_ROUNDS = int(os.environ.get('TARGET_HISTORY_ROUNDS') or 3)
     
     # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -23,6 +29,25 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    # Logged-in SMTP connections kept open and shared between sends
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE') or 4)
+    MAIL_POOL_NOOP_SECONDS = int(os.environ.get('MAIL_POOL_NOOP_SECONDS') or 30)  # idle connections are checked after this
+    MAIL_POOL_IDLE_SECONDS = int(os.environ.get('MAIL_POOL_IDLE_SECONDS') or 5 * 60)  # and closed after this
+    # Emails wait in the outbox table for these background senders
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS') or 2)
+    MAIL_POLL_SECONDS = int(os.environ.get('MAIL_POLL_SECONDS') or 15)  # how often retries that came due are picked up
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS') or 6)
+    MAIL_RETRY_BASE_SECONDS = int(os.environ.get('MAIL_RETRY_BASE_SECONDS') or 30)  # doubled after each failure
+    MAIL_RETRY_MAX_SECONDS = int(os.environ.get('MAIL_RETRY_MAX_SECONDS') or 60 * 60)
+    MAIL_OUTBOX_KEEP_DAYS = int(os.environ.get('MAIL_OUTBOX_KEEP_DAYS') or 7)  # sent emails are deleted after this
+    # Emails to many players go out in batches: 'bcc' hides the batch from each other, 'personal' sends one each
+    MAIL_FANOUT_MODE = os.environ.get('MAIL_FANOUT_MODE') or 'bcc'
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)  # recipients per message, within provider limits
+    MAIL_RATE_LIMIT = float(os.environ.get('MAIL_RATE_LIMIT') or 10)  # messages per second to the server, 0 for no limit
+    # Players on digest delivery get one email for the events of this many minutes
+    MAIL_DIGEST_MINUTES = int(os.environ.get('MAIL_DIGEST_MINUTES') or 15)
+    # Larger uploads are mailed to the admin as a smaller copy or a link; base64 adds a third on top
+    MAIL_ATTACHMENT_MAX_BYTES = int(os.environ.get('MAIL_ATTACHMENT_MAX_BYTES') or 15 * 1024 * 1024)
 
     # Instagram configuration
     INSTAGRAM_USERNAME = os.environ.get('INSTAGRAM_USERNAME')
@@ -39,8 +64,39 @@ class Config:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
     MAX_CONTENT_LENGTH = 256 * 1024 * 1024  # 16 MB max upload
+    # Internal nginx location uploads are handed off to, unset to serve them from Flask
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE') or 60 * 60)  # seconds browsers may cache uploads
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'}
 
+    # Where finished media is kept: 'local' serves it from UPLOAD_FOLDER, 's3' from an S3-compatible bucket.
+    # UPLOAD_FOLDER stays the working area uploads land in and are processed in either way
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'local'
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+    S3_PREFIX = os.environ.get('S3_PREFIX') or ''
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # for MinIO and other S3-compatible stores
+    S3_REGION = os.environ.get('S3_REGION')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY')
+    MEDIA_URL_EXPIRY = int(os.environ.get('MEDIA_URL_EXPIRY') or 2 * 60 * 60)  # seconds presigned URLs stay valid
+
+    # Resumable uploads are assembled here before they join the other uploads
+    UPLOAD_SPOOL_FOLDER = os.environ.get('UPLOAD_SPOOL_FOLDER') or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'spool')
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE') or 8 * 1024 * 1024)  # suggested to clients
+    UPLOAD_SPOOL_HOURS = int(os.environ.get('UPLOAD_SPOOL_HOURS') or 24)  # unfinished uploads are kept this long
+
+    # Team photos are resized to these widths in pixels at signup
+    TEAM_PHOTO_WIDTHS = [int(width) for width in (os.environ.get('TEAM_PHOTO_WIDTHS') or '320,640,1280').split(',')]
+    TEAM_PHOTO_EMAIL_WIDTH = int(os.environ.get('TEAM_PHOTO_EMAIL_WIDTH') or 1280)  # attached to admin emails
+
+    # Video transcoding
+    TRANSCODE_WORKERS = int(os.environ.get('TRANSCODE_WORKERS') or os.cpu_count() or 1)
+    TRANSCODE_TIMEOUT = int(os.environ.get('TRANSCODE_TIMEOUT') or 15 * 60)  # seconds per video
+    TRANSCODE_TEMP_FOLDER = os.environ.get('TRANSCODE_TEMP_FOLDER')  # ffmpeg scratch space, defaults to the system temp folder
+    # Playable videos above this many bits per second are still re-encoded to shrink them
+    TRANSCODE_REMUX_MAX_BITRATE = int(os.environ.get('TRANSCODE_REMUX_MAX_BITRATE') or 10_000_000)
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
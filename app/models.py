@@ -17,8 +17,10 @@ class Team(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     name = db.Column(db.String(100), nullable=False, unique=True)
     photo_path = db.Column(db.String(255), nullable=True)
+    photo_widths = db.Column(db.String(50), nullable=True)  # comma separated widths of the resized variants
     state = db.Column(db.String(20), default='pending')  # pending, alive, dead
-    target_id = db.Column(db.String(36), db.ForeignKey('teams.id'), nullable=True)
+    target_id = db.Column(db.String(36), db.ForeignKey('teams.id'), nullable=True, index=True)
+    target_cleared_round = db.Column(db.Integer, nullable=True)  # round in which the team's target was wiped out
     eliminations = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -62,6 +64,7 @@ class Player(db.Model, UserMixin):
     state = db.Column(db.String(20), default='alive')  # alive, dead
     team_id = db.Column(db.String(36), db.ForeignKey('teams.id'), nullable=False)
     obituary = db.Column(db.Text, nullable=True)
+    notification_mode = db.Column(db.String(10), nullable=False, default='instant')  # instant, digest
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -92,6 +95,9 @@ class Player(db.Model, UserMixin):
 
 class KillConfirmation(db.Model):
     __tablename__ = 'kill_confirmations'
+    __table_args__ = (
+        db.Index('ix_kill_confirmations_status_expiration', 'status', 'expiration_time'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     victim_id = db.Column(db.String(36), db.ForeignKey('players.id'), nullable=False)
@@ -101,6 +107,14 @@ class KillConfirmation(db.Model):
     video_path = db.Column(db.String(255), nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     expiration_time = db.Column(db.DateTime, nullable=False)
+    approve_count = db.Column(db.Integer, nullable=False, default=0)
+    reject_count = db.Column(db.Integer, nullable=False, default=0)
+    processing_status = db.Column(db.String(20), default='queued')  # queued, transcoding, notifying, ready, failed
+    processing_mode = db.Column(db.String(10))  # remux, audio, full
+    preview_path = db.Column(db.String(255))  # Low resolution stand-in while the video is processed
+    poster_path = db.Column(db.String(255))  # JPEG still from the video
+    poster_webp_path = db.Column(db.String(255))  # WebP still from the video
+    thumbnail_path = db.Column(db.String(255))  # Animated WebP of the first few seconds
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -123,16 +137,39 @@ class KillConfirmation(db.Model):
     def is_rejected(self):
         return self.status == 'rejected'
     
+    @property
+    def is_processing(self):
+        # The video can be watched once transcoding has finished or given up
+        return self.processing_status in ('queued', 'transcoding')
+    
+    @property
+    def playable_video_path(self):
+        # The preview stands in until the processed video is ready, and is kept
+        # if processing fails since the original may not play in browsers
+        if self.preview_path:
+            return self.preview_path
+        if self.is_processing:
+            return None
+        return self.video_path
+    
+    @property
+    def is_preview(self):
+        return bool(self.preview_path)
+    
     @property
     def approve_votes(self):
-        return sum(1 for vote in self.votes if vote.vote)
+        return self.approve_count or 0
     
     @property
     def reject_votes(self):
-        return sum(1 for vote in self.votes if not vote.vote)
+        return self.reject_count or 0
 
 class KillVote(db.Model):
     __tablename__ = 'kill_votes'
+    __table_args__ = (
+        db.Index('ix_kill_votes_voter_confirmation', 'voter_id', 'kill_confirmation_id'),
+        db.UniqueConstraint('kill_confirmation_id', 'voter_id', name='uq_kill_votes_confirmation_voter'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     kill_confirmation_id = db.Column(db.String(36), db.ForeignKey('kill_confirmations.id'), nullable=False)
@@ -144,6 +181,78 @@ class KillVote(db.Model):
         vote_str = 'Approve' if self.vote else 'Reject'
         return f'<KillVote {self.voter.name}: {vote_str}>'
 
+class TargetHistory(db.Model):
+    __tablename__ = 'target_history'
+
+    id = db.Column(db.Integer, primary_key=True)
+    round_number = db.Column(db.Integer, nullable=False, index=True)
+    team_id = db.Column(db.String(36), db.ForeignKey('teams.id'), nullable=False)
+    target_id = db.Column(db.String(36), db.ForeignKey('teams.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TargetHistory Round {self.round_number}: {self.team_id} -> {self.target_id}>'
+
+class ChunkedUpload(db.Model):
+    __tablename__ = 'chunked_uploads'
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    player_id = db.Column(db.String(36), db.ForeignKey('players.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # Total bytes the client will send
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChunkedUpload {self.filename} ({self.size} bytes)>'
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)  # one send per key
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    bcc = db.Column(db.Boolean, default=False)  # recipients are hidden from each other
+    text_body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    attachment_path = db.Column(db.String(255), nullable=True)  # Stored path of an upload to attach
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboundEmail {self.subject} ({self.status})>'
+
+    def get_recipients(self):
+        return json.loads(self.recipients)
+
+class PendingNotification(db.Model):
+    __tablename__ = 'pending_notifications'
+    __table_args__ = (
+        db.UniqueConstraint('player_id', 'event_type', 'event_key', name='uq_pending_notifications_player_event'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.String(36), db.ForeignKey('players.id'), nullable=False, index=True)
+    event_type = db.Column(db.String(50), nullable=False)  # kill_submission
+    event_key = db.Column(db.String(100), nullable=False)  # what the event is about, such as the kill confirmation ID
+    payload = db.Column(db.Text, nullable=False)  # JSON details of the event
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    sent_at = db.Column(db.DateTime, nullable=True)  # kept once sent so the event is never held twice
+
+    def __repr__(self):
+        return f'<PendingNotification {self.event_type} for {self.player_id}>'
+
+    def get_payload(self):
+        return json.loads(self.payload)
+
 class GameState(db.Model):
     __tablename__ = 'game_state'
     
@@ -156,6 +265,8 @@ class GameState(db.Model):
     round_start = db.Column(db.DateTime, nullable=True)
     round_end = db.Column(db.DateTime, nullable=True)
     free_for_all = db.Column(db.Boolean, default=False)
+    leaderboard_version = db.Column(db.Integer, nullable=False, default=0)  # bumped whenever standings change
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped on every change to the game state
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -178,6 +289,13 @@ class GameState(db.Model):
     def is_forced(self):
         return self.state == 'forced'
 
+@db.event.listens_for(GameState, 'before_update')
+def bump_game_state_version(mapper, connection, target):
+    """Bump the game state version in the same UPDATE as any other change."""
+    if db.object_session(target).is_modified(target, include_collections=False):
+        target.version = GameState.version + 1
+
+
 class ActionLog(db.Model):
     __tablename__ = 'action_logs'
     
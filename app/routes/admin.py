@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from functools import wraps
 from datetime import datetime
 
-from app.models import db, Team, Player, GameState, KillConfirmation, ActionLog
+from app.models import db, Team, Player, KillConfirmation, ActionLog
 from app.services.admin_service import (
     verify_admin_password, get_admin_dashboard_data, accept_team, deny_team,
     change_game_state, start_round, set_round_schedule,
@@ -11,6 +11,7 @@ from app.services.admin_service import (
     toggle_voting_status, toggle_free_for_all, send_mass_email_service
 )
 from app.services.email_service import send_team_approval_notification
+from app.services.state_service import get_game_state
 
 admin = Blueprint('admin', __name__)
 
@@ -45,7 +46,7 @@ def login():
     """
     Handle admin login.
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     if request.method == 'POST':
         password = request.form.get('password')
@@ -100,7 +101,7 @@ def dashboard():
     Admin dashboard with game overview and controls.
     """
     # get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Get dashboard data
     dashboard_data = get_admin_dashboard_data()
@@ -343,7 +344,7 @@ def execute_sql():
     """
     sql_command = request.form.get('sql_command')
     confirmation = request.form.get('confirmation') == 'yes'
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
 
     if not confirmation:
@@ -397,10 +398,10 @@ def send_mass_email():
 @admin_required
 def view_kill_admin(kill_confirmation_id):
     try:
-        game_state = GameState.query.first()
+        game_state = get_game_state()
         # Get kill confirmation details
         kill = KillConfirmation.query.get_or_404(kill_confirmation_id)
-        threshold = GameState.query.first().voting_threshold
+        threshold = game_state.voting_threshold
 
         # Add debug logging
         current_app.logger.info(f"Viewing kill confirmation: {kill_confirmation_id}")
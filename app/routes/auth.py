@@ -1,14 +1,16 @@
-import os
-import uuid
 from datetime import datetime
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
 from flask_login import login_user, logout_user, current_user, login_required
 from werkzeug.utils import secure_filename
 
-from app.models import db, Team, Player, GameState, ActionLog
+from app.models import db, Team, Player, ActionLog
 from app.services.email_service import send_team_signup_notification
 from app.services.admin_email_service import send_admin_image
+from app.services.game_service import invalidate_leaderboard
+from app.services.state_service import get_game_state
+from app.services.blob_service import store_stream, publish_blobs, KIND_PHOTOS
+from app.services.image_service import render_photo_variants, photo_variant_paths, photo_for_width
 
 auth = Blueprint('auth', __name__)
 
@@ -27,7 +29,7 @@ def login():
         return redirect(url_for('game.home'))
 
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Only allow login during live game or admin login
     if game_state.state not in ['live', 'post'] and 'admin_login' not in request.args:
@@ -95,7 +97,7 @@ def logout():
 def signup():
     """Handle team and player registration."""
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Only allow signup during pre-game
     if game_state.state != 'pre':
@@ -255,16 +257,17 @@ def signup():
             # Save the file
             filename = secure_filename(file.filename)
             file_ext = filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
+            relative_path, _ = store_stream(file.stream, file_ext, KIND_PHOTOS)
 
-            relative_path = f"uploads/{unique_filename}"
+            # Resized copies are what the site and the admin emails use
+            photo_widths = render_photo_variants(relative_path)
+            publish_blobs(relative_path, *photo_variant_paths(relative_path, photo_widths))
 
             # Then update the Team creation:
             team = Team(
                 name=session.get('team_name'),
                 photo_path=relative_path,  # Store the relative path
+                photo_widths=','.join(str(width) for width in photo_widths) or None,
                 state='pending'
             )
             db.session.add(team)
@@ -304,6 +307,9 @@ def signup():
             )
             db.session.add(log)
 
+            # The new team shows up on the leaderboard
+            invalidate_leaderboard()
+
             # Commit changes
             db.session.commit()
 
@@ -322,7 +328,8 @@ def signup():
                 'success')
 
             try:
-                send_admin_image("text", file_path)
+                send_admin_image("text", photo_for_width(relative_path, team.photo_widths,
+                                                         current_app.config['TEAM_PHOTO_EMAIL_WIDTH']))
             except Exception as e:
                 print(e)
 
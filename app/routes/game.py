@@ -1,17 +1,21 @@
-import uuid
-import os
 from datetime import datetime
 from functools import wraps
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 
-from app.models import db, Team, Player, KillConfirmation, GameState
+from app.models import db, Team, Player, KillConfirmation, ChunkedUpload
 from app.services.email_service import send_team_elimination_notification
 from app.services.game_service import submit_kill as service_submit_kill
-from app.services.media_service import process_video
-from app.services.admin_email_service import send_admin_video, send_admin_image
+from app.services.player_service import get_player_view, get_free_for_all_targets
+from app.services.state_service import get_game_state
+from app.services.upload_service import (
+    create_upload, get_upload_offset, append_chunk, finalize_upload, cancel_upload
+)
+from app.services.admin_email_service import send_admin_image
+from app.services.blob_service import store_stream, delete_blobs, KIND_VIDEOS
+from app.services.notification_service import set_notification_mode
 
 game = Blueprint('game', __name__)
 
@@ -25,7 +29,7 @@ def allowed_file(filename):
 def voting_enabled_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        game_state = GameState.query.first()
+        game_state = get_game_state()
         if not game_state or not game_state.voting_enabled:
             flash('Voting is currently disabled.', 'warning')
             return redirect(url_for('main.index'))
@@ -40,137 +44,179 @@ def home():
     Home page for logged-in players.
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
-    # Get current player's team
-    team = Team.query.get(current_user.team_id)
-
-    # Get teammate if exists
-
-    # Get target team and players if assigned
-    target_team = None
-    target_players = []
-
-    teammate = Player.query.filter_by(team_id=team.id).filter(Player.id != current_user.id).first()
+    # Get the player's team, teammate, targets and alive counts
+    view = get_player_view(current_user)
+    target_players = view['target_players']
 
+    # In free-for-all, show one page of the alive players instead
+    roster = None
     if game_state.free_for_all:
-        # In free-for-all, all alive players except current user and teammate are targets
-        if teammate is not None:
-            # If teammate exists, exclude both current user and teammate
-            target_players = Player.query.filter(Player.state == 'alive',
-                                               Player.id != current_user.id,
-                                               Player.id != teammate.id).all()
-        else:
-            # If no teammate, just exclude current user
-            target_players = Player.query.filter(Player.state == 'alive',
-                                               Player.id != current_user.id).all()
-    else:
-        # Regular team-based targeting
-        if team.target_id:
-            target_team = Team.query.get(team.target_id)
-            if target_team:
-                target_players = Player.query.filter_by(team_id=target_team.id).all()
-
-    # Get counts of teams and players still alive
-    alive_teams_count = Team.query.filter_by(state='alive').count()
-    alive_players_count = Player.query.filter_by(state='alive').count()
+        roster = get_free_for_all_targets(
+            current_user, view,
+            page=request.args.get('page', 1, type=int),
+            search=request.args.get('q')
+        )
+        target_players = roster['players']
 
     return render_template(
         'game/home.html',
         game_state=game_state,
-        team=team,
-        teammate=teammate,
-        target_team=target_team,
+        team=view['team'],
+        teammate=view['teammate'],
+        target_team=view['target_team'],
         target_players=target_players,
-        alive_teams=alive_teams_count,
-        alive_players=alive_players_count,
+        roster=roster,
+        alive_teams=view['alive_teams'],
+        alive_players=view['alive_players'],
         round_end=game_state.round_end,
         now=datetime.now()
     )
 
 
-@game.route('/submit-kill', methods=['GET', 'POST'])
-@login_required
-def submit_kill_route():
-    """
-    Handle kill submission form.
+def _kill_submission_blocked(game_state):
     """
-    # Get game state
-    game_state = GameState.query.first()
+    Check whether the current player may submit a kill.
 
+    Returns:
+        str: Why the player cannot submit a kill, or None if they can
+    """
     # Only allow kill submissions during live game
     if game_state.state != 'live':
-        flash('The game is not currently active.', 'danger')
-        return redirect(url_for('game.home'))
+        return 'The game is not currently active.'
 
     # Only alive players can submit kills
     if not current_user.is_alive:
-        flash('You cannot submit kills because you are eliminated.', 'danger')
-        return redirect(url_for('game.home'))
+        return 'You cannot submit kills because you are eliminated.'
 
     # Only players from alive teams can submit kills
-    team = Team.query.get(current_user.team_id)
-    if not team.is_alive:
-        flash('Your team is eliminated and cannot submit kills.', 'danger')
+    if not get_player_view(current_user)['team']['is_alive']:
+        return 'Your team is eliminated and cannot submit kills.'
+
+    return None
+
+
+def _parse_kill_form():
+    """
+    Read the victim, time of kill and rules confirmation from the submitted form.
+
+    Returns:
+        tuple: (victim_id, kill_time, error) - error is None if the form is valid
+    """
+    victim_id = request.form.get('victim_id')
+    kill_time_str = request.form.get('kill_time')
+    rules_confirmation = 'rules_confirmed' in request.form
+
+    # Validate inputs
+    if not victim_id or not kill_time_str or not rules_confirmation:
+        return victim_id, None, 'All fields are required.'
+
+    # Parse kill time
+    try:
+        # Expecting format like "2023-09-15T15:30"
+        kill_time = datetime.strptime(kill_time_str, '%Y-%m-%dT%H:%M')
+    except ValueError:
+        return victim_id, None, 'Invalid time format.'
+
+    return victim_id, kill_time, None
+
+
+def _submit_kill_video(video_path, victim_id, kill_time, game_state, new_video=False):
+    """
+    Submit a kill for a video that has been stored in the upload folder.
+
+    The video is transcoded and mailed out in the background once the kill
+    confirmation exists. If the kill is rejected, a video that was stored
+    just for it is deleted again.
+
+    Args:
+        video_path (str): Stored path of the video, as returned by the blob store
+        victim_id (str): ID of the victim player
+        kill_time (datetime): Time of the kill
+        game_state: Current game state
+        new_video (bool): Whether the video was new to the blob store
+
+    Returns:
+        KillConfirmation: Created kill confirmation, or None if failed
+    """
+    kill_confirmation = service_submit_kill(
+        victim_id=victim_id,
+        attacker_id=current_user.id,
+        kill_time=kill_time,
+        video_path=video_path
+    )
+
+    if not kill_confirmation and new_video:
+        # Another kill may have claimed the same video in the meantime
+        if not KillConfirmation.query.filter_by(video_path=video_path).first():
+            delete_blobs(video_path)
+
+    if kill_confirmation:
+
+        # Check if the victim's team is now eliminated
+        victim = Player.query.get(victim_id)
+        victim_team = Team.query.get(victim.team_id)
+        if victim_team.all_dead:
+            # Update team state to "eliminated" if not already
+            if victim_team.state != 'eliminated':
+                victim_team.state = 'eliminated'
+                victim_team.eliminated_in_round = game_state.round_number
+                db.session.commit()
+
+                # Send elimination notification to the team
+                send_team_elimination_notification(victim_team.id)
+
+    return kill_confirmation
+
+
+@game.route('/submit-kill', methods=['GET', 'POST'])
+@login_required
+def submit_kill_route():
+    """
+    Handle kill submission form.
+    """
+    # Get game state
+    game_state = get_game_state()
+
+    error = _kill_submission_blocked(game_state)
+    if error:
+        flash(error, 'danger')
         return redirect(url_for('game.home'))
 
-    # Get target team and players if assigned
-    target_team = None
-    target_players = []
+    view = get_player_view(current_user)
+
+    # Get target team and players
+    target_team = view['target_team']
+    target_players = view['target_players']
 
+    # In free-for-all, offer one page of the alive players instead
+    roster = None
     if game_state.free_for_all:
-        # In free-for-all, all alive players except current user are targets
-        teammate = Player.query.filter_by(team_id=team.id).filter(Player.id != current_user.id).first()
-
-        # Check if teammate exists before trying to access teammate.id
-        if teammate:
-            target_players = Player.query.filter(
-                Player.state == 'alive',
-                Player.id != current_user.id,
-                Player.id != teammate.id
-            ).all()
-        else:
-            target_players = Player.query.filter(
-                Player.state == 'alive',
-                Player.id != current_user.id
-            ).all()
-    else:
-        # Regular team-based targeting
-        if team.target_id:
-            target_team = Team.query.get(team.target_id)
-            if target_team:
-                target_players = Player.query.filter_by(team_id=target_team.id).all()
+        roster = get_free_for_all_targets(
+            current_user, view,
+            page=request.args.get('page', 1, type=int),
+            search=request.args.get('q')
+        )
+        target_players = roster['players']
 
     # If no targets, redirect back to home
-    if not target_players:
+    if not target_players and not (roster and roster['search']):
         flash('You have no valid targets.', 'danger')
         return redirect(url_for('game.home'))
 
     if request.method == 'POST':
-        victim_id = request.form.get('victim_id')
-        kill_time_str = request.form.get('kill_time')
-        rules_confirmation = 'rules_confirmed' in request.form
-
-        # Validate inputs
-        if not victim_id or not kill_time_str or not rules_confirmation:
-            flash('All fields are required.', 'danger')
+        victim_id, kill_time, error = _parse_kill_form()
+        if error:
+            flash(error, 'danger')
             return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                                   game_state=game_state, now=datetime.now())
-
-        # Parse kill time
-        try:
-            # Expecting format like "2023-09-15T15:30"
-            kill_time = datetime.strptime(kill_time_str, '%Y-%m-%dT%H:%M')
-        except ValueError:
-            flash('Invalid time format.', 'danger')
-            return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                                   game_state=game_state, now=datetime.now())
+                                   roster=roster, game_state=game_state, now=datetime.now())
 
         # Check if a video was uploaded
         if 'kill_video' not in request.files:
             flash('No video uploaded.', 'danger')
             return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                                   game_state=game_state, now=datetime.now())
+                                   roster=roster, game_state=game_state, now=datetime.now())
 
         file = request.files['kill_video']
 
@@ -178,59 +224,21 @@ def submit_kill_route():
         if file.filename == '':
             flash('No video selected.', 'danger')
             return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                                   game_state=game_state, now=datetime.now())
+                                   roster=roster, game_state=game_state, now=datetime.now())
 
         # Check if file has allowed extension
         if not allowed_file(file.filename):
             flash('Invalid file type. Allowed types: mp4, mov.', 'danger')
             return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                                   game_state=game_state, now=datetime.now())
+                                   roster=roster, game_state=game_state, now=datetime.now())
 
-        # Save the file
+        # Save the file, hashing it on the way in so a resubmitted video is stored once
         filename = secure_filename(file.filename)
         file_ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"/kill_{uuid.uuid4().hex}.{file_ext}"
-        file_path = current_app.config['UPLOAD_FOLDER'] + unique_filename
-        file.save(file_path)
-
-        # reformat and compress video
-        process_video(file_path)
-
-        # The relative path that will be stored in the database
-        relative_path = f"uploads/{unique_filename}"
-
-        # Then update the submit_kill call:
-        kill_confirmation = service_submit_kill(
-            victim_id=victim_id,
-            attacker_id=current_user.id,
-            kill_time=kill_time,
-            video_path=relative_path  # Pass the relative path
-        )
-
-        if kill_confirmation:
-
-            # Check if the victim's team is now eliminated
-            victim = Player.query.get(victim_id)
-            victim_team = Team.query.get(victim.team_id)
-            if victim_team.all_dead:
-                # Update team state to "eliminated" if not already
-                if victim_team.state != 'eliminated':
-                    victim_team.state = 'eliminated'
-                    victim_team.eliminated_in_round = game_state.current_round
-                    db.session.commit()
+        video_path, existed = store_stream(file.stream, file_ext, KIND_VIDEOS)
 
-                    # Send elimination notification to the team
-                    send_team_elimination_notification(victim_team.id)
-
-            flash('Kill submitted successfully and pending confirmation.', 'success')
-
-            try:
-                send_admin_video(f"{victim.name} tagged by {current_user.name}",
-                                 f"attacker ID {current_user.id}\n"
-                                 f"victim ID: {victim_id}\n"
-                                 f"time of kill: {kill_time}", video_path=file_path)
-            except Exception as e:
-                print(e)
+        if _submit_kill_video(video_path, victim_id, kill_time, game_state, new_video=not existed):
+            flash('Kill submitted successfully and pending confirmation. The video is being processed.', 'success')
 
             return redirect(url_for('game.home'))
         else:
@@ -238,7 +246,140 @@ def submit_kill_route():
             return redirect(url_for('game.submit_kill_route'))
 
     return render_template('game/submit_kill.html', target_team=target_team, target_players=target_players,
-                           game_state=game_state, now=datetime.now())
+                           roster=roster, game_state=game_state, now=datetime.now())
+
+
+def _get_own_upload(upload_id):
+    upload = db.session.get(ChunkedUpload, upload_id)
+    if not upload or upload.player_id != current_user.id:
+        abort(404)
+    return upload
+
+
+@game.route('/uploads', methods=['POST'])
+@login_required
+def start_upload():
+    """
+    Start a resumable kill video upload.
+
+    Expects JSON with the file's name and size in bytes. The video is then
+    sent in chunks with PUT and handed to the kill submission with finalize.
+    """
+    error = _kill_submission_blocked(get_game_state())
+    if error:
+        return jsonify({'error': error}), 403
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename', '')))
+    size = data.get('size')
+
+    if not filename or '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ('mp4', 'mov'):
+        return jsonify({'error': 'Invalid file type. Allowed types: mp4, mov.'}), 400
+
+    if not isinstance(size, int) or size <= 0 or size > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Invalid file size.'}), 400
+
+    upload = create_upload(current_user.id, filename, size)
+
+    return jsonify({
+        'upload_id': upload.id,
+        'offset': 0,
+        'size': upload.size,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']
+    }), 201
+
+
+@game.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    """
+    Report how much of an upload has arrived, so the client knows where to resume.
+
+    Args:
+        upload_id (str): ID of the upload
+    """
+    upload = _get_own_upload(upload_id)
+    return jsonify({'upload_id': upload.id, 'offset': get_upload_offset(upload), 'size': upload.size})
+
+
+@game.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    """
+    Append the request body to an upload at the offset given in the query string.
+
+    An optional X-Chunk-Checksum header holds the SHA-256 hex digest of the
+    chunk. A chunk at the wrong offset is refused with 409 and the offset the
+    upload actually has, so the client can pick up from there.
+
+    Args:
+        upload_id (str): ID of the upload
+    """
+    upload = _get_own_upload(upload_id)
+
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Missing offset.'}), 400
+
+    success, result = append_chunk(upload, offset, request.stream, request.headers.get('X-Chunk-Checksum'))
+    if not success:
+        status = 409 if offset != get_upload_offset(upload) else 400
+        return jsonify({'error': result, 'offset': get_upload_offset(upload)}), status
+
+    return jsonify({'upload_id': upload.id, 'offset': result, 'size': upload.size})
+
+
+@game.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abandon_upload(upload_id):
+    """
+    Abandon an upload.
+
+    Args:
+        upload_id (str): ID of the upload
+    """
+    cancel_upload(_get_own_upload(upload_id))
+    return '', 204
+
+
+@game.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finish_upload(upload_id):
+    """
+    Verify a complete upload and submit the kill it is the evidence for.
+
+    Takes the same victim_id, kill_time and rules_confirmed fields as the kill
+    submission form, plus an optional SHA-256 hex digest of the whole file in
+    checksum.
+
+    Args:
+        upload_id (str): ID of the upload
+    """
+    upload = _get_own_upload(upload_id)
+
+    game_state = get_game_state()
+    error = _kill_submission_blocked(game_state)
+    if error:
+        return jsonify({'error': error}), 403
+
+    victim_id, kill_time, error = _parse_kill_form()
+    if error:
+        return jsonify({'error': error}), 400
+
+    size = upload.size
+    success, result, new_video = finalize_upload(upload, request.form.get('checksum'))
+    if not success:
+        offset = get_upload_offset(upload)
+        # 409 while chunks are missing, so the client resumes; 400 once the upload is discarded
+        return jsonify({'error': result, 'offset': offset}), 409 if 0 < offset < size else 400
+
+    if not _submit_kill_video(result, victim_id, kill_time, game_state, new_video=new_video):
+        # The upload is kept, so the kill can be submitted again without sending the video again
+        return jsonify({'error': 'Failed to submit kill. Please check your inputs and try again.'}), 400
+
+    cancel_upload(upload)
+    flash('Kill submitted successfully and pending confirmation. The video is being processed.', 'success')
+    return jsonify({'redirect': url_for('game.home')})
 
 
 @game.route('/voting')
@@ -249,20 +390,22 @@ def voting():
     Display kill confirmations that need votes.
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Only allow voting during live game
     if game_state.state != 'live':
         flash('The game is not currently active.', 'danger')
         return redirect(url_for('game.home'))
 
-    # Get kill confirmations for the current player
+    # Get a page of kill confirmations for the current player
     from app.services.game_service import get_kill_confirmations_for_voter
-    kill_confirmations = get_kill_confirmations_for_voter(current_user.id)
+    after = request.args.get('after')
+    kill_confirmations, next_after = get_kill_confirmations_for_voter(current_user.id, after=after)
 
     return render_template('game/voting.html',
                            kill_confirmations=kill_confirmations,
-                           Team=Team,
+                           after=after,
+                           next_after=next_after,
                            game_state=game_state,
                            now=datetime.now())
 
@@ -281,7 +424,7 @@ def view_video(kill_confirmation_id):
     kill_confirmation = KillConfirmation.query.get(kill_confirmation_id)
 
     # get the game state
-    game_state = GameState.query.first()  # or however you retrieve your active game state
+    game_state = get_game_state()
 
 
     if not kill_confirmation:
@@ -318,7 +461,7 @@ def vote(kill_confirmation_id, vote_value):
         vote_value (str): 'approve' or 'reject'
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Only allow voting during live game
     if game_state.state != 'live':
@@ -342,3 +485,19 @@ def vote(kill_confirmation_id, vote_value):
         flash(message, 'danger')
 
     return redirect(url_for('game.voting'))
+
+
+@game.route('/notifications', methods=['POST'])
+@login_required
+def notification_settings():
+    """
+    Choose between an email per event and grouped digest emails.
+    """
+    success, message = set_notification_mode(current_user, request.form.get('notification_mode'))
+
+    if success:
+        flash(message, 'success')
+    else:
+        flash(message, 'danger')
+
+    return redirect(url_for('game.home'))
@@ -1,7 +1,16 @@
-from flask import Blueprint, render_template, current_app, redirect, url_for
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Blueprint, render_template, current_app, redirect, url_for, request, session, abort, send_from_directory
 from flask_login import current_user
+from werkzeug.security import safe_join
 from datetime import datetime
-from app.models import GameState, Team, Player
+from app.models import Team, Player
+from app.services.state_service import get_game_state
+from app.services.blob_service import upload_name, BLOB_FOLDER, KIND_VIDEOS
+from app.services.storage_service import get_storage
+from app.services.image_service import photo_variant_path, parse_photo_widths, photo_for_width
 
 main = Blueprint('main', __name__)
 
@@ -11,7 +20,7 @@ def index():
     Landing page for the application, displays different content based on game state.
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
     
     # Get team and player counts
     alive_teams_count = Team.query.filter_by(state='alive').count()
@@ -80,7 +89,7 @@ def rules():
     """
     Display the game rules.
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     return render_template('rules.html',
                            game_state=game_state,
@@ -96,7 +105,7 @@ def leaderboard():
     from app.services.game_service import get_leaderboard
     leaderboard_data = get_leaderboard()
 
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     return render_template(
         'leaderboard.html',
@@ -110,6 +119,114 @@ def about():
     """
     Display information about the game and developer.
     """
-    from app.models import GameState
-    game_state = GameState.query.first()
+    game_state = get_game_state()
     return render_template('about.html', game_state=game_state, now=datetime.now())
+
+
+@main.app_template_global()
+def media_url(path):
+    """
+    Get the URL an uploaded file is served from.
+
+    Args:
+        path (str): Stored path of the upload, such as 'uploads/blobs/videos/ab/cd/abcd....mp4'
+
+    Returns:
+        str: URL of the file on the media endpoint
+    """
+    return url_for('main.media', filename=upload_name(path))
+
+
+@main.app_template_global()
+def photo_srcset(photo_path, photo_widths, ext='jpg'):
+    """
+    Get the srcset listing the resized variants of a team photo.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        photo_widths (str): Comma separated widths of the variants, as stored on the team
+        ext (str): 'webp' or 'jpg'
+
+    Returns:
+        str: srcset attribute value, empty if the photo has no variants
+    """
+    return ', '.join(
+        f"{media_url(photo_variant_path(photo_path, width, ext))} {width}w"
+        for width in parse_photo_widths(photo_widths)
+    )
+
+
+@main.app_template_global()
+def photo_url(photo_path, photo_widths, width):
+    """
+    Get the URL of the smallest JPEG variant of a team photo that is at least as wide as needed.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        photo_widths (str): Comma separated widths of the variants, as stored on the team
+        width (int): Width needed in pixels
+
+    Returns:
+        str: URL of the variant, or of the original photo if it has no variants
+    """
+    return media_url(photo_for_width(photo_path, photo_widths, width))
+
+
+@main.before_app_request
+def block_static_uploads():
+    """
+    Keep uploads from being fetched around the access checks of the media endpoint.
+    """
+    if request.endpoint == 'static' and request.view_args.get('filename', '').startswith('uploads/'):
+        abort(404)
+
+
+@main.route('/media/<path:filename>')
+def media(filename):
+    """
+    Serve an uploaded file.
+
+    Kill videos and their renditions are only served to players and admins;
+    team photos stay public. Files still being processed are in the upload
+    folder. Behind nginx they are handed off with X-Accel-Redirect, otherwise
+    they are streamed from here with Range support. Finished files in a
+    remote media store are fetched straight from it through a presigned URL.
+
+    Args:
+        filename (str): Path of the file within the upload folder
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    file_path = safe_join(upload_folder, filename)
+    if file_path is None:
+        abort(404)
+
+    # Kill videos from before the blob store were named kill_<id>
+    if filename.startswith(f'{BLOB_FOLDER}/{KIND_VIDEOS}/') or os.path.basename(filename).startswith('kill_'):
+        if not (current_user.is_authenticated or session.get('admin_authenticated')):
+            abort(403)
+
+    if not os.path.isfile(file_path):
+        # The link outlives the redirect by at least half its lifetime
+        expires_in = current_app.config['MEDIA_URL_EXPIRY']
+        url = get_storage().presigned_url(filename, expires_in)
+        if url is None:
+            abort(404)
+        response = redirect(url)
+        response.cache_control.private = True
+        response.cache_control.max_age = min(current_app.config['MEDIA_MAX_AGE'], expires_in // 2)
+        return response
+
+    accel_prefix = current_app.config['MEDIA_ACCEL_REDIRECT']
+    if accel_prefix:
+        # nginx serves the file, including Range requests, from its internal location
+        response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(filename)
+    else:
+        response = send_from_directory(upload_folder, filename, conditional=True,
+                                       max_age=current_app.config['MEDIA_MAX_AGE'])
+
+    # Only the browser may cache files that sit behind a login
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['MEDIA_MAX_AGE']
+    return response
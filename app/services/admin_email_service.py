@@ -1,193 +1,180 @@
 import datetime
 import os
-import smtplib
-from email.mime.application import MIMEApplication
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+
+from flask import has_request_context, url_for
+from markupsafe import escape
 
 from app.models import Team
+from app.services.blob_service import (
+    blob_exists, blob_size, local_copy, publish_blobs, upload_file_path, upload_name
+)
+from app.services.media_service import render_preview, TranscodeCancelled, TranscodeTimeout
+from app.services.outbox_service import enqueue_email
+
+
+def email_rendition_path(video_path):
+    """
+    Get the stored path of the smaller copy of a video that is mailed when the video is too large.
+
+    Args:
+        video_path (str): Stored path of the video
+
+    Returns:
+        str: Stored path of the copy, next to the video
+    """
+    return f"{video_path.rsplit('.', 1)[0]}.email.mp4"
+
 
+def _render_email_rendition(video_path):
+    """
+    Write a low resolution copy of a video that fits under MAIL_ATTACHMENT_MAX_BYTES.
 
-def send_admin_video(subject, text_body, image_path=None, video_path=None, recipients=[], html_body=None):
+    Returns:
+        str: Stored path of the copy, or None if it could not be made small enough
+    """
     from flask import current_app
-    recipients = [current_app.config["ADMIN_EMAIL"]]
+    rendition_path = email_rendition_path(video_path)
+
+    if not blob_exists(rendition_path):
+        output_path = upload_file_path(rendition_path)
+        try:
+            with local_copy(video_path) as source_path:
+                if not render_preview(source_path, output_path, timeout=current_app.config['TRANSCODE_TIMEOUT'],
+                                      temp_dir=current_app.config['TRANSCODE_TEMP_FOLDER']):
+                    return None
+        except (TranscodeCancelled, TranscodeTimeout) as e:
+            current_app.logger.error(f'Failed to render email copy of {video_path}: {e}')
+            return None
+        publish_blobs(rendition_path)
+
+    if blob_size(rendition_path) > current_app.config['MAIL_ATTACHMENT_MAX_BYTES']:
+        return None
+    return rendition_path
+
+
+def _media_link(stored_path):
+    # Links need the site root, which is only known inside a request
+    if not has_request_context():
+        return None
+    return url_for('main.media', filename=upload_name(stored_path), _external=True)
+
+
+def _size_aware_attachment(stored_path, text_body, html_body, render_smaller=None):
     """
-    Send an email with the given body text and an attached MP4 video to the specified recipients.
+    Pick what to attach for an upload, keeping the email under MAIL_ATTACHMENT_MAX_BYTES.
+
+    Uploads that are too large are swapped for a smaller rendition if one can
+    be made, and a link to the original that needs an admin or player login
+    is added to the body.
+
     Args:
+        stored_path (str): Stored path of the upload
         text_body (str): Plain text email body
-        video_path (str): Path to the MP4 video file to attach
-        recipients (list): List of email addresses
+        html_body (str): HTML email body, or None
+        render_smaller (callable, optional): Makes a smaller rendition, returning its
+            stored path or None
+
+    Returns:
+        tuple: (attachment path or None, text body, html body)
+    """
+    from flask import current_app
+    size = blob_size(stored_path)
+    if size <= current_app.config['MAIL_ATTACHMENT_MAX_BYTES']:
+        return stored_path, text_body, html_body
+
+    attachment_path = render_smaller(stored_path) if render_smaller else None
+    megabytes = f'{size / (1024 * 1024):.0f} MB'
+    if attachment_path:
+        note = f'The original file ({megabytes}) is too large to attach, so a smaller copy is attached instead.'
+    else:
+        note = f'The file ({megabytes}) is too large to attach.'
+
+    link = _media_link(stored_path)
+    if link:
+        note += f' View the original at {link}'
+
+    current_app.logger.info(f'{os.path.basename(stored_path)} is {megabytes}, attaching '
+                            f'{"a smaller copy" if attachment_path else "a link"} instead')
+
+    if html_body:
+        html_body += f'<p>{escape(note)}</p>'
+    return attachment_path, f'{text_body}\n\n{note}', html_body
+
+
+def send_admin_video(subject, text_body, image_path=None, video_path=None, recipients=[], html_body=None,
+                     idempotency_key=None):
+    """
+    Queue an email to the admin with the given body text and an attached MP4 video.
+
+    Videos over MAIL_ATTACHMENT_MAX_BYTES are swapped for a low resolution
+    copy, or for a link if even that is too large.
+
+    Args:
+        subject (str): Email subject
+        text_body (str): Plain text email body
+        video_path (str): Stored path of the video to attach, such as 'uploads/blobs/videos/...'
         html_body (str, optional): HTML email body
+        idempotency_key (str, optional): Emails with the same key are only ever sent once
+
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if queued, False otherwise
     """
+    from flask import current_app
+    recipients = [current_app.config["ADMIN_EMAIL"]]
+
     try:
         # Check if video file exists
-        if not os.path.exists(video_path):
+        if not blob_exists(video_path):
             current_app.logger.error(f'Video file not found: {video_path}')
             return False
 
-        msg = MIMEMultipart('mixed')  # Changed to 'mixed' to support attachments
-        msg['Subject'] = subject
-        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
-        msg['To'] = ', '.join(recipients)
-
-        # Create alternative part for text/html content
-        alt_part = MIMEMultipart('alternative')
-
-        # Attach text part
-        text_part = MIMEText(text_body, 'plain')
-        alt_part.attach(text_part)
-
-        # Attach HTML part if provided
-        if html_body:
-            html_part = MIMEText(html_body, 'html')
-            alt_part.attach(html_part)
-
-        # Add the text/html parts to the message
-        msg.attach(alt_part)
-
-        # Attach the video file
-        with open(video_path, 'rb') as video_file:
-            video_attachment = MIMEApplication(video_file.read())
-            video_filename = os.path.basename(video_path)
-            video_attachment.add_header(
-                'Content-Disposition',
-                f'attachment; filename="{video_filename}"'
-            )
-            video_attachment.add_header('Content-Type', 'video/mp4')
-            msg.attach(video_attachment)
-
-        # Connect to the mail server
-        server = smtplib.SMTP(
-            current_app.config['MAIL_SERVER'],
-            current_app.config['MAIL_PORT']
+        attachment_path, text_body, html_body = _size_aware_attachment(
+            video_path, text_body, html_body, render_smaller=_render_email_rendition
         )
-        if current_app.config['MAIL_USE_TLS']:
-            server.starttls()
-
-        # Login if credentials are provided
-        if current_app.config['MAIL_USERNAME'] and current_app.config['MAIL_PASSWORD']:
-            server.login(
-                current_app.config['MAIL_USERNAME'],
-                current_app.config['MAIL_PASSWORD']
-            )
-
-        # Send the email
-        server.sendmail(
-            current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients,
-            msg.as_string()
-        )
-
-        # Close the connection
-        server.quit()
+        enqueue_email(subject, recipients, text_body, html_body, attachment_path=attachment_path,
+                      idempotency_key=idempotency_key)
 
-        current_app.logger.info(f'Email with video attachment sent to Ellie: New Video for Instagram')
+        current_app.logger.info(f'Email with video attachment queued for the admin: {subject}')
         return True
 
     except Exception as e:
-        current_app.logger.error(f'Failed to send email with video: {str(e)}')
+        current_app.logger.error(f'Failed to queue email with video: {str(e)}')
         return False
 
 
-def send_admin_image(subject, text_body, image_path, recipients=[], html_body=None):
-    from flask import current_app
-    import os
-    import smtplib
-    from email.mime.multipart import MIMEMultipart
-    from email.mime.text import MIMEText
-    from email.mime.application import MIMEApplication
-
-    recipients = [current_app.config["ADMIN_EMAIL"]]
+def send_admin_image(subject, text_body, image_path, recipients=[], html_body=None, idempotency_key=None):
     """
-    Send an email with the given body text and an attached image to the specified recipients.
+    Queue an email to the admin with the given body text and an attached image.
+
+    Images over MAIL_ATTACHMENT_MAX_BYTES are sent as a link instead.
+
     Args:
+        subject (str): Email subject
         text_body (str): Plain text email body
-        image_path (str): Path to the image file to attach
-        recipients (list): List of email addresses
+        image_path (str): Stored path of the image to attach, such as 'uploads/blobs/photos/...'
         html_body (str, optional): HTML email body
+        idempotency_key (str, optional): Emails with the same key are only ever sent once
+
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if queued, False otherwise
     """
+    from flask import current_app
+    recipients = [current_app.config["ADMIN_EMAIL"]]
+
     try:
         # Check if image file exists
-        if not os.path.exists(image_path):
+        if not blob_exists(image_path):
             current_app.logger.error(f'Image file not found: {image_path}')
             return False
 
-        msg = MIMEMultipart('mixed')  # Changed to 'mixed' to support attachments
-        msg['Subject'] = subject
-        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
-        msg['To'] = ', '.join(recipients)
-
-        # Create alternative part for text/html content
-        alt_part = MIMEMultipart('alternative')
-
-        # Attach text part
-        text_part = MIMEText(text_body, 'plain')
-        alt_part.attach(text_part)
-
-        # Attach HTML part if provided
-        if html_body:
-            html_part = MIMEText(html_body, 'html')
-            alt_part.attach(html_part)
-
-        # Add the text/html parts to the message
-        msg.attach(alt_part)
-
-        # Attach the image file
-        with open(image_path, 'rb') as image_file:
-            image_attachment = MIMEApplication(image_file.read())
-            image_filename = os.path.basename(image_path)
-            image_attachment.add_header(
-                'Content-Disposition',
-                f'attachment; filename="{image_filename}"'
-            )
-
-            # Detect image MIME type based on file extension
-            file_ext = os.path.splitext(image_path)[1].lower()
-            if file_ext == '.jpg' or file_ext == '.jpeg':
-                mime_type = 'image/jpeg'
-            elif file_ext == '.png':
-                mime_type = 'image/png'
-            elif file_ext == '.gif':
-                mime_type = 'image/gif'
-            else:
-                mime_type = 'application/octet-stream'  # Default fallback
-
-            image_attachment.add_header('Content-Type', mime_type)
-            msg.attach(image_attachment)
-
-        # Connect to the mail server
-        server = smtplib.SMTP(
-            current_app.config['MAIL_SERVER'],
-            current_app.config['MAIL_PORT']
-        )
-        if current_app.config['MAIL_USE_TLS']:
-            server.starttls()
-
-        # Login if credentials are provided
-        if current_app.config['MAIL_USERNAME'] and current_app.config['MAIL_PASSWORD']:
-            server.login(
-                current_app.config['MAIL_USERNAME'],
-                current_app.config['MAIL_PASSWORD']
-            )
-
-        # Send the email
-        server.sendmail(
-            current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients,
-            msg.as_string()
-        )
-
-        # Close the connection
-        server.quit()
+        attachment_path, text_body, html_body = _size_aware_attachment(image_path, text_body, html_body)
+        enqueue_email(subject, recipients, text_body, html_body, attachment_path=attachment_path,
+                      idempotency_key=idempotency_key)
 
-        current_app.logger.info(f'Email with image attachment sent to Ellie: New Image for Instagram')
+        current_app.logger.info(f'Email with image attachment queued for the admin: {subject}')
         return True
     except Exception as e:
-        current_app.logger.error(f'Failed to send email with image: {str(e)}')
+        current_app.logger.error(f'Failed to queue email with image: {str(e)}')
         return False
 
 
@@ -6,9 +6,16 @@ from flask import current_app
 from sqlalchemy import text
 from werkzeug.security import check_password_hash
 
-from app.models import db, Team, Player, GameState, KillConfirmation, KillVote, ActionLog
+from app.models import db, Team, Player, GameState, KillConfirmation, KillVote, ActionLog, TargetHistory, ChunkedUpload, PendingNotification
 from app.services.admin_email_service import send_admin_image
-from app.services.game_service import check_game_complete
+from app.services.game_service import (
+    check_game_complete, remove_from_ring, insert_into_ring, repair_target_ring, invalidate_leaderboard
+)
+from app.services.state_service import get_game_state, invalidate_game_state
+from app.services.submission_service import cancel_kill_processing
+from app.services.blob_service import delete_all_blobs
+from app.services.image_service import photo_for_width
+from app.services.outbox_service import get_outbox_stats
 
 
 def verify_admin_password(password):
@@ -33,7 +40,7 @@ def get_admin_dashboard_data():
         dict: Dashboard data
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Get team stats
     total_teams = Team.query.count()
@@ -87,6 +94,7 @@ def get_admin_dashboard_data():
         'database': {
             'size_mb': db_size
         },
+        'outbox': get_outbox_stats(),
         'recent_logs': [
             {
                 'action_type': log.action_type,
@@ -160,6 +168,15 @@ def wipe_game():
         # Delete all kill confirmations
         KillConfirmation.query.delete()
 
+        # Delete the target assignment history
+        TargetHistory.query.delete()
+
+        # Delete unfinished uploads before the players who started them
+        ChunkedUpload.query.delete()
+
+        # Delete notifications held for digests
+        PendingNotification.query.delete()
+
         # Delete all players
         Player.query.delete()
 
@@ -175,7 +192,8 @@ def wipe_game():
             game_state.round_end = None
             # Keep the voting threshold as is
 
-        # 3. Clear uploads directory
+        # 3. Clear uploads directory, stopping any transcodes writing into it
+        cancel_kill_processing()
         upload_folder = current_app.config['UPLOAD_FOLDER']
 
 
@@ -188,6 +206,19 @@ def wipe_game():
                 except Exception as e:
                     current_app.logger.warning(f"Failed to delete file {file_path}: {e}")
 
+        # Uploads from before the blob store sit flat in the folder, the rest under blobs/
+        delete_all_blobs()
+
+        spool_folder = current_app.config['UPLOAD_SPOOL_FOLDER']
+        if os.path.exists(spool_folder):
+            for filename in os.listdir(spool_folder):
+                try:
+                    os.unlink(os.path.join(spool_folder, filename))
+                except Exception as e:
+                    current_app.logger.warning(f"Failed to delete file {filename}: {e}")
+
+        invalidate_leaderboard()
+
         # 4. Add action log
         log = ActionLog(
             action_type='game_wipe',
@@ -219,7 +250,7 @@ def accept_team(team_id):
         bool: True if successful, False otherwise
     """
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     # Can only accept teams before the game starts
     if game_state.state != 'pre':
@@ -232,6 +263,7 @@ def accept_team(team_id):
 
     # Update team state
     team.state = 'alive'
+    invalidate_leaderboard()
 
     # Log the action
     log = ActionLog(
@@ -253,7 +285,8 @@ def accept_team(team_id):
             subject=f"New Team Approved: {team.name}",
             text_body=f"Team Name: {team.name}\n"
                       f"Players: {', '.join(player_names)}",
-            image_path=os.path.join(current_app.config['UPLOAD_FOLDER'], team.photo_path.split('/')[1])
+            image_path=photo_for_width(team.photo_path, team.photo_widths,
+                                       current_app.config['TEAM_PHOTO_EMAIL_WIDTH'])
         )
     except Exception as e:
         current_app.logger.error(f"Failed to send admin email: {str(e)}")
@@ -414,6 +447,8 @@ def toggle_team_state(team_id):
     if not team:
         return False
 
+    game_state = get_game_state()
+
     # Toggle state
     if team.state == 'alive':
         team.state = 'dead'
@@ -422,6 +457,10 @@ def toggle_team_state(team_id):
         # Mark all players as dead
         for player in team.players:
             player.state = 'dead'
+
+        # Link the team's hunter straight to its target
+        if game_state.state == 'live':
+            remove_from_ring(team, game_state.round_number)
     else:
         team.state = 'alive'
         action = 'revived'
@@ -430,6 +469,12 @@ def toggle_team_state(team_id):
         for player in team.players:
             player.state = 'alive'
 
+        # Give the team a place back in the target ring
+        if game_state.state == 'live':
+            insert_into_ring(team, game_state.round_number)
+
+    invalidate_leaderboard()
+
     # Log the action
     log = ActionLog(
         action_type=f'team_{action}',
@@ -462,6 +507,8 @@ def toggle_player_state(player_id):
     if not player:
         return False
 
+    game_state = get_game_state()
+
     # Toggle state
     if player.is_alive:
         player.state = 'dead'
@@ -471,14 +518,23 @@ def toggle_player_state(player_id):
         team = Team.query.get(player.team_id)
         if all(not p.is_alive for p in team.players):
             team.state = 'dead'
+            if game_state.state == 'live':
+                remove_from_ring(team, game_state.round_number)
     else:
         player.state = 'alive'
         action = 'revived'
 
         # Ensure team is alive
         team = Team.query.get(player.team_id)
+        was_alive = team.is_alive
         team.state = 'alive'
 
+        # Give the team a place back in the target ring
+        if not was_alive and game_state.state == 'live':
+            insert_into_ring(team, game_state.round_number)
+
+    invalidate_leaderboard()
+
     # Log the action
     log = ActionLog(
         action_type=f'player_{action}',
@@ -628,6 +684,10 @@ def execute_db_command(sql_command):
         else:
             result_data = {'rowcount': result.rowcount}
 
+        # Raw SQL may have changed the standings or the game state
+        invalidate_leaderboard()
+        invalidate_game_state()
+
         # Log the action
         log = ActionLog(
             action_type='db_command',
@@ -696,9 +756,11 @@ def toggle_free_for_all(enable):
             )
             db.session.add(log)
         else:
-            # Reassign targets normally if disabling free-for-all
-            from app.services.game_service import assign_targets
-            assign_targets()
+            # Restore normal targeting from the maintained ring, only reshuffling
+            # if some alive team was left without a target
+            if not repair_target_ring():
+                from app.services.game_service import assign_targets
+                assign_targets()
 
             log = ActionLog(
                 action_type='free_for_all',
@@ -732,11 +794,16 @@ def deny_team(team_id):
     team_name = team.name
 
     try:
-        # First delete the associated players
+        # First delete the associated players and anything held for their digests
+        player_ids = db.session.query(Player.id).filter_by(team_id=team_id)
+        PendingNotification.query.filter(PendingNotification.player_id.in_(player_ids.scalar_subquery())).delete(
+            synchronize_session=False
+        )
         Player.query.filter_by(team_id=team_id).delete()
 
         # Then delete the team
         db.session.delete(team)
+        invalidate_leaderboard()
         db.session.commit()
 
         # Log the action
@@ -755,7 +822,9 @@ def deny_team(team_id):
 
 def send_mass_email_service(subject, content):
     """
-    Send a single email to all players with their email addresses visible to each other.
+    Queue an email to all players, in batches that keep their addresses hidden from each other.
+
+    The mail workers send the batches in the background.
 
     Args:
         subject (str): Email subject
@@ -772,7 +841,7 @@ def send_mass_email_service(subject, content):
             return False, "No players with email addresses found"
 
         # Import email service
-        from app.services.email_service import send_email
+        from app.services.email_service import send_bulk_email
 
         # Collect all email addresses
         email_addresses = [player.email for player in players if player.email]
@@ -780,26 +849,25 @@ def send_mass_email_service(subject, content):
         if not email_addresses:
             return False, "No valid email addresses found"
 
-        # Send a single email with all recipients in TO field
-        send_email(
+        # Sent in batches so players never see each other's addresses
+        if not send_bulk_email(
             subject=subject,
-            recipients=email_addresses,  # Pass the list of emails directly
+            recipients=email_addresses,
             text_body=content,
             html_body=None
-        )
-
-        current_app.logger.info(f"Mass email sent to {len(email_addresses)} players: {subject}")
+        ):
+            return False, "Could not queue the email"
 
         # Log the action
         log = ActionLog(
             action_type='mass_email',
-            description=f'Mass email sent to {len(email_addresses)} players: {subject}',
+            description=f'Mass email queued for {len(email_addresses)} players: {subject}',
             actor='admin'
         )
         db.session.add(log)
         db.session.commit()
 
-        return True, f"Email sent successfully to {len(email_addresses)} players"
+        return True, f"Email queued for {len(email_addresses)} players"
     except Exception as e:
         current_app.logger.error(f"Failed to send mass email: {str(e)}")
         return False, str(e)
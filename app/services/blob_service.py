@@ -0,0 +1,253 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+
+from app.services.storage_service import get_storage
+
+# Uploads are stored by content under UPLOAD_FOLDER/blobs/<kind>/<aa>/<bb>/<sha256>.<ext>
+BLOB_FOLDER = 'blobs'
+KIND_VIDEOS = 'videos'  # Kill videos and the renditions made from them
+KIND_PHOTOS = 'photos'  # Team photos
+
+# Bytes read from an upload at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def upload_name(stored_path):
+    """
+    Get the path of a stored upload within the upload folder.
+
+    Args:
+        stored_path (str): Path as stored in the database, such as 'uploads/blobs/videos/...'
+
+    Returns:
+        str: Path relative to the upload folder, such as 'blobs/videos/...'
+    """
+    stored_path = stored_path.replace('\\', '/').lstrip('/')
+    if stored_path.startswith('uploads/'):
+        stored_path = stored_path[len('uploads/'):]
+    return stored_path
+
+
+def upload_file_path(stored_path):
+    """
+    Get the location on disk of a stored upload.
+
+    Args:
+        stored_path (str): Path as stored in the database, such as 'uploads/blobs/videos/...'
+
+    Returns:
+        str: Absolute path of the file
+    """
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], upload_name(stored_path))
+
+
+def stored_path_for(file_path):
+    """
+    Get the path to store in the database for a file in the upload folder.
+
+    Args:
+        file_path (str): Absolute path of the file
+
+    Returns:
+        str: Path as stored in the database, such as 'uploads/blobs/videos/...'
+    """
+    relative_path = os.path.relpath(file_path, current_app.config['UPLOAD_FOLDER'])
+    return 'uploads/' + relative_path.replace(os.sep, '/')
+
+
+def _blob_relative_path(kind, digest, ext):
+    # Two levels of 256 folders keep every directory small
+    return '/'.join([BLOB_FOLDER, kind, digest[:2], digest[2:4], f"{digest}.{ext}"])
+
+
+def _adopt(temp_path, kind, digest, ext):
+    """
+    Move a hashed file into the store, or drop it if the content is already there.
+
+    Returns:
+        tuple: (relative path as stored in the database, whether the blob already existed)
+    """
+    relative_path = _blob_relative_path(kind, digest, ext)
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+
+    if os.path.exists(path) or get_storage().exists(relative_path):
+        os.remove(temp_path)
+        return f"uploads/{relative_path}", True
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A rename when the file is on the same disk, a copy otherwise
+    shutil.move(temp_path, path)
+    return f"uploads/{relative_path}", False
+
+
+def store_stream(stream, ext, kind):
+    """
+    Write an upload to the store, hashing it on the way to disk.
+
+    Args:
+        stream: File-like object to read the upload from
+        ext (str): File extension, without the dot
+        kind (str): KIND_VIDEOS or KIND_PHOTOS
+
+    Returns:
+        tuple: (relative path as stored in the database, whether the blob already existed)
+    """
+    staging = os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER)
+    os.makedirs(staging, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(prefix='.incoming_', dir=staging)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for block in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                digest.update(block)
+                temp_file.write(block)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return _adopt(temp_path, kind, digest.hexdigest(), ext.lower())
+
+
+def store_file(path, ext, kind, digest=None):
+    """
+    Move a file that is already on disk into the store.
+
+    Args:
+        path (str): File to move; it is removed either way
+        ext (str): File extension, without the dot
+        kind (str): KIND_VIDEOS or KIND_PHOTOS
+        digest (str, optional): SHA-256 hex digest of the file, if already known
+
+    Returns:
+        tuple: (relative path as stored in the database, whether the blob already existed)
+    """
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+
+    return _adopt(path, kind, digest, ext.lower())
+
+
+def blob_exists(stored_path):
+    """
+    Check whether an upload exists, either in the working area or in the media store.
+
+    Args:
+        stored_path (str): Path as stored in the database
+
+    Returns:
+        bool: True if the file exists
+    """
+    return os.path.isfile(upload_file_path(stored_path)) or get_storage().exists(upload_name(stored_path))
+
+
+def blob_size(stored_path):
+    """
+    Get the size of an upload, from the working area if it is still there.
+
+    Args:
+        stored_path (str): Path as stored in the database
+
+    Returns:
+        int: Size in bytes
+    """
+    path = upload_file_path(stored_path)
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return get_storage().size(upload_name(stored_path))
+
+
+def open_blob(stored_path):
+    """
+    Open an upload for reading, from the working area if it is still there.
+
+    Args:
+        stored_path (str): Path as stored in the database
+
+    Returns:
+        Binary file-like object
+    """
+    path = upload_file_path(stored_path)
+    if os.path.isfile(path):
+        return open(path, 'rb')
+    return get_storage().open(upload_name(stored_path))
+
+
+@contextlib.contextmanager
+def local_copy(stored_path):
+    """
+    Get a file on this machine holding an upload, for tools that need a path.
+
+    Files kept in a remote store are downloaded to a temporary file, which
+    is deleted when the block ends.
+
+    Args:
+        stored_path (str): Path as stored in the database
+
+    Yields:
+        str: Path of the file
+    """
+    path = upload_file_path(stored_path)
+    if os.path.isfile(path):
+        yield path
+        return
+
+    fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as output, contextlib.closing(open_blob(stored_path)) as source:
+            shutil.copyfileobj(source, output, COPY_BUFFER_SIZE)
+        yield temp_path
+    finally:
+        os.remove(temp_path)
+
+
+def publish_blobs(*stored_paths):
+    """
+    Hand finished uploads over from the working area to the media store.
+
+    With the local store the working area is the store, so nothing moves.
+    Paths that are None or no longer in the working area are skipped.
+
+    Args:
+        *stored_paths (str): Paths as stored in the database
+    """
+    storage = get_storage()
+    for stored_path in stored_paths:
+        if not stored_path:
+            continue
+        path = upload_file_path(stored_path)
+        if storage.local_path(upload_name(stored_path)) is None and os.path.isfile(path):
+            storage.put_file(upload_name(stored_path), path)
+
+
+def delete_blobs(*stored_paths):
+    """
+    Delete uploads from the working area and the media store.
+
+    Args:
+        *stored_paths (str): Paths as stored in the database
+    """
+    stored_paths = [stored_path for stored_path in stored_paths if stored_path]
+    for stored_path in stored_paths:
+        try:
+            os.remove(upload_file_path(stored_path))
+        except FileNotFoundError:
+            pass
+    get_storage().delete_many([upload_name(stored_path) for stored_path in stored_paths])
+
+
+def delete_all_blobs():
+    """
+    Delete every stored upload in one sweep of the store.
+    """
+    shutil.rmtree(os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER), ignore_errors=True)
+    get_storage().delete_prefix(f'{BLOB_FOLDER}/')
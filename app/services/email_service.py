@@ -1,107 +1,97 @@
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-
 from flask import current_app, render_template
 
-from app.models import Player, Team, GameState
+from app.models import db, Player, Team, KillConfirmation
+from app.services.state_service import get_game_state
+from app.services.outbox_service import enqueue_email, enqueue_fan_out
+from app.services.notification_service import (
+    EVENT_KILL_SUBMISSION, get_instant_recipients, queue_digest_event, collect_due_digests, mark_notifications_sent
+)
 
 
-def send_email(subject, recipients, text_body, html_body=None):
+def send_email(subject, recipients, text_body, html_body=None, idempotency_key=None):
     """
-    Send an email with the given subject and body to the specified recipients.
+    Queue an email with the given subject and body to the specified recipients.
+
+    The email is sent by the mail workers, so the caller never waits on the
+    mail server.
 
     Args:
         subject (str): Email subject
         recipients (list): List of email addresses
         text_body (str): Plain text email body
         html_body (str, optional): HTML email body
+        idempotency_key (str, optional): Emails with the same key are only ever sent once
 
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if queued, False otherwise
     """
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
-        msg['To'] = ', '.join(recipients)
-
-        # Attach text part
-        text_part = MIMEText(text_body, 'plain')
-        msg.attach(text_part)
-
-        # Attach HTML part if provided
-        if html_body:
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
-
-        # Connect to the mail server
-        server = smtplib.SMTP(
-            current_app.config['MAIL_SERVER'],
-            current_app.config['MAIL_PORT']
-        )
-
-        if current_app.config['MAIL_USE_TLS']:
-            server.starttls()
-
-        # Login if credentials are provided
-        if current_app.config['MAIL_USERNAME'] and current_app.config['MAIL_PASSWORD']:
-            server.login(
-                current_app.config['MAIL_USERNAME'],
-                current_app.config['MAIL_PASSWORD']
-            )
-
-        # Send the email
-        server.sendmail(
-            current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients,
-            msg.as_string()
-        )
-
-        # Close the connection
-        server.quit()
-
-        current_app.logger.info(f'Email sent to {len(recipients)} recipients: {subject}')
+        enqueue_email(subject, recipients, text_body, html_body, idempotency_key=idempotency_key)
+
+        current_app.logger.info(f'Email queued for {len(recipients)} recipients: {subject}')
         return True
 
     except Exception as e:
-        current_app.logger.error(f'Failed to send email: {str(e)}')
+        current_app.logger.error(f'Failed to queue email: {str(e)}')
         return False
 
 
-def send_all_players_email(subject, text_body, html_body=None):
+def send_bulk_email(subject, recipients, text_body, html_body=None, idempotency_key=None):
+    """
+    Queue an email to many recipients in batches that keep their addresses private.
+
+    Args:
+        subject (str): Email subject
+        recipients (list): List of email addresses
+        text_body (str): Plain text email body
+        html_body (str, optional): HTML email body
+        idempotency_key (str, optional): The email is only ever queued once per key
+
+    Returns:
+        bool: True if queued, False otherwise
+    """
+    try:
+        batches = enqueue_fan_out(subject, recipients, text_body, html_body, idempotency_key=idempotency_key)
+
+        current_app.logger.info(f'Email queued for {len(recipients)} recipients in {batches} batches: {subject}')
+        return True
+
+    except Exception as e:
+        current_app.logger.error(f'Failed to queue email: {str(e)}')
+        return False
+
+
+def send_all_players_email(subject, text_body, html_body=None, idempotency_key=None):
     """Send an email to all players in the game."""
-    players = Player.query.all()
-    recipients = [player.email for player in players]
+    recipients = [email for email, in db.session.query(Player.email)]
 
     if recipients:
-        return send_email(subject, recipients, text_body, html_body)
+        return send_bulk_email(subject, recipients, text_body, html_body, idempotency_key)
     return False
 
 
-def send_alive_players_email(subject, text_body, html_body=None):
+def send_alive_players_email(subject, text_body, html_body=None, idempotency_key=None):
     """Send an email to all players that are still alive in the game."""
-    players = Player.query.filter_by(state='alive').all()
-    recipients = [player.email for player in players]
+    recipients = [email for email, in db.session.query(Player.email).filter(Player.state == 'alive')]
 
     if recipients:
-        return send_email(subject, recipients, text_body, html_body)
+        return send_bulk_email(subject, recipients, text_body, html_body, idempotency_key)
     return False
 
 
-def send_team_email(team_id, subject, text_body, html_body=None):
+def send_team_email(team_id, subject, text_body, html_body=None, idempotency_key=None):
     """Send an email to all players in a specific team."""
     players = Player.query.filter_by(team_id=team_id).all()
     recipients = [player.email for player in players]
 
     if recipients:
-        return send_email(subject, recipients, text_body, html_body)
+        return send_email(subject, recipients, text_body, html_body, idempotency_key)
     return False
 
 
 def send_new_round_notification(round_number):
     """Send a notification email about a new round starting."""
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     subject = f"Senior Assassin - Round {round_number} Started"
 
@@ -130,7 +120,7 @@ def send_team_signup_notification(team_id):
     Args:
         team_id: ID of the team that signed up
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     team = Team.query.get(team_id)
     if not team:
@@ -158,7 +148,7 @@ def send_team_signup_notification(team_id):
         game_state=game_state
     )
 
-    return send_team_email(team_id, subject, text_body, html_body)
+    return send_team_email(team_id, subject, text_body, html_body, f'team_signup:{team_id}')
 
 
 def send_team_approval_notification(team_id):
@@ -168,7 +158,7 @@ def send_team_approval_notification(team_id):
     Args:
         team_id: ID of the team that was approved
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     team = Team.query.get(team_id)
     if not team:
@@ -195,7 +185,7 @@ def send_team_approval_notification(team_id):
         team=team, game_state=game_state
     )
 
-    return send_team_email(team_id, subject, text_body, html_body)
+    return send_team_email(team_id, subject, text_body, html_body, f'team_approval:{team_id}')
 
 
 def send_team_elimination_notification(team_id):
@@ -205,7 +195,7 @@ def send_team_elimination_notification(team_id):
     Args:
         team_id: ID of the team that was eliminated
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     team = Team.query.get(team_id)
     if not team:
@@ -231,17 +221,21 @@ def send_team_elimination_notification(team_id):
         team=team, game_state=game_state
     )
 
-    return send_team_email(team_id, subject, text_body, html_body)
+    # A team revived and eliminated again in a later round gets another email
+    return send_team_email(team_id, subject, text_body, html_body,
+                           f'team_elimination:{team_id}:{team.eliminated_in_round}')
 
 
 def send_kill_submission_notification(kill_confirmation):
     """
     Send a notification email about a kill submission that needs to be voted on.
 
+    Players on digest delivery get the kill in their next digest instead.
+
     Args:
         kill_confirmation: KillConfirmation object
     """
-    game_state = GameState.query.first()
+    game_state = get_game_state()
 
     subject = "Senior Assassin - New Kill Submission Requires Your Vote"
 
@@ -251,6 +245,20 @@ def send_kill_submission_notification(kill_confirmation):
     victim_team = Team.query.get(victim.team_id)
     attacker_team = Team.query.get(attacker.team_id)
 
+    queue_digest_event(EVENT_KILL_SUBMISSION, kill_confirmation.id, {
+        'kill_confirmation_id': kill_confirmation.id,
+        'attacker': attacker.name,
+        'attacker_team': attacker_team.name,
+        'victim': victim.name,
+        'victim_team': victim_team.name,
+        'kill_time': kill_confirmation.kill_time.strftime('%Y-%m-%d %H:%M'),
+        'round_number': kill_confirmation.round_number
+    })
+
+    recipients = get_instant_recipients()
+    if not recipients:
+        return True
+
     # Create the email body
     text_body = f"""
     A new kill has been submitted and requires your vote.
@@ -274,8 +282,97 @@ def send_kill_submission_notification(kill_confirmation):
         kill_confirmation=kill_confirmation
     )
 
-    # Send to all players
-    return send_all_players_email(subject, text_body, html_body)
+    # Send to every player who wants it straight away
+    return send_bulk_email(subject, recipients, text_body, html_body, f'kill_submission:{kill_confirmation.id}')
+
+
+def send_kill_submission_digest(kills, recipients, idempotency_key=None):
+    """
+    Send one email about several kill submissions that need to be voted on.
+
+    Kills that were decided while the digest was held are left out.
+
+    Args:
+        kills (list): Kill details as held by queue_digest_event
+        recipients (list): List of email addresses
+        idempotency_key (str, optional): The digest is only ever queued once per key
+
+    Returns:
+        bool: True if queued or there was nothing left to send, False otherwise
+    """
+    pending_ids = {kill_id for kill_id, in db.session.query(KillConfirmation.id).filter(
+        KillConfirmation.id.in_([kill['kill_confirmation_id'] for kill in kills]),
+        KillConfirmation.status == 'pending'
+    )}
+    kills = [kill for kill in kills if kill['kill_confirmation_id'] in pending_ids]
+    if not kills:
+        return True
+
+    game_state = get_game_state()
+
+    if len(kills) == 1:
+        subject = "Senior Assassin - 1 New Kill Needs Your Vote"
+    else:
+        subject = f"Senior Assassin - {len(kills)} New Kills Need Your Vote"
+
+    kill_lines = '\n'.join(
+        f"    - {kill['attacker']} (Team {kill['attacker_team']}) eliminated {kill['victim']} "
+        f"(Team {kill['victim_team']}) at {kill['kill_time']}, round {kill['round_number']}"
+        for kill in kills
+    )
+
+    text_body = f"""
+    {len(kills)} new kill submission{'s' if len(kills) != 1 else ''} require your vote.
+
+{kill_lines}
+
+    Please log in to the game portal to review the kill submission videos and cast your votes.
+    Your votes must be submitted within 24 hours.
+    """
+
+    html_body = render_template(
+        'email/kill_submission_digest.html',
+        game_state=game_state,
+        kills=kills
+    )
+
+    return send_bulk_email(subject, recipients, text_body, html_body, idempotency_key)
+
+
+# Digest email for each event type that can be held back
+DIGEST_SENDERS = {
+    EVENT_KILL_SUBMISSION: send_kill_submission_digest
+}
+
+
+def send_notification_digests(app=None):
+    """
+    Send the digests whose window has closed to players on digest delivery.
+
+    Args:
+        app: Flask app object (optional)
+
+    Returns:
+        int: Number of digests sent
+    """
+    app = app or current_app._get_current_object()
+
+    # A request context lets the email templates build external links
+    with app.test_request_context(base_url=app.config['BASE_URL']):
+        return _do_send_notification_digests()
+
+
+def _do_send_notification_digests():
+    sent = 0
+    for digest in collect_due_digests():
+        sender = DIGEST_SENDERS.get(digest['event_type'])
+        if sender and not sender(digest['payloads'], digest['recipients'], digest['key']):
+            # Held for the next run
+            continue
+
+        mark_notifications_sent(digest['ids'])
+        sent += 1
+    return sent
 
 
 def send_custom_email(email, subject, content):
@@ -1,15 +1,23 @@
 import json
 import datetime
 import json
-import random
+import threading
 
-from app.models import db, Team, Player, GameState, KillConfirmation, KillVote, ActionLog
-from app.services.email_service import send_kill_submission_notification
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Team, Player, GameState, KillConfirmation, KillVote, ActionLog, TargetHistory
 from app.services.admin_email_service import send_admin_targets
+from app.services.target_service import build_assignments
+from app.services.state_service import get_game_state, get_state_versions, forget_state_versions, invalidate_game_state
+from app.services.submission_service import queue_kill_processing
 
 def assign_targets():
     """
-    Randomly assign target teams to each alive team.
+    Assign target teams to each alive team as a single cycle.
+
+    The configured assignment engine avoids giving a team a target it had in
+    the last few rounds, relaxing that constraint only when it cannot be met.
 
     Returns:
         bool: True if successful, False otherwise
@@ -21,19 +29,44 @@ def assign_targets():
     if len(alive_teams) < 2:
         return False
 
-    # Shuffle the teams
-    random.shuffle(alive_teams)
+    game_state = GameState.query.first()
+    round_number = game_state.round_number
+    history_rounds = current_app.config['TARGET_HISTORY_ROUNDS']
+
+    # Load the assignments of the previous rounds, most recent round first
+    history = {}
+    for past_round, team_id, target_id in db.session.query(
+            TargetHistory.round_number, TargetHistory.team_id, TargetHistory.target_id
+    ).filter(
+        TargetHistory.round_number < round_number,
+        TargetHistory.round_number >= round_number - history_rounds
+    ):
+        history.setdefault(past_round, {})[team_id] = target_id
+
+    assignments, rounds_avoided = build_assignments(
+        [team.id for team in alive_teams],
+        [history[past_round] for past_round in sorted(history, reverse=True)],
+        engine=current_app.config['TARGET_ASSIGNMENT_ENGINE']
+    )
+
+    for team in alive_teams:
+        team.target_id = assignments[team.id]
 
-    # Assign targets in a circular fashion
-    for i in range(len(alive_teams)):
-        current_team = alive_teams[i]
-        target_team = alive_teams[(i + 1) % len(alive_teams)]
-        current_team.target_id = target_team.id
+    # Every player's cached view depends on the target assignments
+    invalidate_game_state()
+
+    # Replace any earlier assignment made for this round
+    TargetHistory.query.filter_by(round_number=round_number).delete()
+    db.session.execute(db.insert(TargetHistory), [
+        {'round_number': round_number, 'team_id': team_id, 'target_id': target_id}
+        for team_id, target_id in assignments.items()
+    ])
 
     # Log the action
     log = ActionLog(
         action_type='target_assignment',
-        description=f'Targets assigned to {len(alive_teams)} teams',
+        description=f'Targets assigned to {len(alive_teams)} teams '
+                    f'avoiding targets from the last {rounds_avoided} rounds',
         actor='system'
     )
     db.session.add(log)
@@ -47,98 +80,232 @@ def assign_targets():
     return True
 
 
+def remove_from_ring(team, round_number):
+    """
+    Splice a team out of the target ring by linking its hunter straight to its target.
+
+    Only the hunter and the removed team are touched. The hunter is credited with
+    clearing its target for the round, since its old target team is now gone.
+
+    Args:
+        team: Team leaving the ring
+        round_number (int): Current round number
+    """
+    next_target_id = team.target_id
+
+    hunters = Team.query.filter(Team.target_id == team.id, Team.id != team.id).all()
+    for hunter in hunters:
+        hunter.target_id = next_target_id if next_target_id != hunter.id else None
+        hunter.target_cleared_round = round_number
+
+    team.target_id = None
+
+
+def insert_into_ring(team, round_number):
+    """
+    Link a team back into the target ring next to an existing alive team.
+
+    The team that now hunts it is credited with clearing its target for the
+    round, since it lost its old target partway through the round.
+
+    Args:
+        team: Team joining the ring
+        round_number (int): Current round number
+    """
+    anchor = Team.query.filter(
+        Team.state == 'alive',
+        Team.id != team.id,
+        Team.target_id.isnot(None)
+    ).first()
+
+    if anchor:
+        team.target_id = anchor.target_id if anchor.target_id != team.id else anchor.id
+        anchor.target_id = team.id
+        anchor.target_cleared_round = round_number
+        return
+
+    # No ring yet, pair up with any other alive team
+    other = Team.query.filter(Team.state == 'alive', Team.id != team.id).first()
+    if other:
+        other.target_id = team.id
+        other.target_cleared_round = round_number
+        team.target_id = other.id
+
+
+def repair_target_ring():
+    """
+    Splice every dead team out of the target ring in a single pass.
+
+    Each alive team follows its chain of targets until it reaches an alive team,
+    and only the rows whose target changes are updated.
+
+    Returns:
+        bool: True if every alive team has a target, False if a reshuffle is needed
+    """
+    rows = db.session.query(Team.id, Team.state, Team.target_id).all()
+    states = {team_id: state for team_id, state, _ in rows}
+    targets = {team_id: target_id for team_id, _, target_id in rows}
+    alive_ids = [team_id for team_id, state, _ in rows if state == 'alive']
+
+    changes = []
+    intact = True
+    for team_id in alive_ids:
+        next_id = targets[team_id]
+        seen = set()
+        while next_id is not None and states.get(next_id) != 'alive' and next_id not in seen:
+            seen.add(next_id)
+            next_id = targets.get(next_id)
+
+        if next_id == team_id or states.get(next_id) != 'alive':
+            next_id = None
+        if next_id is None and len(alive_ids) > 1:
+            intact = False
+        if next_id != targets[team_id]:
+            changes.append({'id': team_id, 'target_id': next_id})
+
+    if changes:
+        db.session.execute(db.update(Team), changes)
+
+    # Dead teams no longer hold a place in the ring
+    db.session.execute(
+        db.update(Team)
+        .where(Team.state != 'alive', Team.target_id.isnot(None))
+        .values(target_id=None),
+        execution_options={'synchronize_session': False}
+    )
+
+    return intact
+
+
 def increment_rounds():
     game_state = GameState.query.first()
     game_state.round_start = datetime.datetime.now()
     game_state.round_number += 1
 
 
+def get_round_outcomes(round_number):
+    """
+    Resolve the current round for every alive team in a single aggregate query.
+
+    Each alive team with a target is joined to its target's players and the
+    number of eliminated targets is counted in the database, so the cost does
+    not grow with one query per team. Teams whose target was wiped out earlier
+    in the round count as having eliminated all of their targets.
+
+    Args:
+        round_number (int): Round being resolved
+
+    Returns:
+        tuple: (teams_to_revive, teams_to_eliminate) - lists of (team_id, team_name)
+    """
+    eliminated = db.func.sum(db.case((Player.state != 'alive', 1), else_=0))
+    rows = db.session.query(
+        Team.id,
+        Team.name,
+        Team.target_cleared_round,
+        db.func.count(Player.id),
+        eliminated
+    ).outerjoin(
+        Player, Player.team_id == Team.target_id
+    ).filter(
+        Team.state == 'alive',
+        db.or_(Team.target_id.isnot(None), Team.target_cleared_round == round_number)
+    ).group_by(Team.id, Team.name, Team.target_cleared_round).all()
+
+    teams_to_revive = []
+    teams_to_eliminate = []
+
+    for team_id, team_name, cleared_round, total_targets, eliminated_count in rows:
+        eliminated_count = eliminated_count or 0
+
+        if cleared_round == round_number:
+            # Rule: Team's target was wiped out during the round, revive any dead players
+            teams_to_revive.append((team_id, team_name))
+        elif eliminated_count == 0:
+            # Rule: Team didn't eliminate any targets, they're eliminated
+            teams_to_eliminate.append((team_id, team_name))
+        elif eliminated_count == total_targets:
+            # Rule: Team eliminated all targets, revive any dead players
+            teams_to_revive.append((team_id, team_name))
+        # Otherwise the team moves on and dead players stay dead
+
+    return teams_to_revive, teams_to_eliminate
+
+
 def game_logic():
     """
     Implements game rules for round transitions:
     - If a team eliminated all their targets, they move on and any eliminated players are revived
     - If a team eliminated at least one target, they move on (eliminated players stay dead)
     - If a team didn't eliminate any targets, the entire team is eliminated
+
+    Outcomes are computed from a snapshot of the round taken before any changes
+    are applied, then written back as bulk UPDATEs with the log rows inserted in
+    one batch.
     """
     game_state = GameState.query.first()
-    alive_teams = Team.query.filter_by(state='alive').all()
+    round_number = game_state.round_number
 
-    # Add debug logs
-    print(f"Game logic - Round {game_state.round_number} - Processing {len(alive_teams)} alive teams")
+    teams_to_revive, teams_to_eliminate = get_round_outcomes(round_number)
 
-    # Track teams to be eliminated
-    teams_to_eliminate = []
+    print(f"Game logic - Round {round_number} - "
+          f"{len(teams_to_revive)} teams reviving, {len(teams_to_eliminate)} teams eliminated")
 
-    # Check each team's performance
-    for team in alive_teams:
-        # Get the team's current target
-        target_team = Team.query.get(team.target_id) if team.target_id else None
-        if not target_team:
-            print(f"Team {team.name} has no target, skipping")
-            continue
+    logs = []
 
-        # Get target team's players
-        target_players = Player.query.filter_by(team_id=target_team.id).all()
+    # Revive dead players on teams that eliminated all of their targets
+    revive_ids = [team_id for team_id, _ in teams_to_revive]
+    if revive_ids:
+        revived_players = db.session.query(Player.name).filter(
+            Player.team_id.in_(revive_ids),
+            Player.state != 'alive'
+        ).all()
 
-        # Count how many of the target's players were eliminated (by any means)
-        eliminated_count = 0
-        total_targets = len(target_players)
+        db.session.execute(
+            db.update(Player)
+            .where(Player.team_id.in_(revive_ids), Player.state != 'alive')
+            .values(state='alive'),
+            execution_options={'synchronize_session': False}
+        )
 
-        print(f"Team {team.name} targeting {target_team.name} with {total_targets} players")
+        logs.extend({
+            'action_type': 'player_revival',
+            'description': f'Player {name} revived for round {round_number}',
+            'actor': 'system'
+        } for name, in revived_players)
+
+    # Eliminate teams that failed to eliminate any targets, along with their players
+    eliminate_ids = [team_id for team_id, _ in teams_to_eliminate]
+    if eliminate_ids:
+        db.session.execute(
+            db.update(Team)
+            .where(Team.id.in_(eliminate_ids))
+            .values(state='dead'),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            db.update(Player)
+            .where(Player.team_id.in_(eliminate_ids))
+            .values(state='dead'),
+            execution_options={'synchronize_session': False}
+        )
 
-        for target_player in target_players:
-            # Check if this player is eliminated (by any means - not just through obituaries)
-            if not target_player.is_alive:
-                eliminated_count += 1
-                print(f"Found eliminated player: {target_player.name}")
+        logs.extend({
+            'action_type': 'team_elimination',
+            'description': f'Team {name} eliminated in round {round_number} for failing to eliminate targets',
+            'actor': 'system'
+        } for _, name in teams_to_eliminate)
 
-        print(f"Team {team.name} eliminated {eliminated_count}/{total_targets} targets")
+        # Link the hunters of eliminated teams straight to their next alive target
+        repair_target_ring()
 
-        # Apply game rules
-        if eliminated_count == 0:
-            # Rule: Team didn't eliminate any targets, they're eliminated
-            print(f"Team {team.name} eliminated 0 targets - marking for elimination")
-            teams_to_eliminate.append(team)
-        elif eliminated_count == total_targets:
-            # Rule: Team eliminated all targets, revive any dead players
-            print(f"Team {team.name} eliminated all targets - reviving dead members")
-            for player in Player.query.filter_by(team_id=team.id).all():
-                if not player.is_alive:
-                    player.state = 'alive'
-                    print(f"Reviving player {player.name}")
-
-                    # Log the revival
-                    log = ActionLog(
-                        action_type='player_revival',
-                        description=f'Player {player.name} revived for round {game_state.round_number}',
-                        actor='system'
-                    )
-                    db.session.add(log)
-        else:
-            # Rule: Team eliminated some but not all targets - they move on but dead players stay dead
-            print(f"Team {team.name} eliminated some targets - advancing without revival")
-
-    # Process team eliminations
-    print(f"Processing {len(teams_to_eliminate)} teams for elimination")
-    for team in teams_to_eliminate:
-        team.state = 'dead'
-        print(f"Marking team {team.name} as dead")
-
-        # Mark all team members as dead - ONLY for the teams that failed
-        team_players = Player.query.filter_by(team_id=team.id).all()
-        for player in team_players:
-            player.state = 'dead'
-            print(f"Marking player {player.name} from team {team.name} as dead")
-
-        # Log the team elimination
-        log = ActionLog(
-            action_type='team_elimination',
-            description=f'Team {team.name} eliminated in round {game_state.round_number} for failing to eliminate targets',
-            actor='system'
-        )
-        db.session.add(log)
+    if revive_ids or eliminate_ids:
+        invalidate_leaderboard()
 
-    # Commit all changes
+    if logs:
+        db.session.execute(db.insert(ActionLog), logs)
+
+    # Commit all changes (this also expires any stale objects in the session)
     db.session.commit()
     print("Game logic complete - changes committed")
 
@@ -160,7 +327,7 @@ def submit_kill(victim_id, attacker_id, kill_time, video_path):
     """
     print("trace")
     # Get game state
-    game_state = GameState.query.first()
+    game_state = get_game_state()
     
     # Get the players
     victim = Player.query.get(victim_id)
@@ -213,9 +380,12 @@ def submit_kill(victim_id, attacker_id, kill_time, video_path):
     
     # Commit changes
     db.session.commit()
+
+    # Make sure the expiry sweep knows about the new confirmation
+    schedule_kill_expiry(current_app._get_current_object())
     
-    # Send notifications
-    send_kill_submission_notification(kill_confirmation)
+    # Transcode the video and send notifications in the background
+    queue_kill_processing(kill_confirmation)
 
     return kill_confirmation
 
@@ -262,22 +432,30 @@ def vote_on_kill(kill_confirmation_id, voter_id, vote):
     if voter_id == kill_confirmation.victim_id or voter_id == kill_confirmation.attacker_id:
         return False, "You cannot vote on your own kill confirmation"
     
-    # Check if voter has already voted
-    existing_vote = KillVote.query.filter_by(
-        kill_confirmation_id=kill_confirmation_id,
-        voter_id=voter_id
-    ).first()
-    
-    if existing_vote:
-        return False, "You have already voted on this kill confirmation"
-    
-    # Create a new vote
+    # Record the vote, relying on the unique (kill_confirmation_id, voter_id)
+    # constraint to turn away a second vote from the same voter
     kill_vote = KillVote(
         kill_confirmation_id=kill_confirmation_id,
         voter_id=voter_id,
         vote=vote
     )
     db.session.add(kill_vote)
+
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return False, "You have already voted on this kill confirmation"
+
+    # Count the vote with an atomic increment, so concurrent voters never read
+    # and rewrite the same tally
+    tally = KillConfirmation.approve_count if vote else KillConfirmation.reject_count
+    approve_votes, reject_votes = db.session.execute(
+        db.update(KillConfirmation)
+        .where(KillConfirmation.id == kill_confirmation_id)
+        .values({tally: tally + 1})
+        .returning(KillConfirmation.approve_count, KillConfirmation.reject_count)
+    ).one()
     
     # Log the action
     log = ActionLog(
@@ -288,21 +466,28 @@ def vote_on_kill(kill_confirmation_id, voter_id, vote):
     db.session.add(log)
     
     # Check if voting threshold reached
-    game_state = GameState.query.first()
+    game_state = get_game_state()
     threshold = game_state.voting_threshold
-    
-    # Get updated vote counts
-    db.session.flush()
-    approve_votes = sum(1 for v in kill_confirmation.votes if v.vote)
-    reject_votes = sum(1 for v in kill_confirmation.votes if not v.vote)
+
+    if approve_votes >= threshold:
+        new_status = 'approved'
+    elif reject_votes >= threshold:
+        new_status = 'rejected'
+    else:
+        new_status = None
+
+    # Only the vote that moves the confirmation out of pending acts on the decision
+    decided = new_status is not None and db.session.execute(
+        db.update(KillConfirmation)
+        .where(KillConfirmation.id == kill_confirmation_id, KillConfirmation.status == 'pending')
+        .values(status=new_status)
+    ).rowcount == 1
     
     # Determine if threshold reached
-    if approve_votes >= threshold:
-        kill_confirmation.status = 'approved'
+    if decided and new_status == 'approved':
         confirm_kill(kill_confirmation)
         message = "Kill confirmed"
-    elif reject_votes >= threshold:
-        kill_confirmation.status = 'rejected'
+    elif decided:
         message = "Kill rejected"
     else:
         message = "Vote recorded"
@@ -350,8 +535,10 @@ def confirm_kill(kill_confirmation):
     victim_team = Team.query.get(victim.team_id)
     if all(not player.is_alive for player in victim_team.players):
         victim_team.state = 'dead'
-
+        remove_from_ring(victim_team, get_game_state().round_number)
     
+    invalidate_leaderboard()
+
     # Log the action
     log = ActionLog(
         action_type='kill_confirmed',
@@ -408,46 +595,92 @@ def check_game_complete():
     
     return False
 
-def get_kill_confirmations_for_voter(voter_id):
+def get_kill_confirmations_for_voter(voter_id, after=None, limit=None):
     """
-    Get all pending kill confirmations for a voter.
-    
+    Get a page of pending kill confirmations a voter can still vote on.
+
+    Confirmations the voter already voted on are excluded by an anti-join, and
+    expired ones by the query itself. Pages are ordered by expiration time so
+    the most urgent confirmations come first.
+
     Args:
         voter_id (str): ID of the voter
-    
+        after (str, optional): ID of the last confirmation on the previous page
+        limit (int, optional): Page size, defaults to VOTING_PAGE_SIZE
+
     Returns:
-        list: List of pending kill confirmations
+        tuple: (kill_confirmations, next_after) - the page of confirmations with
+               attacker, victim and their teams loaded, and the ID to pass as
+               ``after`` for the next page (None on the last page)
     """
-    # Find all pending kill confirmations
-    pending_kills = KillConfirmation.query.filter_by(status='pending').all()
-    
-    # Filter out confirmations the voter has already voted on
-    voted_ids = [vote.kill_confirmation_id for vote in KillVote.query.filter_by(voter_id=voter_id).all()]
-    
-    # Filter out confirmations where the voter is the victim or attacker
-    return [
-        kill for kill in pending_kills 
-        if kill.id not in voted_ids 
-        and kill.victim_id != voter_id 
-        and kill.attacker_id != voter_id
-        and kill.expiration_time > datetime.datetime.now()
-    ]
+    limit = limit or current_app.config['VOTING_PAGE_SIZE']
+
+    already_voted = db.session.query(KillVote.id).filter(
+        KillVote.kill_confirmation_id == KillConfirmation.id,
+        KillVote.voter_id == voter_id
+    ).exists()
+
+    query = KillConfirmation.query.options(
+        db.joinedload(KillConfirmation.attacker).joinedload(Player.team),
+        db.joinedload(KillConfirmation.victim).joinedload(Player.team)
+    ).filter(
+        KillConfirmation.status == 'pending',
+        KillConfirmation.expiration_time > datetime.datetime.now(),
+        KillConfirmation.victim_id != voter_id,
+        KillConfirmation.attacker_id != voter_id,
+        ~already_voted
+    )
 
-def get_leaderboard():
+    if after:
+        # Keyset pagination: continue after the last confirmation of the previous page
+        after_expiration = db.session.query(KillConfirmation.expiration_time).filter(
+            KillConfirmation.id == after
+        ).scalar_subquery()
+        query = query.filter(db.or_(
+            KillConfirmation.expiration_time > after_expiration,
+            db.and_(
+                KillConfirmation.expiration_time == after_expiration,
+                KillConfirmation.id > after
+            )
+        ))
+
+    kill_confirmations = query.order_by(
+        KillConfirmation.expiration_time, KillConfirmation.id
+    ).limit(limit + 1).all()
+
+    next_after = None
+    if len(kill_confirmations) > limit:
+        kill_confirmations = kill_confirmations[:limit]
+        next_after = kill_confirmations[-1].id
+
+    return kill_confirmations, next_after
+
+def invalidate_leaderboard():
     """
-    Get the game leaderboard.
-    
+    Mark the materialized leaderboard as stale in every worker.
+
+    The version bump is part of the caller's transaction, so it becomes visible
+    together with the change that caused it.
+    """
+    db.session.execute(
+        db.update(GameState).values(leaderboard_version=GameState.leaderboard_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    forget_state_versions()
+
+
+def _build_leaderboard():
+    """
+    Build the sorted leaderboard from the database.
+
     Returns:
         list: List of teams sorted by status and eliminations
     """
-    # Get all teams
-    teams = Team.query.all()
-    
-    # Get player data for each team
+    # Load every team with its players in one batch
+    teams = Team.query.options(db.selectinload(Team.players)).all()
+
     leaderboard = []
     for team in teams:
-        players = Player.query.filter_by(team_id=team.id).all()
-        
         leaderboard.append({
             'team_id': team.id,
             'team_name': team.name,
@@ -458,10 +691,10 @@ def get_leaderboard():
                     'player_id': player.id,
                     'player_name': player.name,
                     'state': player.state
-                } for player in players
+                } for player in team.players
             ]
         })
-    
+
     # Sort the leaderboard:
     # 1. Alive teams first
     # 2. Then by number of eliminations (descending)
@@ -470,9 +703,124 @@ def get_leaderboard():
         0 if x['state'] == 'alive' else 1,
         -x['eliminations']
     ))
-    
+
     return leaderboard
 
+
+# Stands in for the version before the leaderboard has been built; never equal to a stored version
+_NOT_BUILT = object()
+
+# Materialized leaderboard for this process as (version, leaderboard)
+_leaderboard_cache = (_NOT_BUILT, [])
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard():
+    """
+    Get the game leaderboard.
+
+    The sorted leaderboard is kept in memory and only rebuilt when another
+    request or worker has bumped the leaderboard version since it was built.
+    The version says that something changed but not which teams, so the
+    rebuild reloads every team; without a game state row there is no version
+    to go by and the leaderboard is built fresh every time.
+
+    Returns:
+        list: List of teams sorted by status and eliminations (shared, do not modify)
+    """
+    global _leaderboard_cache
+
+    _, version = get_state_versions()
+    if version is None:
+        return _build_leaderboard()
+
+    cached_version, leaderboard = _leaderboard_cache
+    if cached_version == version:
+        return leaderboard
+
+    with _leaderboard_lock:
+        cached_version, leaderboard = _leaderboard_cache
+        if cached_version != version:
+            leaderboard = _build_leaderboard()
+            _leaderboard_cache = (version, leaderboard)
+        return leaderboard
+
+
+def expire_kill_confirmations():
+    """
+    Auto-reject every pending kill confirmation whose voting window has closed.
+
+    Returns:
+        int: Number of kill confirmations expired
+    """
+    expired = db.session.execute(
+        db.update(KillConfirmation)
+        .where(
+            KillConfirmation.status == 'pending',
+            KillConfirmation.expiration_time <= datetime.datetime.now()
+        )
+        .values(status='rejected'),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+    if expired:
+        # Log the whole batch once
+        log = ActionLog(
+            action_type='kill_expired',
+            description=f'{expired} kill confirmations expired and auto-rejected',
+            actor='system'
+        )
+        db.session.add(log)
+
+    db.session.commit()
+
+    return expired
+
+
+def schedule_kill_expiry(app):
+    """
+    Schedule the expiry sweep for the moment the next pending kill confirmation expires.
+
+    Args:
+        app: Flask application instance
+    """
+    from app import scheduler
+
+    with app.app_context():
+        next_expiry = db.session.query(db.func.min(KillConfirmation.expiration_time)).filter(
+            KillConfirmation.status == 'pending'
+        ).scalar()
+
+    if next_expiry is None:
+        # Nothing pending, the next kill submission schedules the sweep again
+        if scheduler.get_job('kill_expiry'):
+            scheduler.remove_job('kill_expiry')
+        return
+
+    # Overdue confirmations are swept straight away instead of being missed
+    scheduler.add_job(
+        sweep_expired_kills,
+        'date',
+        run_date=max(next_expiry, datetime.datetime.now()),
+        id='kill_expiry',
+        args=[app],
+        replace_existing=True
+    )
+
+
+def sweep_expired_kills(app):
+    """
+    Expire overdue kill confirmations, then sleep until the next one is due.
+
+    Args:
+        app: Flask application instance
+    """
+    with app.app_context():
+        expire_kill_confirmations()
+
+    schedule_kill_expiry(app)
+
+
 def schedule_round_transitions(app):
     """
     Schedule the automatic start/end of rounds based on the game state.
@@ -0,0 +1,141 @@
+import logging
+import os
+import tempfile
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from app.services.blob_service import upload_file_path, blob_exists, local_copy
+
+logger = logging.getLogger(__name__)
+
+# Formats every team photo variant is written in, as file extension -> Pillow format
+PHOTO_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def photo_variant_path(photo_path, width, ext):
+    """
+    Get the stored path of one resized variant of a team photo.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        width (int): Width of the variant in pixels
+        ext (str): 'webp' or 'jpg'
+
+    Returns:
+        str: Stored path of the variant, next to the original
+    """
+    return f"{photo_path.rsplit('.', 1)[0]}.w{width}.{ext}"
+
+
+def render_photo_variants(photo_path, widths=None):
+    """
+    Write resized WebP and JPEG variants of a team photo.
+
+    The photo is decoded at the smallest scale that still covers the largest
+    variant, so a large phone JPEG never has to be decoded at full size, and
+    is turned upright from its EXIF orientation before it is resized. Photos
+    are stored by content, so variants that already exist are kept.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        widths (list, optional): Variant widths in pixels, defaults to TEAM_PHOTO_WIDTHS
+
+    Returns:
+        list: Widths of the variants that exist, smallest first; empty if the
+              photo could not be read
+    """
+    widths = sorted(widths or current_app.config['TEAM_PHOTO_WIDTHS'])
+
+    try:
+        with local_copy(photo_path) as source_path, Image.open(source_path) as image:
+            # JPEGs decode straight to a 1/2, 1/4 or 1/8 scale when that is still big enough
+            image.draft('RGB', (widths[-1], widths[-1]))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            # Variants wider than the photo would only be upscaled copies
+            rendered = [width for width in widths if width < image.width] or [widths[0]]
+            for width in rendered:
+                if all(blob_exists(photo_variant_path(photo_path, width, ext)) for ext in PHOTO_FORMATS):
+                    continue
+
+                variant = image.copy()
+                variant.thumbnail((width, width * 4), Image.LANCZOS)
+                for ext, image_format in PHOTO_FORMATS.items():
+                    _save_variant(variant, upload_file_path(photo_variant_path(photo_path, width, ext)), image_format)
+    except Exception as e:
+        logger.error(f"Failed to render variants of team photo {photo_path}: {e}")
+        return []
+
+    return rendered
+
+
+def _save_variant(image, output_path, image_format):
+    # Written under a temporary name so a half-written variant is never served
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.variant_', dir=os.path.dirname(output_path))
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            if image_format == 'WEBP':
+                image.save(output, image_format, quality=WEBP_QUALITY, method=4)
+            else:
+                image.save(output, image_format, quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def photo_variant_paths(photo_path, widths):
+    """
+    Get the stored paths of every variant of a team photo.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        widths (list): Widths of the variants in pixels
+
+    Returns:
+        list: Stored paths of the variants
+    """
+    return [photo_variant_path(photo_path, width, ext) for width in widths for ext in PHOTO_FORMATS]
+
+
+def parse_photo_widths(photo_widths):
+    """
+    Get the widths of a team's photo variants from the stored list.
+
+    Args:
+        photo_widths (str): Comma separated widths, as stored on the team
+
+    Returns:
+        list: Widths in pixels, smallest first
+    """
+    if not photo_widths:
+        return []
+    return sorted(int(width) for width in photo_widths.split(','))
+
+
+def photo_for_width(photo_path, photo_widths, width, ext='jpg'):
+    """
+    Get the smallest variant of a team photo that is at least as wide as needed.
+
+    Args:
+        photo_path (str): Stored path of the original photo
+        photo_widths (str): Comma separated widths of the variants, as stored on the team
+        width (int): Width needed in pixels
+        ext (str): 'webp' or 'jpg'
+
+    Returns:
+        str: Stored path of the variant, or of the original photo if it has no variants
+    """
+    widths = parse_photo_widths(photo_widths)
+    if not widths:
+        return photo_path
+
+    # The largest variant is as big as the photo gets
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return photo_variant_path(photo_path, chosen, ext)
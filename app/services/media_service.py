@@ -1,16 +1,207 @@
+import errno
 import os
+import heapq
+import itertools
+import json
+import logging
 import subprocess
 import tempfile
+import threading
+import time
 import shutil
+from collections import deque
+
 from flask import current_app
 
-def process_video(input_path, output_quality='medium', convert_to_mp4=False):
+# The transcode workers run outside any app context, so they log through the module logger
+logger = logging.getLogger(__name__)
+
+# Transcode priorities, lower runs first
+PRIORITY_VOTING = 0  # Kills that are waiting on votes
+PRIORITY_BACKGROUND = 10  # Everything else
+
+
+class TranscodeCancelled(Exception):
+    """Raised when a transcode is cancelled while ffmpeg is running."""
+
+
+class TranscodeTimeout(Exception):
+    """Raised when ffmpeg runs longer than the allowed time."""
+
+
+# Streams every browser plays from an MP4 without re-encoding
+WEB_VIDEO_CODECS = {'h264'}
+WEB_PIXEL_FORMATS = {'yuv420p', 'yuvj420p'}
+WEB_AUDIO_CODECS = {'aac', 'mp3'}
+
+# Seconds spent on a full transcode per second of video, until one is measured
+DEFAULT_FULL_TRANSCODE_SPEED = 1.0
+
+# Short side of the preview rendition, in pixels
+PREVIEW_SIZE = 480
+
+# Still poster and animated thumbnail shown in place of the video in lists
+POSTER_WIDTH = 640
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_SECONDS = 3
+THUMBNAIL_FPS = 10
+
+
+def probe_video(input_path, timeout=30):
+    """
+    Read the stream details of a video with ffprobe.
+
+    Args:
+        input_path (str): Path to the video
+        timeout (float): Seconds ffprobe may run for
+
+    Returns:
+        dict: video_codec, pixel_format, video_bit_rate, audio_codec, bit_rate and
+              duration, or None if the video could not be probed
+    """
+    ffprobe_cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', input_path]
+
+    try:
+        result = subprocess.run(ffprobe_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, timeout=timeout, check=True)
+        info = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        logger.warning(f"Could not probe video {input_path}: {e}")
+        return None
+
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+    container = info.get('format', {})
+
+    return {
+        'video_codec': video.get('codec_name'),
+        'pixel_format': video.get('pix_fmt'),
+        'video_bit_rate': number(video.get('bit_rate')),
+        'audio_codec': audio.get('codec_name'),
+        'bit_rate': number(container.get('bit_rate')),
+        'duration': number(container.get('duration'))
+    }
+
+
+def choose_transcode_mode(probe, max_bit_rate=None):
+    """
+    Pick the cheapest way to make a video play in every browser.
+
+    Args:
+        probe (dict): Result of probe_video, or None if probing failed
+        max_bit_rate (float, optional): Bits per second above which a playable
+                                        video is still re-encoded to shrink it
+
+    Returns:
+        str: 'remux' to copy both streams into a new MP4, 'audio' to copy the
+             video and re-encode only the audio, or 'full' to re-encode both
+    """
+    if not probe or probe['video_codec'] not in WEB_VIDEO_CODECS or probe['pixel_format'] not in WEB_PIXEL_FORMATS:
+        return 'full'
+
+    bit_rate = probe['video_bit_rate'] or probe['bit_rate']
+    if max_bit_rate and bit_rate and bit_rate > max_bit_rate:
+        return 'full'
+
+    if probe['audio_codec'] is None or probe['audio_codec'] in WEB_AUDIO_CODECS:
+        return 'remux'
+
+    return 'audio'
+
+
+def _run_ffmpeg(ffmpeg_cmd, log_path, timeout=None, cancel_event=None):
+    """
+    Run ffmpeg, stopping it if it is cancelled or runs out of time.
+
+    Args:
+        ffmpeg_cmd (list): Command to run
+        log_path (str): File that receives ffmpeg's output
+        timeout (float, optional): Seconds ffmpeg may run for
+        cancel_event (threading.Event, optional): Set to stop ffmpeg early
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+
+    # Output goes to a file so a chatty ffmpeg can never fill a pipe and stall
+    with open(log_path, 'wb') as log_file:
+        process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file)
+        try:
+            while True:
+                try:
+                    returncode = process.wait(timeout=0.5)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranscodeCancelled(ffmpeg_cmd[-1])
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TranscodeTimeout(f"ffmpeg ran for more than {timeout} seconds")
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, ffmpeg_cmd)
+
+
+def _move_into_place(temp_path, output_path):
+    """
+    Move a finished file from a scratch workspace over its final path in one step.
+
+    Args:
+        temp_path (str): Finished file in the workspace
+        output_path (str): Path readers open
+    """
+    try:
+        os.replace(temp_path, output_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # The workspace is on another disk: copy next to the target first so the swap is still a rename
+        fd, staged_path = tempfile.mkstemp(prefix='.incoming_', dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            shutil.copyfile(temp_path, staged_path)
+            os.replace(staged_path, output_path)
+        except BaseException:
+            os.remove(staged_path)
+            raise
+
+
+def process_video(input_path, output_quality='medium', convert_to_mp4=False, timeout=None, cancel_event=None,
+                  threads=None, mode='full', temp_dir=None):
     """
     Compresses video files and converts to MP4 format if needed.
+
+    The video is encoded into a private scratch workspace and then swapped in
+    for the original with an atomic rename, so readers only ever see the old
+    or the new file.
+
     Args:
         input_path (str): Path to the input video file (.mp4 or .mov)
         output_quality (str): Compression quality: 'low', 'medium', 'high', or 'custom'
         convert_to_mp4 (bool): Always convert to MP4 even if compression isn't needed
+        timeout (float, optional): Seconds ffmpeg may run for
+        cancel_event (threading.Event, optional): Set to stop the transcode early
+        threads (int, optional): Encoder threads, defaults to ffmpeg's choice
+        mode (str): 'full' to re-encode everything, 'audio' to copy the video
+                    stream, or 'remux' to copy both streams (see choose_transcode_mode)
+        temp_dir (str, optional): Folder for the scratch workspace, defaults to the system temp folder
+
+    Returns:
+        bool: True if the video was replaced, False if ffmpeg failed
+
+    Raises:
+        TranscodeCancelled: If cancel_event was set
+        TranscodeTimeout: If ffmpeg ran out of time
     """
     # Check if input file exists
     if not os.path.exists(input_path):
@@ -20,9 +211,11 @@ def process_video(input_path, output_quality='medium', convert_to_mp4=False):
     _, ext = os.path.splitext(input_path)
     ext = ext.lower()
 
-    # Set output path to temporary file first
-    temp_dir = tempfile.gettempdir()
-    temp_output = os.path.join(temp_dir, f"temp_output_{os.path.basename(input_path)}.mp4")
+    # The workspace is private to this job so names never collide, and is kept
+    # out of the served upload folder
+    workspace = tempfile.mkdtemp(prefix='transcode_', dir=temp_dir)
+    temp_output = os.path.join(workspace, 'output.mp4')
+    log_path = os.path.join(workspace, 'ffmpeg.log')
 
     # Determine if conversion is needed based on file extension
     needs_conversion = ext not in ['.mp4'] or convert_to_mp4
@@ -37,59 +230,525 @@ def process_video(input_path, output_quality='medium', convert_to_mp4=False):
 
     # Use medium quality if invalid quality is specified
     if output_quality not in quality_settings:
-        print(f"Warning: Invalid quality '{output_quality}'. Using 'medium' instead.")
+        logger.warning(f"Invalid quality '{output_quality}'. Using 'medium' instead.")
         output_quality = 'medium'
 
     # Build FFmpeg command
-    ffmpeg_cmd = ['ffmpeg', '-i', input_path, '-y']
+    ffmpeg_cmd = ['ffmpeg', '-nostdin', '-i', input_path, '-y']
+
+    if mode == 'remux':
+        # Already playable, just move the index to the front for streaming
+        ffmpeg_cmd.extend(['-c', 'copy', '-movflags', '+faststart'])
+    else:
+        # Share the cores with the other transcodes running alongside
+        if threads:
+            ffmpeg_cmd.extend(['-threads', str(threads)])
 
-    # Add quality settings
-    ffmpeg_cmd.extend(quality_settings[output_quality])
+        if mode == 'audio':
+            # The video stream is already playable
+            ffmpeg_cmd.extend(['-c:v', 'copy', '-movflags', '+faststart'])
+        else:
+            # Add quality settings
+            ffmpeg_cmd.extend(quality_settings[output_quality])
 
-    # Ensure output is mp4 with h264 codec for compatibility
-    ffmpeg_cmd.extend(['-c:v', 'libx264', '-movflags', '+faststart'])
+            # Ensure output is mp4 with h264 codec for compatibility
+            ffmpeg_cmd.extend(['-c:v', 'libx264', '-movflags', '+faststart'])
 
-    # Copy audio stream without re-encoding if it exists
-    ffmpeg_cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
+        # Re-encode the audio stream to AAC if it exists
+        ffmpeg_cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
 
     # Add output path
     ffmpeg_cmd.append(temp_output)
 
     try:
         # Execute FFmpeg command
-        print(f"Processing video: {input_path}")
-        print(f"Command: {' '.join(ffmpeg_cmd)}")
-        subprocess.run(ffmpeg_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        logger.debug(f"Processing video: {input_path}")
+        logger.debug(f"Command: {' '.join(ffmpeg_cmd)}")
+        _run_ffmpeg(ffmpeg_cmd, log_path, timeout=timeout, cancel_event=cancel_event)
+
+        # Replace the original with the compressed version in one step
+        _move_into_place(temp_output, input_path)
+
+        logger.debug(f"Video compression complete: {input_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        with open(log_path, 'rb') as log_file:
+            logger.error(f"Error processing video: {e}\n{log_file.read()[-2000:].decode(errors='replace')}")
+        return False
+    except (TranscodeCancelled, TranscodeTimeout):
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error processing video {input_path}: {e}")
+        return False
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def preview_path_for(input_path):
+    """
+    Get where the preview rendition of a video is stored.
+
+    Args:
+        input_path (str): Path to the video
+
+    Returns:
+        str: Path of the preview, next to the video
+    """
+    return os.path.splitext(input_path)[0] + '.preview.mp4'
+
+
+def render_preview(input_path, output_path, timeout=None, cancel_event=None, threads=None, temp_dir=None):
+    """
+    Quickly encode a low resolution copy of a video to watch while the full one is processed.
+
+    Args:
+        input_path (str): Path to the video
+        output_path (str): Where to store the preview
+        timeout (float, optional): Seconds ffmpeg may run for
+        cancel_event (threading.Event, optional): Set to stop the encode early
+        threads (int, optional): Encoder threads, defaults to ffmpeg's choice
+        temp_dir (str, optional): Folder for the scratch workspace, defaults to the system temp folder
 
-        # Replace original file with compressed version
-        print(f"Replacing original file with compressed version")
+    Returns:
+        bool: True if the preview was written, False if ffmpeg failed
 
-        # Create a backup of the original file
-        backup_path = input_path + ".backup"
-        shutil.copy2(input_path, backup_path)
+    Raises:
+        TranscodeCancelled: If cancel_event was set
+        TranscodeTimeout: If ffmpeg ran out of time
+    """
+    workspace = tempfile.mkdtemp(prefix='transcode_', dir=temp_dir)
+    temp_output = os.path.join(workspace, 'preview.mp4')
+    log_path = os.path.join(workspace, 'ffmpeg.log')
 
-        # Replace the original with the compressed version
-        shutil.move(temp_output, input_path)
+    # Scale the short side down to the preview size, whichever way up the video is
+    scale = (f"scale=w='if(gt(iw,ih),-2,min({PREVIEW_SIZE},iw))'"
+             f":h='if(gt(iw,ih),min({PREVIEW_SIZE},ih),-2)'")
 
-        # Remove backup if everything went well
-        os.remove(backup_path)
+    ffmpeg_cmd = ['ffmpeg', '-nostdin', '-i', input_path, '-y', '-vf', scale,
+                  '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28']
+    if threads:
+        ffmpeg_cmd.extend(['-threads', str(threads)])
+    ffmpeg_cmd.extend(['-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', temp_output])
 
-        print(f"Video compression complete: {input_path}")
+    try:
+        logger.debug(f"Rendering preview: {input_path}")
+        _run_ffmpeg(ffmpeg_cmd, log_path, timeout=timeout, cancel_event=cancel_event)
+        _move_into_place(temp_output, output_path)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error processing video: {e}")
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
-        return False
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
+        logger.error(f"Error rendering preview of {input_path}: {e}")
         return False
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def poster_paths_for(input_path):
+    """
+    Get where the poster images of a video are stored.
+
+    Args:
+        input_path (str): Path to the video
+
+    Returns:
+        dict: Paths of the 'poster' JPEG, 'poster_webp' and animated WebP 'thumbnail'
+    """
+    base = os.path.splitext(input_path)[0]
+    return {
+        'poster': base + '.poster.jpg',
+        'poster_webp': base + '.poster.webp',
+        'thumbnail': base + '.thumb.webp'
+    }
+
+
+def render_posters(input_path, duration=None, timeout=None, cancel_event=None, temp_dir=None):
+    """
+    Grab a still poster in JPEG and WebP and a few seconds of animated WebP from a video.
+
+    Each image is optional; one that ffmpeg cannot produce, for example
+    because it was built without WebP support, is skipped.
+
+    Args:
+        input_path (str): Path to the video
+        duration (float, optional): Length of the video in seconds
+        timeout (float, optional): Seconds each ffmpeg run may take
+        cancel_event (threading.Event, optional): Set to stop early
+        temp_dir (str, optional): Folder for the scratch workspaces, defaults to the system temp folder
+
+    Returns:
+        dict: Paths of the images that were written, keyed like poster_paths_for
+
+    Raises:
+        TranscodeCancelled: If cancel_event was set
+        TranscodeTimeout: If ffmpeg ran out of time
+    """
+    # Skip the first second, which is often the camera being raised
+    seek = str(min(1.0, duration / 2) if duration else 0)
+    poster_scale = f"scale=w='min({POSTER_WIDTH},iw)':h=-2"
+    thumbnail_filter = f"fps={THUMBNAIL_FPS},scale=w='min({THUMBNAIL_WIDTH},iw)':h=-2"
+
+    outputs = {
+        'poster': ['-ss', seek, '-i', input_path, '-frames:v', '1', '-vf', poster_scale, '-q:v', '3'],
+        'poster_webp': ['-ss', seek, '-i', input_path, '-frames:v', '1', '-vf', poster_scale,
+                        '-c:v', 'libwebp', '-quality', '75'],
+        'thumbnail': ['-ss', seek, '-t', str(THUMBNAIL_SECONDS), '-i', input_path, '-an', '-vf', thumbnail_filter,
+                      '-c:v', 'libwebp', '-quality', '60', '-loop', '0']
+    }
+
+    written = {}
+    for name, output_path in poster_paths_for(input_path).items():
+        workspace = tempfile.mkdtemp(prefix='transcode_', dir=temp_dir)
+        temp_output = os.path.join(workspace, os.path.basename(output_path))
+        ffmpeg_cmd = ['ffmpeg', '-nostdin', '-y'] + outputs[name] + [temp_output]
+
+        try:
+            _run_ffmpeg(ffmpeg_cmd, os.path.join(workspace, 'ffmpeg.log'), timeout=timeout,
+                        cancel_event=cancel_event)
+            _move_into_place(temp_output, output_path)
+            written[name] = output_path
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Error rendering {name} for {input_path}: {e}")
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    return written
+
+
+class TranscodeJob:
+    """
+    A video waiting for or going through the transcode pool.
+
+    Attributes:
+        key (str): Identifies the job, one job per key at a time
+        input_path (str): Video that is transcoded in place
+        priority (int): Lower runs first
+        status (str): queued, running, done, failed, cancelled or timeout
+        mode (str): How the video was processed, see choose_transcode_mode
+        time_saved (float): Estimated seconds saved by not doing a full transcode
+        preview_path (str): Where the preview was written, if one was rendered
+        posters (dict): Poster images that were written, see render_posters
+    """
+
+    def __init__(self, key, input_path, priority=PRIORITY_BACKGROUND, deadline=None, on_start=None, on_done=None,
+                 on_preview=None, on_posters=None):
+        self.key = key
+        self.input_path = input_path
+        self.priority = priority
+        self.deadline = deadline
+        self.on_start = on_start
+        self.on_done = on_done
+        self.on_preview = on_preview
+        self.on_posters = on_posters
+        self.preview_path = None
+        self.preview_seconds = None
+        self.posters = {}
+        self.poster_seconds = None
+        self.status = 'queued'
+        self.error = None
+        self.mode = None
+        self.media_duration = None
+        self.time_saved = None
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    def cancel(self):
+        """Cancel the job, stopping ffmpeg if it is already running."""
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished, returning False on timeout."""
+        return self.finished.wait(timeout)
+
+    @property
+    def succeeded(self):
+        return self.status == 'done'
+
+    @property
+    def wait_seconds(self):
+        end = self.started_at or self.finished_at or time.monotonic()
+        return end - self.queued_at
+
+    @property
+    def run_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def metrics(self):
+        """
+        Get the timings of the job.
+
+        Returns:
+            dict: key, status, priority, mode, wait_seconds, run_seconds,
+                  time_saved_seconds, preview_seconds, poster_seconds and error
+        """
+        return {
+            'key': self.key,
+            'status': self.status,
+            'priority': self.priority,
+            'mode': self.mode,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'run_seconds': round(self.run_seconds, 3),
+            'time_saved_seconds': round(self.time_saved, 3) if self.time_saved is not None else None,
+            'preview_seconds': round(self.preview_seconds, 3) if self.preview_seconds is not None else None,
+            'poster_seconds': round(self.poster_seconds, 3) if self.poster_seconds is not None else None,
+            'error': self.error
+        }
+
+
+class TranscodePool:
+    """
+    A fixed number of worker threads that each run one ffmpeg at a time.
+
+    Jobs are taken in priority order, then by deadline, then in the order
+    they were submitted. Each video is probed first and only re-encoded as
+    far as it needs to be.
+    """
+
+    def __init__(self, workers, timeout=None, max_bit_rate=None, history=100, temp_dir=None):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_bit_rate = max_bit_rate
+        self.temp_dir = temp_dir
+        # Measured cost of a full transcode, used to estimate the time saved by cheaper ones
+        self.full_transcode_speed = DEFAULT_FULL_TRANSCODE_SPEED
+        self.time_saved = 0.0
+        self.modes = {'remux': 0, 'audio': 0, 'full': 0}
+        # Split the cores between the ffmpeg processes running at once
+        self.threads_per_job = max(1, (os.cpu_count() or 1) // self.workers)
+        self._heap = []
+        self._jobs = {}
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._recent = deque(maxlen=history)
+
+    def submit(self, key, input_path, priority=PRIORITY_BACKGROUND, deadline=None, on_start=None, on_done=None,
+               on_preview=None, on_posters=None):
+        """
+        Queue a video for transcoding.
+
+        Args:
+            key (str): Identifies the job; a key that is already queued or running is not queued twice
+            input_path (str): Video to transcode in place
+            priority (int): Lower runs first
+            deadline (float, optional): Timestamp that orders jobs of equal priority, earliest first
+            on_start (callable, optional): Called with the job when a worker picks it up
+            on_done (callable, optional): Called with the job once it has finished, whatever the outcome
+            on_preview (callable, optional): Called with the job once a preview is ready; previews are
+                                             only rendered ahead of a full transcode
+            on_posters (callable, optional): Called with the job once its poster images are written
+
+        Returns:
+            TranscodeJob: The queued job, or the one already in progress for the key
+        """
+        with self._condition:
+            existing = self._jobs.get(key)
+            if existing and not existing.finished.is_set() and not existing.cancel_event.is_set():
+                return existing
+
+            job = TranscodeJob(key, input_path, priority, deadline, on_start, on_done, on_preview, on_posters)
+            self._jobs[key] = job
+            sort_deadline = deadline if deadline is not None else float('inf')
+            heapq.heappush(self._heap, (priority, sort_deadline, next(self._order), job))
+            self._start_workers()
+            self._condition.notify()
+
+        return job
+
+    def cancel(self, key):
+        """
+        Cancel the job for a key.
+
+        Args:
+            key (str): Key the job was submitted with
+
+        Returns:
+            bool: True if a queued or running job was cancelled
+        """
+        with self._condition:
+            job = self._jobs.get(key)
+            if not job or job.finished.is_set():
+                return False
+            job.cancel()
+            return True
+
+    def cancel_all(self):
+        """
+        Cancel every queued and running job.
+
+        Returns:
+            int: Number of jobs cancelled
+        """
+        with self._condition:
+            jobs = [job for job in self._jobs.values() if not job.finished.is_set()]
+            for job in jobs:
+                job.cancel()
+            return len(jobs)
+
+    def stats(self):
+        """
+        Get the state of the pool and the timings of recently finished jobs.
+
+        Returns:
+            dict: workers, queued, running, jobs per mode, total time saved and
+                  recent job metrics
+        """
+        with self._condition:
+            active = [job for job in self._jobs.values() if not job.finished.is_set()]
+            return {
+                'workers': self.workers,
+                'queued': sum(1 for job in active if job.status == 'queued'),
+                'running': sum(1 for job in active if job.status == 'running'),
+                'modes': dict(self.modes),
+                'time_saved_seconds': round(self.time_saved, 3),
+                'recent': list(self._recent)
+            }
+
+    def _start_workers(self):
+        # Called with the condition held
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'transcode-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                job = heapq.heappop(self._heap)[-1]
+
+            if job.cancel_event.is_set():
+                self._finish(job, 'cancelled')
+                continue
+
+            job.status = 'running'
+            job.started_at = time.monotonic()
+            self._callback(job.on_start, job)
+
+            try:
+                probe = probe_video(job.input_path)
+                job.mode = choose_transcode_mode(probe, self.max_bit_rate)
+                job.media_duration = probe['duration'] if probe else None
+
+                # Posters take a fraction of a second and let lists show the video straight away
+                if job.on_posters:
+                    self._posters(job)
+
+                # Remuxes are quick enough that a preview would only slow them down
+                if job.mode == 'full' and job.on_preview:
+                    self._preview(job)
+
+                replaced = process_video(job.input_path, timeout=self.timeout, cancel_event=job.cancel_event,
+                                         threads=self.threads_per_job, mode=job.mode, temp_dir=self.temp_dir)
+                if not replaced and job.mode != 'full':
+                    # The probe was too optimistic, fall back to a full transcode
+                    job.mode = 'full'
+                    replaced = process_video(job.input_path, timeout=self.timeout, cancel_event=job.cancel_event,
+                                             threads=self.threads_per_job, temp_dir=self.temp_dir)
+                self._finish(job, 'done' if replaced else 'failed')
+            except TranscodeCancelled:
+                self._finish(job, 'cancelled')
+            except TranscodeTimeout as e:
+                self._finish(job, 'timeout', str(e))
+            except Exception as e:
+                self._finish(job, 'failed', str(e))
+
+    def _posters(self, job):
+        started = time.monotonic()
+        job.posters = render_posters(job.input_path, job.media_duration, timeout=self.timeout,
+                                     cancel_event=job.cancel_event, temp_dir=self.temp_dir)
+        job.poster_seconds = time.monotonic() - started
+        if job.posters:
+            self._callback(job.on_posters, job)
+
+    def _preview(self, job):
+        started = time.monotonic()
+        preview_path = preview_path_for(job.input_path)
+        if render_preview(job.input_path, preview_path, timeout=self.timeout, cancel_event=job.cancel_event,
+                          threads=self.threads_per_job, temp_dir=self.temp_dir):
+            job.preview_path = preview_path
+            job.preview_seconds = time.monotonic() - started
+            self._callback(job.on_preview, job)
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.monotonic()
+
+        with self._condition:
+            if status == 'done':
+                self._record_mode(job)
+
+        metrics = job.metrics()
+        self._recent.append(metrics)
+        logger.debug(f"Transcode {job.key} {status} ({job.mode}): waited {metrics['wait_seconds']}s, "
+                     f"ran {metrics['run_seconds']}s, saved {metrics['time_saved_seconds'] or 0}s")
+
+        with self._condition:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        job.finished.set()
+
+        self._callback(job.on_done, job)
+
+    def _record_mode(self, job):
+        # Called with the condition held
+        self.modes[job.mode] += 1
+        if not job.media_duration:
+            return
+
+        if job.mode == 'full':
+            # Follow the measured speed, weighting recent transcodes most
+            speed = job.run_seconds / job.media_duration
+            self.full_transcode_speed += (speed - self.full_transcode_speed) * 0.2
+        else:
+            estimated = job.media_duration * self.full_transcode_speed
+            job.time_saved = max(0.0, estimated - job.run_seconds)
+            self.time_saved += job.time_saved
+
+    @staticmethod
+    def _callback(callback, job):
+        # A failing callback must never take a worker down with it
+        if callback is None:
+            return
+        try:
+            callback(job)
+        except Exception as e:
+            logger.error(f"Error in transcode callback for {job.key}: {e}")
+
+
+# Transcode pool shared by this process, created on first use
+_transcode_pool = None
+_transcode_pool_lock = threading.Lock()
+
+
+def get_transcode_pool():
+    """
+    Get the transcode pool, sized from the TRANSCODE_WORKERS setting.
+
+    Returns:
+        TranscodePool: The pool shared by this process
+    """
+    global _transcode_pool
+
+    if _transcode_pool is None:
+        with _transcode_pool_lock:
+            if _transcode_pool is None:
+                _transcode_pool = TranscodePool(
+                    current_app.config['TRANSCODE_WORKERS'],
+                    timeout=current_app.config['TRANSCODE_TIMEOUT'],
+                    max_bit_rate=current_app.config['TRANSCODE_REMUX_MAX_BITRATE'],
+                    temp_dir=current_app.config['TRANSCODE_TEMP_FOLDER']
+                )
+    return _transcode_pool
 
 
 # Example usage:
 if __name__ == "__main__":
     # Example: compress a video file
     # compress_video("path/to/video.mov", output_quality="medium", convert_to_mp4=True)
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,188 @@
+import datetime
+import hashlib
+import json
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Player, PendingNotification
+
+# How a player wants to hear about game events
+NOTIFICATION_MODES = ('instant', 'digest')
+
+# Event types that can be held back for a digest
+EVENT_KILL_SUBMISSION = 'kill_submission'
+
+# Most ids updated in one statement, within SQLite's parameter limit
+UPDATE_BATCH = 500
+
+
+def set_notification_mode(player, mode):
+    """
+    Set whether a player gets an email per event or one digest per window.
+
+    Args:
+        player: Player object
+        mode (str): 'instant' or 'digest'
+
+    Returns:
+        tuple: (success, message)
+    """
+    if mode not in NOTIFICATION_MODES:
+        return False, 'Unknown notification setting.'
+
+    player.notification_mode = mode
+    db.session.commit()
+
+    if mode == 'digest':
+        minutes = current_app.config['MAIL_DIGEST_MINUTES']
+        return True, f'Notifications will be grouped into one email every {minutes} minutes.'
+    return True, 'You will get an email as soon as something happens.'
+
+
+def get_instant_recipients():
+    """
+    Get the email addresses of every player who wants events straight away.
+
+    Returns:
+        list: Email addresses
+    """
+    return [email for email, in db.session.query(Player.email).filter(Player.notification_mode != 'digest')]
+
+
+def queue_digest_event(event_type, event_key, payload):
+    """
+    Hold an event back for every player on digest delivery.
+
+    An event is only ever held once per player, so notifying about the same
+    kill again, for example when its processing is resumed after a restart,
+    does not list it twice.
+
+    Args:
+        event_type (str): Type of the event, such as EVENT_KILL_SUBMISSION
+        event_key (str): What the event is about, such as the kill confirmation ID
+        payload (dict): Details of the event for the digest email
+
+    Returns:
+        int: Number of players the event was held for
+    """
+    already_held = db.session.query(PendingNotification.id).filter(
+        PendingNotification.player_id == Player.id,
+        PendingNotification.event_type == event_type,
+        PendingNotification.event_key == event_key
+    ).exists()
+    player_ids = [player_id for player_id, in db.session.query(Player.id).filter(
+        Player.notification_mode == 'digest',
+        ~already_held
+    )]
+    if not player_ids:
+        return 0
+
+    payload = json.dumps(payload, sort_keys=True)
+    now = datetime.datetime.utcnow()
+    try:
+        with db.session.begin_nested():
+            db.session.add_all([
+                PendingNotification(player_id=player_id, event_type=event_type, event_key=event_key,
+                                    payload=payload, created_at=now)
+                for player_id in player_ids
+            ])
+    except IntegrityError:
+        # Another thread held the same event first
+        return 0
+    db.session.commit()
+    return len(player_ids)
+
+
+def collect_due_digests():
+    """
+    Gather the held events whose digest window has closed.
+
+    A player's window opens with the first event held for them and closes
+    MAIL_DIGEST_MINUTES later, when everything of that type held since goes
+    out in one email. Players who were held the same events share a digest,
+    so it is only rendered once.
+
+    Returns:
+        list: Digests as dicts of event_type, payloads, event_keys, recipients,
+              ids of the held events, and an idempotency key for the email
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(minutes=current_app.config['MAIL_DIGEST_MINUTES'])
+
+    rows = db.session.query(PendingNotification, Player.email).join(
+        Player, Player.id == PendingNotification.player_id
+    ).filter(PendingNotification.sent_at.is_(None)).order_by(PendingNotification.id).all()
+
+    held = {}
+    for notification, email in rows:
+        held.setdefault((notification.player_id, notification.event_type), (email, []))[1].append(notification)
+
+    digests = {}
+    for (player_id, event_type), (email, notifications) in held.items():
+        if notifications[0].created_at > cutoff:
+            continue
+
+        events = tuple(notification.payload for notification in notifications)
+        digest = digests.setdefault((event_type, events), {
+            'event_type': event_type,
+            'payloads': [notification.get_payload() for notification in notifications],
+            'event_keys': [notification.event_key for notification in notifications],
+            'recipients': [],
+            'ids': []
+        })
+        digest['recipients'].append(email)
+        digest['ids'].extend(notification.id for notification in notifications)
+
+    for digest in digests.values():
+        digest['key'] = _digest_key(digest['event_type'], digest['event_keys'], digest['recipients'])
+    return list(digests.values())
+
+
+def _digest_key(event_type, event_keys, recipients):
+    # Built from what the digest is about and who it goes to rather than row ids,
+    # which the database hands out again once a wiped game's rows are gone
+    content = json.dumps([event_type, event_keys, sorted(recipients)])
+    return f'digest:{event_type}:{hashlib.sha256(content.encode()).hexdigest()}'
+
+
+def mark_notifications_sent(ids):
+    """
+    Mark held events as sent once their digest has been queued.
+
+    Args:
+        ids (list): IDs of the PendingNotification rows
+    """
+    now = datetime.datetime.utcnow()
+    for start in range(0, len(ids), UPDATE_BATCH):
+        db.session.execute(
+            db.update(PendingNotification).where(
+                PendingNotification.id.in_(ids[start:start + UPDATE_BATCH])
+            ).values(sent_at=now),
+            execution_options={'synchronize_session': False}
+        )
+    db.session.commit()
+
+
+def purge_sent_notifications(app=None):
+    """
+    Delete events sent in a digest more than MAIL_OUTBOX_KEEP_DAYS ago.
+
+    Args:
+        app: Flask app object (optional)
+
+    Returns:
+        int: Number of events deleted
+    """
+    if app:
+        with app.app_context():
+            return _do_purge_sent_notifications()
+    return _do_purge_sent_notifications()
+
+
+def _do_purge_sent_notifications():
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=current_app.config['MAIL_OUTBOX_KEEP_DAYS'])
+    deleted = PendingNotification.query.filter(
+        PendingNotification.sent_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
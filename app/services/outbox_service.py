@@ -0,0 +1,450 @@
+import base64
+import contextlib
+import datetime
+import json
+import mimetypes
+import os
+import smtplib
+import tempfile
+import threading
+import uuid
+from email import policy
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, OutboundEmail
+from app.services.blob_service import open_blob
+from app.services.smtp_service import send_message, send_message_file
+
+# Attachment bytes encoded at a time; a multiple of 57 so every base64 line is a full 76 characters
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+# Messages are written with the line endings SMTP sends them with
+SMTP_POLICY = policy.compat32.clone(linesep='\r\n')
+
+
+def enqueue_email(subject, recipients, text_body, html_body=None, attachment_path=None, idempotency_key=None):
+    """
+    Put an email in the outbox for the mail workers to send.
+
+    Args:
+        subject (str): Email subject
+        recipients (list): List of email addresses
+        text_body (str): Plain text email body
+        html_body (str, optional): HTML email body
+        attachment_path (str, optional): Stored path of an upload to attach
+        idempotency_key (str, optional): Emails with the same key are only ever sent once
+
+    Returns:
+        OutboundEmail: The queued email, or the one already queued under the key
+    """
+    if idempotency_key:
+        existing = OutboundEmail.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+
+    email = OutboundEmail(
+        idempotency_key=idempotency_key,
+        subject=subject,
+        recipients=json.dumps(list(recipients)),
+        text_body=text_body,
+        html_body=html_body,
+        attachment_path=attachment_path
+    )
+    try:
+        # A savepoint, so a clash only undoes this insert and not the caller's work
+        with db.session.begin_nested():
+            db.session.add(email)
+    except IntegrityError:
+        existing = OutboundEmail.query.filter_by(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if existing is None:
+            raise
+        # Another thread queued the same key first
+        return existing
+    db.session.commit()
+
+    get_mail_workers(current_app._get_current_object()).wake()
+    return email
+
+
+def enqueue_fan_out(subject, recipients, text_body, html_body=None, idempotency_key=None):
+    """
+    Queue an email to many recipients as separate batches.
+
+    The bodies are rendered once by the caller and shared by every batch. In
+    the 'bcc' MAIL_FANOUT_MODE each batch of MAIL_BATCH_SIZE recipients goes
+    out as one message with the addresses hidden from each other; in
+    'personal' mode every recipient gets their own message. Batches are sent
+    in parallel by the mail workers, and an address the server refuses only
+    fails its own batch.
+
+    Args:
+        subject (str): Email subject
+        recipients (list): List of email addresses
+        text_body (str): Plain text email body
+        html_body (str, optional): HTML email body
+        idempotency_key (str, optional): The fan-out is only ever queued once per key
+
+    Returns:
+        int: Number of messages queued
+    """
+    config = current_app.config
+
+    if idempotency_key and OutboundEmail.query.filter(
+            OutboundEmail.idempotency_key.like(f'{idempotency_key}:%')).first():
+        return 0
+
+    # One message per address, however often it was listed; anything that is not an address is dropped
+    addresses = sorted({recipient.strip() for recipient in recipients if recipient and '@' in recipient})
+    skipped = len(set(recipients)) - len(addresses)
+    if skipped:
+        current_app.logger.warning(f'Skipped {skipped} invalid addresses for "{subject}"')
+
+    personal = config['MAIL_FANOUT_MODE'] == 'personal'
+    batch_size = 1 if personal else max(1, config['MAIL_BATCH_SIZE'])
+
+    emails = [
+        OutboundEmail(
+            idempotency_key=f'{idempotency_key}:{index}' if idempotency_key else None,
+            subject=subject,
+            recipients=json.dumps(addresses[start:start + batch_size]),
+            bcc=not personal,
+            text_body=text_body,
+            html_body=html_body
+        ) for index, start in enumerate(range(0, len(addresses), batch_size))
+    ]
+    if not emails:
+        return 0
+
+    try:
+        with db.session.begin_nested():
+            db.session.add_all(emails)
+    except IntegrityError:
+        if not (idempotency_key and OutboundEmail.query.filter(
+                OutboundEmail.idempotency_key.like(f'{idempotency_key}:%')).first()):
+            raise
+        # Another thread queued the same fan-out first
+        return 0
+    db.session.commit()
+
+    get_mail_workers(current_app._get_current_object()).wake(len(emails))
+    return len(emails)
+
+
+def build_message(email):
+    """
+    Build the MIME message for an outbox email.
+
+    Args:
+        email: OutboundEmail object
+
+    Returns:
+        email.message.Message: The message
+    """
+    body = MIMEMultipart('alternative')
+    body.attach(MIMEText(email.text_body, 'plain'))
+    if email.html_body:
+        body.attach(MIMEText(email.html_body, 'html'))
+
+    if email.attachment_path:
+        msg = MIMEMultipart('mixed')
+        msg.attach(body)
+    else:
+        msg = body
+
+    msg['Subject'] = email.subject
+    msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
+    # Batched recipients only see the list name; the addresses go in the envelope
+    msg['To'] = 'undisclosed-recipients:;' if email.bcc else ', '.join(email.get_recipients())
+    return msg
+
+
+def write_message(msg, output, attachment, filename):
+    """
+    Write a message with an attachment to a file, encoding the attachment a chunk at a time.
+
+    The message is never held in memory as a whole, so mailing a large video
+    costs the same memory as mailing a photo.
+
+    Args:
+        msg: Multipart message built by build_message
+        output: Binary file to write the message to, with CRLF line endings
+        attachment: Binary file-like object to read the attachment from
+        filename (str): Name the attachment is given in the email
+    """
+    maintype, subtype = (mimetypes.guess_type(filename)[0] or 'application/octet-stream').split('/')
+    part = MIMEBase(maintype, subtype)
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+
+    # The generator writes everything around a placeholder, which the encoded file then replaces
+    placeholder = uuid.uuid4().hex
+    part.set_payload(placeholder)
+    msg.attach(part)
+    before, after = msg.as_bytes(policy=SMTP_POLICY).split(placeholder.encode('ascii'))
+
+    output.write(before)
+    while True:
+        chunk = attachment.read(ATTACHMENT_CHUNK_SIZE)
+        if not chunk:
+            break
+        output.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+    output.write(after[len(b'\r\n'):] if after.startswith(b'\r\n') else after)
+
+
+def deliver_email(email):
+    """
+    Send an outbox email over SMTP.
+
+    Messages with an attachment are spooled to a temporary file and streamed
+    to the server from there.
+
+    Args:
+        email: OutboundEmail object
+
+    Returns:
+        dict: Recipients the server refused, as address -> (code, reply)
+    """
+    recipients = email.get_recipients()
+    msg = build_message(email)
+
+    if not email.attachment_path:
+        return send_message(msg, recipients)
+
+    with contextlib.closing(open_blob(email.attachment_path)) as attachment, \
+            tempfile.TemporaryFile(prefix='outbox_') as message_file:
+        write_message(msg, message_file, attachment, os.path.basename(email.attachment_path))
+        return send_message_file(message_file, recipients)
+
+
+def _is_permanent(error):
+    # 5xx replies and refused recipients will fail the same way every time
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return isinstance(error, FileNotFoundError)
+
+
+def retry_delay(attempts):
+    """
+    Get how long to wait before the next attempt at an email.
+
+    Args:
+        attempts (int): Attempts made so far
+
+    Returns:
+        datetime.timedelta: Delay, doubling with each attempt up to MAIL_RETRY_MAX_SECONDS
+    """
+    config = current_app.config
+    seconds = config['MAIL_RETRY_BASE_SECONDS'] * 2 ** max(0, attempts - 1)
+    return datetime.timedelta(seconds=min(seconds, config['MAIL_RETRY_MAX_SECONDS']))
+
+
+def _claim_next_email():
+    """
+    Take the oldest due email, marking it as sending so no other worker takes it.
+
+    Returns:
+        OutboundEmail: The claimed email, or None if nothing is due
+    """
+    now = datetime.datetime.utcnow()
+    candidates = db.session.execute(
+        db.select(OutboundEmail.id).where(
+            OutboundEmail.status == 'pending',
+            OutboundEmail.next_attempt_at <= now
+        ).order_by(OutboundEmail.next_attempt_at).limit(5)
+    ).scalars().all()
+
+    for email_id in candidates:
+        claimed = db.session.execute(
+            db.update(OutboundEmail).where(
+                OutboundEmail.id == email_id,
+                OutboundEmail.status == 'pending'
+            ).values(status='sending', attempts=OutboundEmail.attempts + 1),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(OutboundEmail, email_id)
+
+    return None
+
+
+def process_next_email():
+    """
+    Send the oldest due email in the outbox, if there is one.
+
+    Returns:
+        bool: True if an email was attempted
+    """
+    email = _claim_next_email()
+    if email is None:
+        return False
+
+    try:
+        refused = deliver_email(email)
+    except Exception as e:
+        email.last_error = str(e)
+        if _is_permanent(e) or email.attempts >= current_app.config['MAIL_MAX_ATTEMPTS']:
+            email.status = 'failed'
+            current_app.logger.error(f'Giving up on email "{email.subject}" after {email.attempts} attempts: {e}')
+        else:
+            email.status = 'pending'
+            email.next_attempt_at = datetime.datetime.utcnow() + retry_delay(email.attempts)
+        db.session.commit()
+        return True
+
+    email.status = 'sent'
+    email.sent_at = datetime.datetime.utcnow()
+    email.last_error = f'Refused recipients: {", ".join(refused)}' if refused else None
+    db.session.commit()
+
+    current_app.logger.info(f'Email sent to {len(email.get_recipients())} recipients: {email.subject}')
+    return True
+
+
+class MailWorkers:
+    """
+    Threads that drain the outbox.
+
+    Workers sleep until an email is queued, checking the outbox every
+    MAIL_POLL_SECONDS anyway for retries that have come due.
+    """
+
+    def __init__(self, app, workers, poll_seconds):
+        self.app = app
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self._condition = threading.Condition()
+        self._pending_wakeups = 0
+        self._threads = []
+
+    def wake(self, count=1):
+        """Start the workers if needed and have up to count of them look at the outbox now."""
+        with self._condition:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'mail-{len(self._threads)}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._pending_wakeups += count
+            self._condition.notify(count)
+
+    def _work(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    worked = process_next_email()
+            except Exception:
+                self.app.logger.exception('Mail worker error')
+                worked = False
+
+            if worked:
+                continue
+
+            with self._condition:
+                if not self._pending_wakeups:
+                    self._condition.wait(self.poll_seconds)
+                self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+
+# Guards creating the workers, which several threads may ask for at once
+_mail_workers_lock = threading.Lock()
+
+
+def get_mail_workers(app):
+    """
+    Get the mail workers of an app, sized from the MAIL_WORKERS setting.
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        MailWorkers: The workers
+    """
+    with _mail_workers_lock:
+        workers = app.extensions.get('mail_workers')
+        if workers is None:
+            workers = MailWorkers(app, app.config['MAIL_WORKERS'], app.config['MAIL_POLL_SECONDS'])
+            app.extensions['mail_workers'] = workers
+        return workers
+
+
+def resume_outbox(app):
+    """
+    Start sending the emails left in the outbox by the last run.
+
+    Emails that were being sent when the app stopped are marked failed rather
+    than sent again, as there is no telling whether the server took them.
+
+    Args:
+        app: Flask application instance
+    """
+    with app.app_context():
+        interrupted = db.session.execute(
+            db.update(OutboundEmail).where(OutboundEmail.status == 'sending').values(
+                status='failed', last_error='Interrupted while sending, not retried in case it was delivered'
+            ),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        if interrupted:
+            app.logger.warning(f'{interrupted} emails were interrupted while sending and will not be retried')
+
+        if OutboundEmail.query.filter_by(status='pending').first():
+            get_mail_workers(app).wake()
+
+
+def get_outbox_stats():
+    """
+    Get the depth and age of the outbox.
+
+    Returns:
+        dict: pending, sending, failed and sent counts, and the age in seconds
+              of the oldest pending email
+    """
+    counts = dict(db.session.query(OutboundEmail.status, db.func.count(OutboundEmail.id)).group_by(
+        OutboundEmail.status
+    ).all())
+
+    oldest = db.session.query(db.func.min(OutboundEmail.created_at)).filter(
+        OutboundEmail.status == 'pending'
+    ).scalar()
+
+    return {
+        'pending': counts.get('pending', 0),
+        'sending': counts.get('sending', 0),
+        'failed': counts.get('failed', 0),
+        'sent': counts.get('sent', 0),
+        'oldest_pending_seconds': (datetime.datetime.utcnow() - oldest).total_seconds() if oldest else None
+    }
+
+
+def purge_sent_emails(app=None):
+    """
+    Delete sent emails older than MAIL_OUTBOX_KEEP_DAYS.
+
+    Args:
+        app: Flask app object (optional)
+
+    Returns:
+        int: Number of emails deleted
+    """
+    if app:
+        with app.app_context():
+            return _do_purge_sent_emails()
+    return _do_purge_sent_emails()
+
+
+def _do_purge_sent_emails():
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=current_app.config['MAIL_OUTBOX_KEEP_DAYS'])
+    deleted = OutboundEmail.query.filter(
+        OutboundEmail.status == 'sent',
+        OutboundEmail.sent_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,180 @@
+import math
+
+from flask import current_app
+
+from app.models import db, Team, Player
+from app.services.state_service import get_game_state, get_state_versions
+
+# Player views for this process as player_id -> (versions, view)
+_player_views = {}
+
+# Alive players for free-for-all targeting as (versions, roster)
+_free_for_all_roster = (None, [])
+
+
+def _team_data(team):
+    return {
+        'id': team.id,
+        'name': team.name,
+        'photo_path': team.photo_path,
+        'photo_widths': team.photo_widths,
+        'state': team.state,
+        'is_alive': team.is_alive,
+        'eliminations': team.eliminations,
+        'target_id': team.target_id
+    }
+
+
+def _player_data(player):
+    return {
+        'id': player.id,
+        'name': player.name,
+        'state': player.state,
+        'is_alive': player.is_alive,
+        'address': player.address,
+        'obituary': player.get_obituary()
+    }
+
+
+def _build_player_view(player, free_for_all):
+    """
+    Load everything the player pages need in two queries.
+
+    Args:
+        player: Player the view is for
+        free_for_all (bool): Whether targets come from the free-for-all roster
+
+    Returns:
+        dict: Player view
+    """
+    alive_teams = db.session.query(db.func.count(Team.id)).filter(Team.state == 'alive').scalar_subquery()
+    alive_players = db.session.query(db.func.count(Player.id)).filter(Player.state == 'alive').scalar_subquery()
+
+    # The player's team, its target team and the alive counts in one query
+    team, alive_teams_count, alive_players_count = db.session.query(
+        Team, alive_teams, alive_players
+    ).options(
+        db.joinedload(Team.target_team)
+    ).filter(Team.id == player.team_id).one()
+
+    target_team = None if free_for_all else team.target_team
+
+    # The team's players and the target team's players in one query; free-for-all
+    # targets come from the shared roster instead
+    team_ids = [team.id, target_team.id] if target_team else [team.id]
+    players = Player.query.filter(Player.team_id.in_(team_ids)).all()
+
+    teammate = next((p for p in players if p.team_id == team.id and p.id != player.id), None)
+
+    if target_team:
+        target_players = [p for p in players if p.team_id == target_team.id]
+    else:
+        target_players = []
+
+    return {
+        'team': _team_data(team),
+        'teammate': _player_data(teammate) if teammate else None,
+        'target_team': _team_data(target_team) if target_team else None,
+        'target_players': [_player_data(p) for p in target_players],
+        'alive_teams': alive_teams_count,
+        'alive_players': alive_players_count
+    }
+
+
+def get_player_view(player):
+    """
+    Get the team, teammate, targets and alive counts shown to a player.
+
+    Views are cached per player and rebuilt once the game state or leaderboard
+    version moves on, which covers target reassignment, kill confirmations,
+    admin toggles and free-for-all changes.
+
+    Args:
+        player: Player the view is for
+
+    Returns:
+        dict: Player view with team, teammate, target_team, target_players,
+              alive_teams and alive_players (shared, do not modify)
+    """
+    versions = get_state_versions()
+
+    cached = _player_views.get(player.id)
+    if cached and cached[0] == versions:
+        return cached[1]
+
+    view = _build_player_view(player, get_game_state().free_for_all)
+    _player_views[player.id] = (versions, view)
+    return view
+
+
+def _get_free_for_all_roster():
+    """
+    Get every alive player, sorted by name, rebuilt once per state version.
+
+    Returns:
+        list: Alive players as dicts (shared, do not modify)
+    """
+    global _free_for_all_roster
+
+    versions = get_state_versions()
+
+    cached_versions, roster = _free_for_all_roster
+    if cached_versions == versions:
+        return roster
+
+    rows = db.session.query(Player.id, Player.name, Player.address).filter(
+        Player.state == 'alive'
+    ).order_by(Player.name).all()
+
+    roster = [
+        {
+            'id': player_id,
+            'name': name,
+            'state': 'alive',
+            'is_alive': True,
+            'address': address,
+            'obituary': None,
+            'search_name': name.lower()
+        } for player_id, name, address in rows
+    ]
+    _free_for_all_roster = (versions, roster)
+    return roster
+
+
+def get_free_for_all_targets(player, view, page=1, search=None):
+    """
+    Get one page of the free-for-all targets available to a player.
+
+    Args:
+        player: Player looking for targets
+        view (dict): The player's view from get_player_view
+        page (int): Page number, starting at 1
+        search (str, optional): Only include players whose name contains this
+
+    Returns:
+        dict: players on the page, page, pages, total and search
+    """
+    per_page = current_app.config['FREE_FOR_ALL_PAGE_SIZE']
+
+    # Everyone alive except the player and their teammate
+    excluded = {player.id}
+    if view['teammate']:
+        excluded.add(view['teammate']['id'])
+
+    search = (search or '').strip()
+    needle = search.lower()
+    targets = [
+        target for target in _get_free_for_all_roster()
+        if target['id'] not in excluded and needle in target['search_name']
+    ]
+
+    pages = max(1, math.ceil(len(targets) / per_page))
+    page = min(max(1, page), pages)
+
+    return {
+        'players': targets[(page - 1) * per_page:page * per_page],
+        'page': page,
+        'pages': pages,
+        'total': len(targets),
+        'search': search
+    }
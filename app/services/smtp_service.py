@@ -0,0 +1,351 @@
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+# Errors after which a connection is thrown away and the send is tried once more on a fresh one
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+# Bytes of a message file written to the socket at a time
+SEND_BUFFER_SIZE = 64 * 1024
+
+
+class RateLimiter:
+    """
+    Spaces calls out to at most a given rate, shared by every thread.
+    """
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _send_file(server, sender, recipients, message_file):
+    """
+    Send a message the way SMTP.sendmail does, reading it from a file as it goes out.
+
+    Args:
+        server (smtplib.SMTP): Logged-in connection
+        sender (str): Envelope sender
+        recipients (list): Envelope recipients
+        message_file: Binary file holding the whole message with CRLF line endings
+
+    Returns:
+        dict: Recipients the server refused, as address -> (code, reply)
+    """
+    server.ehlo_or_helo_if_needed()
+
+    size = message_file.seek(0, os.SEEK_END)
+    message_file.seek(0)
+    options = [f'size={size}'] if server.does_esmtp and server.has_extn('size') else []
+
+    code, reply = server.mail(sender, options)
+    if code != 250:
+        if code == 421:
+            server.close()
+        raise smtplib.SMTPSenderRefused(code, reply, sender)
+
+    refused = {}
+    for recipient in recipients:
+        code, reply = server.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, reply)
+        if code == 421:
+            server.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(recipients):
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, reply = server.docmd('data')
+    if code != 354:
+        raise smtplib.SMTPDataError(code, reply)
+
+    # Lines starting with a dot get a second one so the server does not take them as the end of the message
+    buffer = bytearray()
+    line = b''
+    for line in message_file:
+        if line.startswith(b'.'):
+            buffer += b'.'
+        buffer += line
+        if len(buffer) >= SEND_BUFFER_SIZE:
+            server.send(bytes(buffer))
+            buffer.clear()
+    buffer += b'.\r\n' if line.endswith(b'\r\n') else b'\r\n.\r\n'
+    server.send(bytes(buffer))
+
+    code, reply = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, reply)
+    return refused
+
+
+def _transmit(server, sender, recipients, message):
+    if isinstance(message, (str, bytes)):
+        return server.sendmail(sender, recipients, message)
+    return _send_file(server, sender, recipients, message)
+
+
+class _Connection:
+    def __init__(self, server):
+        self.server = server
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """
+    A small pool of logged-in SMTP connections shared by every thread.
+
+    Connections are reused between messages so a burst of notifications pays
+    for the TCP, TLS and login round trips once. A connection that sat idle
+    is checked with NOOP before it is used again, one idle for too long is
+    closed, and one that fails mid-send is replaced and the send retried.
+    Messages are spaced out to stay under rate_limit per second.
+    """
+
+    def __init__(self, host, port, use_tls=True, username=None, password=None, size=4, noop_after=30,
+                 idle_timeout=300, timeout=30, rate_limit=0):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.noop_after = noop_after
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_limit)
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            # Login if credentials are provided
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        with self._condition:
+            self.connections_opened += 1
+        return _Connection(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _healthy(self, connection):
+        idle = time.monotonic() - connection.last_used
+        if idle > self.idle_timeout:
+            return False
+        if idle <= self.noop_after:
+            return True
+        try:
+            return connection.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self):
+        with self._condition:
+            while True:
+                if self._idle:
+                    # Most recently used first, so spare connections age out
+                    connection = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    connection = None
+                    break
+                self._condition.wait()
+
+        if connection is not None:
+            if self._healthy(connection):
+                return connection
+            self._close(connection.server)
+
+        try:
+            return self._connect()
+        except Exception:
+            self._discard()
+            raise
+
+    def _checkin(self, connection):
+        connection.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def _discard(self, connection=None):
+        if connection is not None:
+            self._close(connection.server)
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a logged-in connection, returning it to the pool afterwards.
+
+        Yields:
+            smtplib.SMTP: The connection; one that raises is closed rather than returned
+        """
+        connection = self._checkout()
+        try:
+            yield connection.server
+        except CONNECTION_ERRORS:
+            self._discard(connection)
+            raise
+        except Exception:
+            # A refused message leaves the connection usable once the transaction is reset
+            try:
+                connection.server.rset()
+            except Exception:
+                self._discard(connection)
+                raise
+            self._checkin(connection)
+            raise
+        self._checkin(connection)
+
+    def send(self, sender, recipients, message):
+        """
+        Send a message over a pooled connection.
+
+        Args:
+            sender (str): Envelope sender
+            recipients (list): Envelope recipients
+            message (str, bytes or file): The whole message, or a binary file holding
+                it with CRLF line endings, which is streamed rather than read into memory
+
+        Returns:
+            dict: Recipients the server refused, as address -> (code, reply)
+        """
+        # Stay under the provider's sending rate however many threads are sending
+        self.rate_limiter.wait()
+
+        try:
+            with self.connection() as server:
+                refused = _transmit(server, sender, recipients, message)
+        except CONNECTION_ERRORS:
+            # The server dropped a connection the NOOP check thought was fine
+            with self._condition:
+                self.reconnects += 1
+            with self.connection() as server:
+                refused = _transmit(server, sender, recipients, message)
+
+        with self._condition:
+            self.messages_sent += 1
+        return refused
+
+    def close(self):
+        """Close every idle connection."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection.server)
+
+    def stats(self):
+        """
+        Get the connection counts of the pool.
+
+        Returns:
+            dict: size, open, idle, connections_opened, messages_sent and reconnects
+        """
+        with self._condition:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'connections_opened': self.connections_opened,
+                'messages_sent': self.messages_sent,
+                'reconnects': self.reconnects
+            }
+
+
+# Guards creating the pool, which several mail threads may ask for at once
+_smtp_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """
+    Get the SMTP connection pool for the current app, set up from the MAIL_* settings.
+
+    Returns:
+        SMTPPool: The pool
+    """
+    with _smtp_pool_lock:
+        return current_app.extensions.get('smtp_pool') or _create_smtp_pool()
+
+
+def _create_smtp_pool():
+    config = current_app.config
+    pool = SMTPPool(
+        config['MAIL_SERVER'],
+        config['MAIL_PORT'],
+        use_tls=config['MAIL_USE_TLS'],
+        username=config['MAIL_USERNAME'],
+        password=config['MAIL_PASSWORD'],
+        size=config['MAIL_POOL_SIZE'],
+        noop_after=config['MAIL_POOL_NOOP_SECONDS'],
+        idle_timeout=config['MAIL_POOL_IDLE_SECONDS'],
+        rate_limit=config['MAIL_RATE_LIMIT']
+    )
+    current_app.extensions['smtp_pool'] = pool
+    return pool
+
+
+def send_message(msg, recipients):
+    """
+    Send a built email message from MAIL_DEFAULT_SENDER over the shared pool.
+
+    Args:
+        msg: email.message.Message to send
+        recipients (list): Envelope recipients
+
+    Returns:
+        dict: Recipients the server refused, as address -> (code, reply)
+    """
+    return get_smtp_pool().send(current_app.config['MAIL_DEFAULT_SENDER'], recipients, msg.as_string())
+
+
+def send_message_file(message_file, recipients):
+    """
+    Send a message written out to a file from MAIL_DEFAULT_SENDER over the shared pool.
+
+    Args:
+        message_file: Binary file holding the whole message with CRLF line endings
+        recipients (list): Envelope recipients
+
+    Returns:
+        dict: Recipients the server refused, as address -> (code, reply)
+    """
+    return get_smtp_pool().send(current_app.config['MAIL_DEFAULT_SENDER'], recipients, message_file)
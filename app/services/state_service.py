@@ -0,0 +1,113 @@
+import threading
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+from app.models import db, GameState
+
+# Snapshot of the game state shared by every request in this process
+_game_state_cache = (None, None)
+_game_state_lock = threading.Lock()
+
+
+def get_state_versions():
+    """
+    Get the current game state and leaderboard versions.
+
+    The versions are read with one cheap query and memoized for the rest of
+    the request, so every cache consulted during a request shares the probe.
+
+    Returns:
+        tuple: (version, leaderboard_version)
+    """
+    if 'state_versions' in g and not _game_state_changing():
+        return g.state_versions
+
+    # The query flushes any pending change first, so the versions include it
+    row = db.session.query(GameState.version, GameState.leaderboard_version).first()
+    versions = tuple(row) if row else (None, None)
+    g.state_versions = versions
+    return versions
+
+
+def forget_state_versions():
+    """
+    Drop the versions and snapshot memoized for the current request after a change.
+    """
+    if has_app_context():
+        g.pop('state_versions', None)
+        g.pop('game_state_snapshot', None)
+
+
+def _game_state_changing():
+    """
+    Check whether the session holds a change to the game state that has not been flushed yet.
+
+    Returns:
+        bool: True if a GameState is new, modified or deleted in the session
+    """
+    session = db.session
+    return any(isinstance(obj, GameState) for obj in (*session.new, *session.dirty, *session.deleted))
+
+
+@db.event.listens_for(Session, 'after_flush')
+def _forget_flushed_game_state(session, flush_context):
+    """Drop what the request memoized once a change to the game state reaches the database."""
+    if any(isinstance(obj, GameState) for obj in (*session.new, *session.dirty, *session.deleted)):
+        forget_state_versions()
+
+
+@db.event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_game_state(session, previous_transaction):
+    """Drop what the request memoized, as it may have been read from the rolled back changes."""
+    forget_state_versions()
+
+
+def get_game_state():
+    """
+    Get a read-only snapshot of the game state.
+
+    The snapshot is shared by every request in this process and reloaded only
+    when the stored version has moved on, which a single cheap query checks
+    once per request. Changes made to the snapshot are never saved; mutation
+    paths should keep loading GameState through the session.
+
+    Returns:
+        GameState: Detached snapshot of the game state, or None if there is none
+    """
+    global _game_state_cache
+
+    # Code that is changing the game state always gets a snapshot that includes the change
+    changing = _game_state_changing()
+    if 'game_state_snapshot' in g and not changing:
+        return g.game_state_snapshot
+
+    version, _ = get_state_versions()
+
+    cached_version, snapshot = _game_state_cache
+    if snapshot is None or cached_version != version:
+        with _game_state_lock:
+            cached_version, snapshot = _game_state_cache
+            if snapshot is None or cached_version != version:
+                # Read the row without touching any GameState held by the session
+                row = db.session.execute(db.select(*GameState.__table__.columns)).mappings().first()
+                snapshot = GameState(**row) if row else None
+                _game_state_cache = (version, snapshot)
+
+    if not changing:
+        g.game_state_snapshot = snapshot
+    return snapshot
+
+
+def invalidate_game_state():
+    """
+    Mark the cached game state as stale in every worker.
+
+    Only needed after changes made outside the ORM, such as raw SQL; ORM
+    updates bump the version automatically.
+    """
+    db.session.execute(
+        db.update(GameState).values(version=GameState.version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    forget_state_versions()
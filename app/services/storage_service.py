@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+
+# Bytes read from a stream at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Most keys the S3 API deletes in one request
+S3_DELETE_BATCH = 1000
+
+
+class LocalStorage:
+    """
+    Media kept in a folder on this machine.
+
+    Keys are paths relative to the folder, such as 'blobs/videos/ab/cd/abcd....mp4'.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        """Get where a key is stored on this machine, or None if it is stored elsewhere."""
+        return os.path.join(self.root, key)
+
+    def put_stream(self, key, stream):
+        """
+        Store the contents of a stream under a key.
+
+        Args:
+            key (str): Key to store under
+            stream: File-like object to read from
+        """
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Written under a temporary name so a half-written file is never served
+        fd, temp_path = tempfile.mkstemp(prefix='.incoming_', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                shutil.copyfileobj(stream, output, COPY_BUFFER_SIZE)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def put_file(self, key, file_path):
+        """
+        Move a file on this machine into the store.
+
+        Args:
+            key (str): Key to store under
+            file_path (str): File to move
+        """
+        path = self.local_path(key)
+        if os.path.abspath(file_path) == os.path.abspath(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(file_path, path)
+
+    def open(self, key):
+        """Open a key for reading as a binary file-like object."""
+        return open(self.local_path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def size(self, key):
+        """Get the size of a key in bytes."""
+        return os.path.getsize(self.local_path(key))
+
+    def presigned_url(self, key, expires_in):
+        """Local files have no URL of their own, the media endpoint serves them."""
+        return None
+
+    def delete_many(self, keys):
+        """
+        Delete keys, skipping any that do not exist.
+
+        Args:
+            keys (list): Keys to delete
+
+        Returns:
+            int: Number of files deleted
+        """
+        deleted = 0
+        for key in keys:
+            try:
+                os.remove(self.local_path(key))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def delete_prefix(self, prefix):
+        """Delete every key under a folder prefix, such as 'blobs/'."""
+        shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+
+
+class S3Storage:
+    """
+    Media kept in an S3-compatible bucket, such as AWS S3 or MinIO.
+
+    Players fetch files straight from the bucket through presigned URLs, so
+    the bytes never pass through the app workers.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, access_key_id=None,
+                 secret_access_key=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('STORAGE_BACKEND=s3 needs the boto3 package')
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key
+        )
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def local_path(self, key):
+        return None
+
+    def put_stream(self, key, stream):
+        # Sent in multipart chunks, so the whole file is never held in memory
+        self.client.upload_fileobj(stream, self.bucket, self._key(key))
+
+    def put_file(self, key, file_path):
+        self.client.upload_file(file_path, self.bucket, self._key(key))
+        os.remove(file_path)
+
+    def open(self, key):
+        # The body streams from the bucket as it is read
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+
+    def presigned_url(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(key)},
+            ExpiresIn=expires_in
+        )
+
+    def delete_many(self, keys):
+        keys = [self._key(key) for key in keys]
+        deleted = 0
+        for start in range(0, len(keys), S3_DELETE_BATCH):
+            batch = keys[start:start + S3_DELETE_BATCH]
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+            deleted += len(batch) - len(response.get('Errors', []))
+        return deleted
+
+    def delete_prefix(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys = [item['Key'][len(self.prefix):] for item in page.get('Contents', [])]
+            if keys:
+                self.delete_many(keys)
+
+
+def get_storage():
+    """
+    Get the media store for the current app, set up from the STORAGE_BACKEND setting.
+
+    Returns:
+        LocalStorage or S3Storage: The media store
+    """
+    storage = current_app.extensions.get('media_storage')
+    if storage is None:
+        config = current_app.config
+        if config['STORAGE_BACKEND'] == 's3':
+            storage = S3Storage(
+                config['S3_BUCKET'],
+                prefix=config['S3_PREFIX'],
+                endpoint_url=config['S3_ENDPOINT_URL'],
+                region=config['S3_REGION'],
+                access_key_id=config['S3_ACCESS_KEY_ID'],
+                secret_access_key=config['S3_SECRET_ACCESS_KEY']
+            )
+        else:
+            storage = LocalStorage(config['UPLOAD_FOLDER'])
+        current_app.extensions['media_storage'] = storage
+    return storage
@@ -0,0 +1,287 @@
+from flask import current_app, request, has_request_context
+
+from app.models import db, Player, KillConfirmation, ActionLog
+from app.services.email_service import send_kill_submission_notification
+from app.services.admin_email_service import send_admin_video
+from app.services.media_service import get_transcode_pool, PRIORITY_VOTING, PRIORITY_BACKGROUND
+from app.services.blob_service import upload_file_path, stored_path_for, publish_blobs, delete_blobs
+
+
+def get_kill_video_file(kill_confirmation):
+    """
+    Get the location on disk of a kill confirmation's video.
+
+    Args:
+        kill_confirmation: KillConfirmation object
+
+    Returns:
+        str: Absolute path of the uploaded video
+    """
+    return upload_file_path(kill_confirmation.video_path)
+
+
+def queue_kill_processing(kill_confirmation, app=None, base_url=None):
+    """
+    Queue a kill video for transcoding, after which its notifications are sent.
+
+    Kills that are still waiting on votes jump ahead of everything else in the
+    transcode pool, soonest to expire first. Videos that need a full transcode
+    get a quick low resolution preview first, which voters watch until the
+    full-quality video replaces it. Poster images are grabbed before anything
+    else so the voting list can show the kill without loading the video.
+
+    Videos are stored by content, so a video that was uploaded before shares
+    its file with the earlier kills. It is never transcoded twice: the kill
+    takes over the finished rendition, or joins the transcode in progress.
+
+    Args:
+        kill_confirmation: KillConfirmation object, already committed
+        app: Flask application instance, defaults to the current one
+        base_url (str, optional): Site root used for links in the emails,
+                                  defaults to the current request's
+    """
+    app = app or current_app._get_current_object()
+    if base_url is None and has_request_context():
+        base_url = request.url_root
+
+    video_path = kill_confirmation.video_path
+
+    processed = KillConfirmation.query.filter(
+        KillConfirmation.video_path == video_path,
+        KillConfirmation.id != kill_confirmation.id,
+        KillConfirmation.processing_status.in_(['notifying', 'ready', 'failed'])
+    ).first()
+    if processed:
+        _reuse_rendition(app, kill_confirmation, processed, base_url)
+        return
+
+    if kill_confirmation.is_pending:
+        priority = PRIORITY_VOTING
+        deadline = kill_confirmation.expiration_time.timestamp()
+    else:
+        priority = PRIORITY_BACKGROUND
+        deadline = None
+
+    # Every kill sharing the video follows the one job, including kills that join it later
+    def on_start(job):
+        with app.app_context():
+            _update_kills(video_path, processing_status='transcoding')
+
+    def on_preview(job):
+        with app.app_context():
+            preview_path = stored_path_for(job.preview_path)
+            publish_blobs(preview_path)
+            _update_kills(video_path, preview_path=preview_path)
+
+    def on_posters(job):
+        with app.app_context():
+            posters = _poster_columns(job.posters)
+            publish_blobs(*posters.values())
+            _update_kills(video_path, **posters)
+
+    def on_done(job):
+        with app.app_context():
+            _transcode_finished(app, video_path, base_url, job)
+
+    get_transcode_pool().submit(
+        video_path,
+        get_kill_video_file(kill_confirmation),
+        priority=priority,
+        deadline=deadline,
+        on_start=on_start,
+        on_done=on_done,
+        on_preview=on_preview,
+        on_posters=on_posters
+    )
+
+
+def cancel_kill_processing(video_path=None):
+    """
+    Stop transcoding a kill video, or every kill video when no path is given.
+
+    Args:
+        video_path (str, optional): Stored path of the video
+    """
+    pool = get_transcode_pool()
+    if video_path is None:
+        pool.cancel_all()
+    else:
+        pool.cancel(video_path)
+
+
+def queue_kill_notifications(app, kill_confirmation_id, base_url=None, transcoded=True):
+    """
+    Queue the background job that sends the notifications for a kill submission.
+
+    Args:
+        app: Flask application instance
+        kill_confirmation_id (str): ID of the kill confirmation
+        base_url (str, optional): Site root used for links in the emails
+        transcoded (bool): Whether the video was transcoded successfully
+    """
+    from app import scheduler
+
+    # No trigger runs the job straight away on the scheduler's thread pool;
+    # a job that has to wait for a free thread must still run however late
+    scheduler.add_job(
+        send_kill_notifications,
+        id=f'kill_notifications_{kill_confirmation_id}',
+        args=[app, kill_confirmation_id, base_url, transcoded],
+        misfire_grace_time=None,
+        replace_existing=True
+    )
+
+
+def resume_kill_processing(app):
+    """
+    Queue again the kill submissions whose processing was cut short by a restart.
+
+    Args:
+        app: Flask application instance
+    """
+    with app.app_context():
+        unfinished = KillConfirmation.query.filter(
+            KillConfirmation.processing_status.in_(['queued', 'transcoding', 'notifying'])
+        ).all()
+
+        # There is no request to take the site root from, so the emails rely on BASE_URL
+        if unfinished and not app.config['BASE_URL']:
+            app.logger.warning('BASE_URL is not set, links in the resumed kill emails will point at localhost')
+
+        for kill_confirmation in unfinished:
+            if kill_confirmation.processing_status == 'notifying':
+                queue_kill_notifications(app, kill_confirmation.id)
+            else:
+                queue_kill_processing(kill_confirmation, app=app)
+
+
+def _update_processing_status(kill_confirmation_id, status, mode=None):
+    values = {'processing_status': status}
+    if mode:
+        values['processing_mode'] = mode
+
+    db.session.execute(
+        db.update(KillConfirmation).where(KillConfirmation.id == kill_confirmation_id).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def _update_kills(video_path, **values):
+    # Kills that have moved on to their notifications keep what they were sent with
+    db.session.execute(
+        db.update(KillConfirmation).where(
+            KillConfirmation.video_path == video_path,
+            KillConfirmation.processing_status.in_(['queued', 'transcoding'])
+        ).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def _poster_columns(posters):
+    columns = {'poster': 'poster_path', 'poster_webp': 'poster_webp_path', 'thumbnail': 'thumbnail_path'}
+    return {columns[name]: stored_path_for(path) for name, path in posters.items()}
+
+
+def _reuse_rendition(app, kill_confirmation, processed, base_url):
+    kill_confirmation.processing_status = 'notifying'
+    kill_confirmation.processing_mode = processed.processing_mode
+    kill_confirmation.preview_path = processed.preview_path
+    kill_confirmation.poster_path = processed.poster_path
+    kill_confirmation.poster_webp_path = processed.poster_webp_path
+    kill_confirmation.thumbnail_path = processed.thumbnail_path
+    db.session.commit()
+
+    current_app.logger.info(
+        f"Kill video {kill_confirmation.id} is a duplicate of {processed.id}, reusing its rendition"
+    )
+    queue_kill_notifications(app, kill_confirmation.id, base_url, processed.processing_status != 'failed')
+
+
+def _transcode_finished(app, video_path, base_url, job):
+    if job.status == 'cancelled':
+        return
+
+    waiting = db.session.execute(
+        db.select(KillConfirmation.id).where(
+            KillConfirmation.video_path == video_path,
+            KillConfirmation.processing_status.in_(['queued', 'transcoding'])
+        )
+    ).scalars().all()
+
+    # Processed or not, the video is final and moves to the media store
+    publish_blobs(video_path)
+
+    if job.succeeded and job.preview_path:
+        # The full-quality video takes over from the preview
+        _update_kills(video_path, preview_path=None)
+        try:
+            delete_blobs(stored_path_for(job.preview_path))
+        except Exception as e:
+            current_app.logger.error(f"Failed to delete preview {job.preview_path}: {e}")
+
+    if not job.succeeded:
+        # Voters still get the original upload
+        for kill_confirmation_id in waiting:
+            log = ActionLog(
+                action_type='video_processing_failed',
+                description=f'Could not process the video for kill confirmation {kill_confirmation_id} '
+                            f'({job.status}{": " + job.error if job.error else ""})',
+                actor='system'
+            )
+            db.session.add(log)
+
+    metrics = job.metrics()
+    current_app.logger.info(
+        f"Kill video {video_path} {job.status} ({job.mode}) for {len(waiting)} kill(s): "
+        f"waited {metrics['wait_seconds']}s, processed in {metrics['run_seconds']}s, "
+        f"saved about {metrics['time_saved_seconds'] or 0}s"
+    )
+
+    values = {'processing_status': 'notifying'}
+    if job.mode:
+        values['processing_mode'] = job.mode
+    _update_kills(video_path, **values)
+    for kill_confirmation_id in waiting:
+        queue_kill_notifications(app, kill_confirmation_id, base_url, job.succeeded)
+
+
+def send_kill_notifications(app, kill_confirmation_id, base_url=None, transcoded=True):
+    """
+    Notify the players about a kill submission and email its video to the admins.
+
+    Args:
+        app: Flask application instance
+        kill_confirmation_id (str): ID of the kill confirmation
+        base_url (str, optional): Site root used for links in the emails,
+                                  defaults to the BASE_URL setting
+        transcoded (bool): Whether the video was transcoded successfully
+    """
+    # A request context lets the email templates build external links
+    with app.test_request_context(base_url=base_url or app.config['BASE_URL']):
+        _do_send_kill_notifications(kill_confirmation_id, transcoded)
+
+
+def _do_send_kill_notifications(kill_confirmation_id, transcoded):
+    kill_confirmation = db.session.get(KillConfirmation, kill_confirmation_id)
+    if not kill_confirmation:
+        return
+
+    try:
+        send_kill_submission_notification(kill_confirmation)
+    except Exception as e:
+        current_app.logger.error(f"Error sending kill submission notification: {e}")
+
+    attacker = db.session.get(Player, kill_confirmation.attacker_id)
+    victim = db.session.get(Player, kill_confirmation.victim_id)
+    try:
+        send_admin_video(f"{victim.name} tagged by {attacker.name}",
+                         f"attacker ID {attacker.id}\n"
+                         f"victim ID: {victim.id}\n"
+                         f"time of kill: {kill_confirmation.kill_time}", video_path=kill_confirmation.video_path,
+                         idempotency_key=f'admin_video:{kill_confirmation_id}')
+    except Exception as e:
+        current_app.logger.error(f"Error sending kill video to the admin: {e}")
+
+    _update_processing_status(kill_confirmation_id, 'ready' if transcoded else 'failed')
@@ -0,0 +1,138 @@
+import random
+import time
+
+
+def shuffle_cycle(team_ids, recent_targets=None, rng=random):
+    """
+    Arrange teams in a single random cycle, ignoring assignment history.
+
+    Args:
+        team_ids (list): IDs of the teams to arrange
+        recent_targets (dict, optional): Unused, accepted for a common engine signature
+        rng: Random number generator to use
+
+    Returns:
+        tuple: (assignments, conflicts) - dict of team_id -> target_id, and the
+               number of assignments that repeat a recent target (always 0)
+    """
+    order = list(team_ids)
+    if len(order) < 2:
+        return {}, 0
+
+    rng.shuffle(order)
+    assignments = {order[i]: order[(i + 1) % len(order)] for i in range(len(order))}
+    return assignments, 0
+
+
+def history_cycle(team_ids, recent_targets=None, rng=random, attempts=20):
+    """
+    Arrange teams in a single random cycle that avoids recent targets.
+
+    The teams are shuffled once, then a single pass repairs every edge that
+    points a team at one of its recent targets by swapping the offending
+    target with a random position elsewhere in the cycle. Each swap is only
+    kept if every edge it touches is allowed, so earlier repairs are never
+    undone and the whole pass runs in linear time.
+
+    Args:
+        team_ids (list): IDs of the teams to arrange
+        recent_targets (dict, optional): team_id -> set of target IDs to avoid
+        rng: Random number generator to use
+        attempts (int): Random swaps to try per conflicting edge
+
+    Returns:
+        tuple: (assignments, conflicts) - dict of team_id -> target_id, and the
+               number of assignments that still repeat a recent target
+    """
+    order = list(team_ids)
+    n = len(order)
+    if n < 2:
+        return {}, 0
+
+    recent_targets = recent_targets or {}
+
+    def allowed(position):
+        hunter = order[position % n]
+        target = order[(position + 1) % n]
+        return target not in recent_targets.get(hunter, ())
+
+    rng.shuffle(order)
+
+    for i in range(n):
+        if allowed(i):
+            continue
+
+        target_position = (i + 1) % n
+        for _ in range(attempts):
+            j = rng.randrange(n)
+            if j == target_position:
+                continue
+
+            # Edges leading into and out of both swapped positions
+            touched = {(target_position - 1) % n, target_position, (j - 1) % n, j}
+
+            order[target_position], order[j] = order[j], order[target_position]
+            if all(allowed(position) for position in touched):
+                break
+            order[target_position], order[j] = order[j], order[target_position]
+
+    assignments = {order[i]: order[(i + 1) % n] for i in range(n)}
+    conflicts = sum(1 for i in range(n) if not allowed(i))
+    return assignments, conflicts
+
+
+# Assignment engines selectable through the TARGET_ASSIGNMENT_ENGINE setting
+engines = {
+    'shuffle': shuffle_cycle,
+    'history': history_cycle
+}
+
+
+def build_assignments(team_ids, history=None, engine='history', rng=random):
+    """
+    Build a single target cycle, relaxing the history constraint until it can be met.
+
+    Args:
+        team_ids (list): IDs of the teams to arrange
+        history (list, optional): One dict of team_id -> target_id per previous
+                                  round, most recent round first
+        engine (str): Name of the assignment engine to use
+        rng: Random number generator to use
+
+    Returns:
+        tuple: (assignments, rounds_avoided) - dict of team_id -> target_id, and
+               how many previous rounds the assignment avoids repeating
+    """
+    build_cycle = engines.get(engine, history_cycle)
+    history = history or []
+
+    # Fall back to remembering fewer rounds when the constraints cannot be met
+    for rounds in range(len(history), -1, -1):
+        recent_targets = {}
+        for round_targets in history[:rounds]:
+            for team_id, target_id in round_targets.items():
+                # Avoid both the same target and a team that recently hunted you
+                recent_targets.setdefault(team_id, set()).add(target_id)
+                recent_targets.setdefault(target_id, set()).add(team_id)
+
+        # A fresh shuffle often succeeds where the previous one got stuck
+        for _ in range(3):
+            assignments, conflicts = build_cycle(team_ids, recent_targets, rng=rng)
+            if conflicts == 0:
+                return assignments, rounds
+
+    return assignments, 0
+
+
+# Example usage:
+if __name__ == "__main__":
+    # Time a large game with three rounds of history
+    team_count = 10000
+    teams = [str(i) for i in range(team_count)]
+    past_rounds = [build_assignments(teams, engine='shuffle')[0] for _ in range(3)]
+
+    started = time.perf_counter()
+    result, avoided = build_assignments(teams, past_rounds)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"Assigned {len(result)} teams avoiding {avoided} rounds in {elapsed:.1f} ms")
@@ -0,0 +1,214 @@
+import datetime
+import fcntl
+import hashlib
+import hmac
+import os
+import shutil
+import uuid
+
+from flask import current_app
+
+from app.models import db, ChunkedUpload
+from app.services.blob_service import store_file, BLOB_FOLDER, KIND_VIDEOS
+
+# Bytes copied from the request at a time
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def _spool_path(upload):
+    return os.path.join(current_app.config['UPLOAD_SPOOL_FOLDER'], f"{upload.id}.part")
+
+
+def create_upload(player_id, filename, size):
+    """
+    Start a resumable upload.
+
+    Args:
+        player_id (str): ID of the player uploading
+        filename (str): Name of the file on the player's device
+        size (int): Total size of the file in bytes
+
+    Returns:
+        ChunkedUpload: The new upload
+    """
+    os.makedirs(current_app.config['UPLOAD_SPOOL_FOLDER'], exist_ok=True)
+
+    upload = ChunkedUpload(player_id=player_id, filename=filename, size=size)
+    db.session.add(upload)
+    db.session.commit()
+
+    # An empty spool file means the upload starts at offset 0
+    open(_spool_path(upload), 'wb').close()
+
+    return upload
+
+
+def get_upload_offset(upload):
+    """
+    Get how many bytes of an upload have been received, which is where the client resumes from.
+
+    Args:
+        upload: ChunkedUpload object
+
+    Returns:
+        int: Bytes received so far
+    """
+    try:
+        return os.path.getsize(_spool_path(upload))
+    except OSError:
+        return 0
+
+
+def append_chunk(upload, offset, stream, checksum=None):
+    """
+    Append a chunk to an upload's spool file.
+
+    The chunk must start exactly where the received data ends, so a chunk
+    that is retried after a dropped connection is never written twice.
+
+    Args:
+        upload: ChunkedUpload object
+        offset (int): Position of the chunk in the file
+        stream: File-like object to read the chunk from
+        checksum (str, optional): SHA-256 hex digest the chunk must match
+
+    Returns:
+        tuple: (success, offset or error message) - the new offset on success
+    """
+    path = _spool_path(upload)
+    if not os.path.exists(path):
+        return False, 'Upload not found.'
+
+    with open(path, 'r+b') as spool:
+        # Serialize writers to the same upload across workers
+        fcntl.flock(spool, fcntl.LOCK_EX)
+
+        received = os.fstat(spool.fileno()).st_size
+        if offset != received:
+            return False, f'Expected offset {received}.'
+
+        spool.seek(received)
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            while True:
+                block = stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                if received + written + len(block) > upload.size:
+                    spool.truncate(received)
+                    return False, 'Chunk runs past the end of the upload.'
+                spool.write(block)
+                digest.update(block)
+                written += len(block)
+        except Exception:
+            # Without a checksum whatever arrived before the connection dropped
+            # is kept and the client resumes after it
+            if checksum:
+                spool.truncate(received)
+            raise
+
+        if checksum and not hmac.compare_digest(digest.hexdigest(), checksum.lower()):
+            # Throw the damaged chunk away so the client can send it again
+            spool.truncate(received)
+            return False, 'Chunk checksum does not match.'
+
+    upload.updated_at = datetime.datetime.utcnow()
+    db.session.commit()
+
+    return True, received + written
+
+
+def finalize_upload(upload, checksum=None):
+    """
+    Verify a finished upload and add it to the blob store.
+
+    The upload itself is kept until cancel_upload is called, so a kill that is
+    rejected can be submitted again without sending the video again.
+
+    Args:
+        upload: ChunkedUpload object
+        checksum (str, optional): SHA-256 hex digest of the whole file
+
+    Returns:
+        tuple: (success, stored path of the video or error message, whether the
+                video was new to the blob store)
+    """
+    path = _spool_path(upload)
+    received = get_upload_offset(upload)
+    if received != upload.size:
+        return False, f'Upload incomplete: received {received} of {upload.size} bytes.', False
+
+    # The digest is the video's address in the blob store, so it is always computed
+    digest = hashlib.sha256()
+    with open(path, 'rb') as spool:
+        for block in iter(lambda: spool.read(COPY_BUFFER_SIZE), b''):
+            digest.update(block)
+    if checksum and not hmac.compare_digest(digest.hexdigest(), checksum.lower()):
+        # There is no telling which chunk is damaged, so the upload starts over
+        cancel_upload(upload)
+        return False, 'File checksum does not match, please upload the video again.', False
+
+    file_ext = upload.filename.rsplit('.', 1)[1].lower()
+    video_path, existed = store_file(_stage_copy(path), file_ext, KIND_VIDEOS, digest=digest.hexdigest())
+
+    return True, video_path, not existed
+
+
+def _stage_copy(path):
+    # A second link to the spool file costs nothing; a copy is only made across filesystems
+    staging = os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER)
+    os.makedirs(staging, exist_ok=True)
+    staged = os.path.join(staging, f'.incoming_{uuid.uuid4().hex}')
+    try:
+        os.link(path, staged)
+    except OSError:
+        shutil.copyfile(path, staged)
+    return staged
+
+
+def cancel_upload(upload):
+    """
+    Delete an upload and what was received, once it is submitted or abandoned.
+
+    Args:
+        upload: ChunkedUpload object
+    """
+    try:
+        os.remove(_spool_path(upload))
+    except OSError:
+        pass
+
+    db.session.delete(upload)
+    db.session.commit()
+
+
+def purge_stale_uploads(app=None):
+    """
+    Delete uploads that have not received a chunk for UPLOAD_SPOOL_HOURS.
+
+    Args:
+        app: Flask app object (optional)
+
+    Returns:
+        int: Number of uploads deleted
+    """
+    if app:
+        with app.app_context():
+            return _do_purge_stale_uploads()
+    return _do_purge_stale_uploads()
+
+
+def _do_purge_stale_uploads():
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=current_app.config['UPLOAD_SPOOL_HOURS'])
+    stale = ChunkedUpload.query.filter(ChunkedUpload.updated_at < cutoff).all()
+
+    for upload in stale:
+        try:
+            os.remove(_spool_path(upload))
+        except OSError:
+            pass
+        db.session.delete(upload)
+
+    db.session.commit()
+    return len(stale)
@@ -90,6 +90,21 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // Swap video posters for the real video when clicked
+    const videoPosters = document.querySelectorAll('.video-poster');
+    videoPosters.forEach(poster => {
+        poster.addEventListener('click', function() {
+            const video = document.createElement('video');
+            video.controls = true;
+            video.autoplay = true;
+            video.playsInline = true;
+            video.src = this.dataset.videoSrc;
+            this.innerHTML = '';
+            this.classList.remove('video-poster');
+            this.appendChild(video);
+        }, { once: true });
+    });
+    
     // Auto-close alerts after 5 seconds
     const alerts = document.querySelectorAll('.alert');
     alerts.forEach(alert => {
@@ -0,0 +1,26 @@
+"""Send outbox mail to hidden recipients
+
+Revision ID: 03dd49f6ce1d
+Revises: 3f5f26247631
+Create Date: 2026-10-17 10:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '03dd49f6ce1d'
+down_revision = '3f5f26247631'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('bcc', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('outbox', schema=None) as batch_op:
+        batch_op.drop_column('bcc')
@@ -0,0 +1,26 @@
+"""Record the widths of resized team photos
+
+Revision ID: 06dc2789a321
+Revises: f576526b482e
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '06dc2789a321'
+down_revision = 'f576526b482e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('photo_widths', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.drop_column('photo_widths')
@@ -0,0 +1,30 @@
+"""Keep posters and thumbnails of kill videos
+
+Revision ID: 0f41665b2615
+Revises: f89ebfe9653f
+Create Date: 2026-10-17 09:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f41665b2615'
+down_revision = 'f89ebfe9653f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('poster_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('poster_webp_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_path', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_column('thumbnail_path')
+        batch_op.drop_column('poster_webp_path')
+        batch_op.drop_column('poster_path')
@@ -0,0 +1,26 @@
+"""Record how each kill video was processed
+
+Revision ID: 283bbeb51138
+Revises: 4bdee601b013
+Create Date: 2026-10-17 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '283bbeb51138'
+down_revision = '4bdee601b013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_mode', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_column('processing_mode')
@@ -0,0 +1,26 @@
+"""Version the game state
+
+Revision ID: 2cfa8df8dce0
+Revises: d1a928aec7ab
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2cfa8df8dce0'
+down_revision = 'd1a928aec7ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game_state', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('game_state', schema=None) as batch_op:
+        batch_op.drop_column('version')
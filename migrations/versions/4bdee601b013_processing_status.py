@@ -0,0 +1,29 @@
+"""Track background processing of kill videos
+
+Revision ID: 4bdee601b013
+Revises: 2cfa8df8dce0
+Create Date: 2026-10-17 09:35:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4bdee601b013'
+down_revision = '2cfa8df8dce0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_status', sa.String(length=20), nullable=True))
+
+    # Videos submitted before were processed before the submission was saved
+    op.execute("UPDATE kill_confirmations SET processing_status = 'ready'")
+
+
+def downgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_column('processing_status')
@@ -0,0 +1,47 @@
+"""Hold notifications for per-player digests
+
+Revision ID: 809ace6934cc
+Revises: 03dd49f6ce1d
+Create Date: 2026-10-17 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '809ace6934cc'
+down_revision = '03dd49f6ce1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('player_id', sa.String(length=36), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('event_key', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('player_id', 'event_type', 'event_key', name='uq_pending_notifications_player_event')
+    )
+    with op.batch_alter_table('pending_notifications', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pending_notifications_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pending_notifications_player_id'), ['player_id'], unique=False)
+
+    with op.batch_alter_table('players', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notification_mode', sa.String(length=10), nullable=False, server_default='instant'))
+
+
+def downgrade():
+    with op.batch_alter_table('players', schema=None) as batch_op:
+        batch_op.drop_column('notification_mode')
+
+    with op.batch_alter_table('pending_notifications', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pending_notifications_player_id'))
+        batch_op.drop_index(batch_op.f('ix_pending_notifications_created_at'))
+    op.drop_table('pending_notifications')
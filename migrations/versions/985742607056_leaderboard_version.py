@@ -0,0 +1,26 @@
+"""Version the leaderboard
+
+Revision ID: 985742607056
+Revises: dcec1d5f7693
+Create Date: 2026-10-17 09:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '985742607056'
+down_revision = 'dcec1d5f7693'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('game_state', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('leaderboard_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('game_state', schema=None) as batch_op:
+        batch_op.drop_column('leaderboard_version')
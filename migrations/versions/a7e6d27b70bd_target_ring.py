@@ -0,0 +1,28 @@
+"""Keep the target ring up to date incrementally
+
+Revision ID: a7e6d27b70bd
+Revises: b840a8172c2c
+Create Date: 2026-10-17 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e6d27b70bd'
+down_revision = 'b840a8172c2c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('target_cleared_round', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_teams_target_id'), ['target_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('teams', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_teams_target_id'))
+        batch_op.drop_column('target_cleared_round')
@@ -0,0 +1,32 @@
+"""Index the voter queue lookups
+
+Revision ID: b7ce9f70ec87
+Revises: 985742607056
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7ce9f70ec87'
+down_revision = '985742607056'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.create_index('ix_kill_confirmations_status_expiration', ['status', 'expiration_time'], unique=False)
+
+    with op.batch_alter_table('kill_votes', schema=None) as batch_op:
+        batch_op.create_index('ix_kill_votes_voter_confirmation', ['voter_id', 'kill_confirmation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('kill_votes', schema=None) as batch_op:
+        batch_op.drop_index('ix_kill_votes_voter_confirmation')
+
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_index('ix_kill_confirmations_status_expiration')
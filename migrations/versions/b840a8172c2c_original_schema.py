@@ -0,0 +1,103 @@
+"""Original schema
+
+Revision ID: b840a8172c2c
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b840a8172c2c'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('action_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('action_type', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('actor', sa.String(length=100), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('game_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('game_name', sa.String(length=128), nullable=False),
+        sa.Column('state', sa.String(length=20), nullable=True),
+        sa.Column('round_number', sa.Integer(), nullable=True),
+        sa.Column('voting_threshold', sa.Integer(), nullable=True),
+        sa.Column('voting_enabled', sa.Boolean(), nullable=True),
+        sa.Column('round_start', sa.DateTime(), nullable=True),
+        sa.Column('round_end', sa.DateTime(), nullable=True),
+        sa.Column('free_for_all', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('teams',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('photo_path', sa.String(length=255), nullable=True),
+        sa.Column('state', sa.String(length=20), nullable=True),
+        sa.Column('target_id', sa.String(length=36), nullable=True),
+        sa.Column('eliminations', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['target_id'], ['teams.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('players',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('address', sa.Text(), nullable=False),
+        sa.Column('state', sa.String(length=20), nullable=True),
+        sa.Column('team_id', sa.String(length=36), nullable=False),
+        sa.Column('obituary', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table('kill_confirmations',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('victim_id', sa.String(length=36), nullable=False),
+        sa.Column('attacker_id', sa.String(length=36), nullable=False),
+        sa.Column('kill_time', sa.DateTime(), nullable=False),
+        sa.Column('round_number', sa.Integer(), nullable=False),
+        sa.Column('video_path', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('expiration_time', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['attacker_id'], ['players.id'], ),
+        sa.ForeignKeyConstraint(['victim_id'], ['players.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('kill_votes',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('kill_confirmation_id', sa.String(length=36), nullable=False),
+        sa.Column('voter_id', sa.String(length=36), nullable=False),
+        sa.Column('vote', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['kill_confirmation_id'], ['kill_confirmations.id'], ),
+        sa.ForeignKeyConstraint(['voter_id'], ['players.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('kill_votes')
+    op.drop_table('kill_confirmations')
+    op.drop_table('players')
+    op.drop_table('teams')
+    op.drop_table('game_state')
+    op.drop_table('action_logs')
@@ -0,0 +1,53 @@
+"""Keep vote tallies on kill confirmations
+
+Revision ID: d1a928aec7ab
+Revises: b7ce9f70ec87
+Create Date: 2026-10-17 09:25:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1a928aec7ab'
+down_revision = 'b7ce9f70ec87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('approve_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('reject_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # A voter could vote twice before votes were unique; the first vote stands
+    op.execute(
+        "DELETE FROM kill_votes WHERE EXISTS ("
+        "SELECT 1 FROM kill_votes AS earlier"
+        " WHERE earlier.kill_confirmation_id = kill_votes.kill_confirmation_id"
+        " AND earlier.voter_id = kill_votes.voter_id"
+        " AND (earlier.created_at < kill_votes.created_at"
+        " OR (earlier.created_at = kill_votes.created_at AND earlier.id < kill_votes.id)"
+        " OR (earlier.created_at IS NULL AND kill_votes.created_at IS NULL AND earlier.id < kill_votes.id)))"
+    )
+
+    op.execute(
+        "UPDATE kill_confirmations SET"
+        " approve_count = (SELECT COUNT(*) FROM kill_votes"
+        " WHERE kill_votes.kill_confirmation_id = kill_confirmations.id AND kill_votes.vote = true),"
+        " reject_count = (SELECT COUNT(*) FROM kill_votes"
+        " WHERE kill_votes.kill_confirmation_id = kill_confirmations.id AND kill_votes.vote = false)"
+    )
+
+    with op.batch_alter_table('kill_votes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_kill_votes_confirmation_voter', ['kill_confirmation_id', 'voter_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('kill_votes', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_kill_votes_confirmation_voter', type_='unique')
+
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_column('reject_count')
+        batch_op.drop_column('approve_count')
@@ -0,0 +1,37 @@
+"""Remember past targets for the cycle generator
+
+Revision ID: dcec1d5f7693
+Revises: a7e6d27b70bd
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dcec1d5f7693'
+down_revision = 'a7e6d27b70bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('target_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('round_number', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.String(length=36), nullable=False),
+        sa.Column('target_id', sa.String(length=36), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['target_id'], ['teams.id'], ),
+        sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('target_history', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_target_history_round_number'), ['round_number'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('target_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_target_history_round_number'))
+    op.drop_table('target_history')
@@ -0,0 +1,37 @@
+"""Add resumable chunked uploads
+
+Revision ID: f576526b482e
+Revises: 0f41665b2615
+Create Date: 2026-10-17 09:55:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f576526b482e'
+down_revision = '0f41665b2615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chunked_uploads',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('player_id', sa.String(length=36), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chunked_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chunked_uploads_player_id'), ['player_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chunked_uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chunked_uploads_player_id'))
+    op.drop_table('chunked_uploads')
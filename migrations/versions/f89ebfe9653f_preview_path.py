@@ -0,0 +1,26 @@
+"""Keep a preview of kill videos being transcoded
+
+Revision ID: f89ebfe9653f
+Revises: 283bbeb51138
+Create Date: 2026-10-17 09:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f89ebfe9653f'
+down_revision = '283bbeb51138'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview_path', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('kill_confirmations', schema=None) as batch_op:
+        batch_op.drop_column('preview_path')
@@ -0,0 +1,92 @@
+import os
+import socket
+import threading
+
+import pytest
+from aiosmtpd.controller import Controller
+
+os.environ.setdefault('GAME_NAME', 'test')
+
+from app import create_app, scheduler
+from app.config import TestingConfig
+from app.models import db, Player, Team
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app on an in-memory database with its files kept under a temporary folder."""
+    monkeypatch.setattr(TestingConfig, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(TestingConfig, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    monkeypatch.setattr(TestingConfig, 'UPLOAD_SPOOL_FOLDER', str(tmp_path / 'spool'))
+    # Every test starts a new database, so a snapshot left by another test may share its version
+    monkeypatch.setattr('app.services.state_service._game_state_cache', (None, None))
+
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+    scheduler.remove_all_jobs()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def player(app):
+    team = Team(name='Team 1', state='alive')
+    db.session.add(team)
+    db.session.flush()
+    player = Player(name='Player 1', email='player1@example.com', phone='555-0100', address='1 Main St',
+                    team_id=team.id, password_hash='x')
+    db.session.add(player)
+    db.session.commit()
+    return player
+
+
+@pytest.fixture
+def player_client(client, player):
+    """A test client logged in as a player."""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(player.id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.fixture
+def no_mail_workers(monkeypatch):
+    """Keep queued email in the outbox, so tests send it by calling process_next_email themselves."""
+    monkeypatch.setattr('app.services.outbox_service.MailWorkers.wake', lambda self, count=1: None)
+
+
+class RecordingHandler:
+    """Keeps every message the stand-in server accepts, and which session it came in on."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.messages.append(envelope)
+            self.sessions.add(id(session))
+        return '250 OK'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    try:
+        yield controller
+    finally:
+        controller.stop()
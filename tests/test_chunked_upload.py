@@ -0,0 +1,92 @@
+import hashlib
+import os
+
+import pytest
+
+from app.models import db, ChunkedUpload, GameState, KillConfirmation, Player, Team
+from app.services.upload_service import _spool_path
+
+VIDEO = b'kill video ' * 1000
+
+
+@pytest.fixture
+def live_game(app, player, monkeypatch):
+    """A live round where the logged-in player's team hunts Team 2, with kill processing held back."""
+    processed = []
+    monkeypatch.setattr('app.services.game_service.queue_kill_processing', processed.append)
+
+    target_team = Team(name='Team 2', state='alive')
+    other_team = Team(name='Team 3', state='alive')
+    db.session.add_all([target_team, other_team])
+    db.session.flush()
+    player.team.target_id = target_team.id
+    target_team.target_id = other_team.id
+    other_team.target_id = player.team_id
+    victims = {}
+    for team in (target_team, other_team):
+        victims[team.name] = Player(name=f'{team.name} Player', email=f'{team.id}@example.com', phone='555-0100',
+                                    address='1 Main St', team_id=team.id, password_hash='x')
+    db.session.add_all(victims.values())
+    game_state = GameState.query.first()
+    game_state.state = 'live'
+    game_state.round_number = 1
+    db.session.commit()
+    return victims, processed
+
+
+def _upload(client):
+    started = client.post('/game/uploads', json={'filename': 'kill.mp4', 'size': len(VIDEO)})
+    assert started.status_code == 201
+    upload_id = started.get_json()['upload_id']
+    sent = client.put(f'/game/uploads/{upload_id}?offset=0', data=VIDEO)
+    assert sent.get_json()['offset'] == len(VIDEO)
+    return upload_id
+
+
+def _finalize(client, upload_id, victim):
+    return client.post(f'/game/uploads/{upload_id}/finalize', data={
+        'victim_id': victim.id,
+        'kill_time': '2026-10-17T12:00',
+        'rules_confirmed': 'on',
+        'checksum': hashlib.sha256(VIDEO).hexdigest()
+    })
+
+
+def test_rejected_kill_keeps_upload_for_resubmission(app, player_client, live_game):
+    victims, processed = live_game
+    upload_id = _upload(player_client)
+
+    # Team 3 is not the player's target
+    rejected = _finalize(player_client, upload_id, victims['Team 3'])
+
+    assert rejected.status_code == 400
+    upload = db.session.get(ChunkedUpload, upload_id)
+    assert upload is not None
+    assert os.path.getsize(_spool_path(upload)) == len(VIDEO)
+    assert player_client.get(f'/game/uploads/{upload_id}').get_json()['offset'] == len(VIDEO)
+
+    accepted = _finalize(player_client, upload_id, victims['Team 2'])
+
+    assert accepted.status_code == 200
+    kill = KillConfirmation.query.one()
+    assert processed == [kill]
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], kill.video_path[len('uploads/'):]), 'rb') as video:
+        assert video.read() == VIDEO
+    assert db.session.get(ChunkedUpload, upload_id) is None
+    assert not os.path.exists(_spool_path(upload))
+
+
+def test_checksum_mismatch_discards_upload(app, player_client, live_game):
+    victims, _ = live_game
+    upload_id = _upload(player_client)
+
+    response = player_client.post(f'/game/uploads/{upload_id}/finalize', data={
+        'victim_id': victims['Team 2'].id,
+        'kill_time': '2026-10-17T12:00',
+        'rules_confirmed': 'on',
+        'checksum': hashlib.sha256(b'something else').hexdigest()
+    })
+
+    assert response.status_code == 400
+    assert db.session.get(ChunkedUpload, upload_id) is None
+    assert KillConfirmation.query.count() == 0
@@ -0,0 +1,80 @@
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+
+from app import BASELINE_REVISION, upgrade_database
+from app.models import db
+
+
+def _drop_everything():
+    db.session.remove()
+    db.drop_all()
+    db.session.execute(db.text('DROP TABLE IF EXISTS alembic_version'))
+    db.session.commit()
+
+
+def _current_revision():
+    return db.session.execute(db.text('SELECT version_num FROM alembic_version')).scalar()
+
+
+def _schema_differences():
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'compare_type': True})
+        return compare_metadata(context, db.metadata)
+
+
+def test_new_database_is_stamped_with_newest_revision(app):
+    assert _current_revision() is not None
+    assert _schema_differences() == []
+
+
+def test_migrations_build_the_schema_of_the_models(app):
+    _drop_everything()
+
+    upgrade()
+
+    assert _schema_differences() == []
+
+
+def test_migrations_downgrade_to_empty_database(app):
+    _drop_everything()
+    upgrade()
+
+    downgrade(revision='base')
+
+    assert db.inspect(db.engine).get_table_names() == ['alembic_version']
+
+
+def test_database_from_before_migrations_is_upgraded(app):
+    _drop_everything()
+    upgrade(revision=BASELINE_REVISION)
+    db.session.execute(db.text('DROP TABLE alembic_version'))
+    for statement in [
+        "INSERT INTO game_state (id, game_name, state, round_number) VALUES (1, 'test', 'live', 1)",
+        "INSERT INTO teams (id, name, state) VALUES ('t1', 'Team 1', 'alive'), ('t2', 'Team 2', 'alive')",
+        "INSERT INTO players (id, name, email, password_hash, phone, address, team_id) VALUES"
+        " ('p1', 'Player 1', 'p1@example.com', 'x', '1', 'a', 't1'),"
+        " ('p2', 'Player 2', 'p2@example.com', 'x', '1', 'a', 't2'),"
+        " ('p3', 'Player 3', 'p3@example.com', 'x', '1', 'a', 't2')",
+        "INSERT INTO kill_confirmations (id, victim_id, attacker_id, kill_time, round_number, video_path, status,"
+        " expiration_time) VALUES ('k1', 'p2', 'p1', '2026-01-01 00:00:00', 1, 'uploads/kill_k1.mp4', 'pending',"
+        " '2026-01-02 00:00:00')",
+        "INSERT INTO kill_votes (id, kill_confirmation_id, voter_id, vote, created_at) VALUES"
+        " ('v1', 'k1', 'p3', 1, '2026-01-01 01:00:00'),"
+        " ('v2', 'k1', 'p3', 0, '2026-01-01 02:00:00'),"
+        " ('v3', 'k1', 'p1', 0, '2026-01-01 03:00:00')",
+    ]:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+
+    upgrade_database()
+
+    assert _schema_differences() == []
+    row = db.session.execute(db.text(
+        'SELECT approve_count, reject_count, processing_status FROM kill_confirmations'
+    )).one()
+    # The second vote from the same player is dropped for the unique constraint
+    assert tuple(row) == (1, 1, 'ready')
+    assert db.session.execute(db.text('SELECT id FROM kill_votes ORDER BY id')).scalars().all() == ['v1', 'v3']
+    assert db.session.execute(db.text('SELECT version, leaderboard_version FROM game_state')).one() == (0, 0)
+    assert set(db.session.execute(db.text('SELECT notification_mode FROM players')).scalars()) == {'instant'}
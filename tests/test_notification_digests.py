@@ -0,0 +1,127 @@
+import datetime
+
+import pytest
+
+from app.models import db, KillConfirmation, OutboundEmail, PendingNotification, Player, Team
+from app.services.email_service import _do_send_notification_digests
+from app.services.notification_service import EVENT_KILL_SUBMISSION, collect_due_digests, queue_digest_event
+
+
+@pytest.fixture
+def players(app, no_mail_workers):
+    """Four players on two teams; the first three want digests."""
+    players = []
+    for team_number in range(2):
+        team = Team(name=f'Team {team_number}', state='alive')
+        db.session.add(team)
+        db.session.flush()
+        for player_number in range(2):
+            index = team_number * 2 + player_number
+            players.append(Player(name=f'Player {index}', email=f'player{index}@example.com', phone='555-0100',
+                                  address='1 Main St', team_id=team.id, password_hash='x',
+                                  notification_mode='digest' if index < 3 else 'instant'))
+    db.session.add_all(players)
+    db.session.commit()
+    return players
+
+
+def _submit_kill(players):
+    now = datetime.datetime.utcnow()
+    kill = KillConfirmation(victim_id=players[2].id, attacker_id=players[0].id, kill_time=now, round_number=1,
+                            video_path='uploads/kill.mp4', expiration_time=now + datetime.timedelta(days=1))
+    db.session.add(kill)
+    db.session.commit()
+
+    queue_digest_event(EVENT_KILL_SUBMISSION, kill.id, {
+        'kill_confirmation_id': kill.id,
+        'attacker': 'Player 0',
+        'attacker_team': 'Team 0',
+        'victim': 'Player 2',
+        'victim_team': 'Team 1',
+        'kill_time': now.strftime('%Y-%m-%d %H:%M'),
+        'round_number': 1
+    })
+    return kill
+
+
+def _close_windows():
+    PendingNotification.query.update({'created_at': datetime.datetime.utcnow() - datetime.timedelta(hours=1)})
+    db.session.commit()
+
+
+def _send_digests(app):
+    with app.test_request_context():
+        return _do_send_notification_digests()
+
+
+def test_event_is_held_once_per_digest_player(players):
+    kill = _submit_kill(players)
+
+    assert queue_digest_event(EVENT_KILL_SUBMISSION, kill.id, {'kill_confirmation_id': kill.id}) == 0
+    assert PendingNotification.query.count() == 3
+
+
+def test_digest_waits_for_window(players):
+    _submit_kill(players)
+
+    assert collect_due_digests() == []
+
+
+def test_players_with_same_events_share_a_digest(players):
+    first = _submit_kill(players)
+    second = _submit_kill(players)
+    _close_windows()
+
+    digests = collect_due_digests()
+
+    assert len(digests) == 1
+    digest = digests[0]
+    assert digest['event_keys'] == [first.id, second.id]
+    assert sorted(digest['recipients']) == [f'player{index}@example.com' for index in range(3)]
+    assert len(digest['ids']) == 6
+
+
+def test_digest_is_queued_and_marked_sent(app, players):
+    _submit_kill(players)
+    _submit_kill(players)
+    _close_windows()
+
+    assert _send_digests(app) == 1
+
+    email = OutboundEmail.query.one()
+    assert email.subject == 'Senior Assassin - 2 New Kills Need Your Vote'
+    assert sorted(email.get_recipients()) == [f'player{index}@example.com' for index in range(3)]
+    assert PendingNotification.query.filter(PendingNotification.sent_at.is_(None)).count() == 0
+    assert _send_digests(app) == 0
+
+
+def test_decided_kills_are_left_out(app, players):
+    kill = _submit_kill(players)
+    kill.status = 'approved'
+    db.session.commit()
+    _close_windows()
+
+    assert _send_digests(app) == 1
+
+    assert OutboundEmail.query.count() == 0
+    assert PendingNotification.query.filter(PendingNotification.sent_at.is_(None)).count() == 0
+
+
+def test_digest_after_held_events_are_deleted_is_still_sent(app, players):
+    _submit_kill(players)
+    _close_windows()
+    _send_digests(app)
+    first_key = OutboundEmail.query.one().idempotency_key
+
+    # Wiping the game deletes the held events and the database hands out their ids again
+    PendingNotification.query.delete()
+    db.session.commit()
+    _submit_kill(players)
+    _close_windows()
+    assert min(notification.id for notification in PendingNotification.query) == 1
+
+    assert _send_digests(app) == 1
+
+    keys = [email.idempotency_key for email in OutboundEmail.query]
+    assert len(keys) == 2
+    assert first_key in keys
@@ -0,0 +1,228 @@
+import datetime
+import socket
+
+import pytest
+
+from app import create_app
+from app.models import db, ActionLog, OutboundEmail, Player, Team
+from app.services.admin_service import send_mass_email_service
+from app.services.email_service import send_team_elimination_notification
+from app.services.outbox_service import (
+    enqueue_email, enqueue_fan_out, get_mail_workers, process_next_email, resume_outbox, retry_delay
+)
+
+
+@pytest.fixture
+def team(app, no_mail_workers):
+    team = Team(name='Team 1', state='alive')
+    db.session.add(team)
+    db.session.flush()
+    db.session.add_all([
+        Player(name=f'Player {index}', email=f'player{index}@example.com', phone='555-0100', address='1 Main St',
+               team_id=team.id, password_hash='x')
+        for index in range(2)
+    ])
+    db.session.commit()
+    return team
+
+
+def test_team_eliminated_again_in_later_round_is_emailed_again(app, team):
+    with app.test_request_context():
+        team.eliminated_in_round = 1
+        assert send_team_elimination_notification(team.id)
+        # Notifying about the same elimination twice sends one email
+        assert send_team_elimination_notification(team.id)
+
+        # Revived, then eliminated again
+        team.eliminated_in_round = 3
+        assert send_team_elimination_notification(team.id)
+
+    assert sorted(email.idempotency_key for email in OutboundEmail.query) == [
+        f'team_elimination:{team.id}:1', f'team_elimination:{team.id}:3'
+    ]
+
+
+@pytest.fixture
+def mail_app(app, smtp_server, no_mail_workers):
+    """An app whose mail goes to the stand-in SMTP server."""
+    app.config.update(MAIL_SERVER=smtp_server.hostname, MAIL_PORT=smtp_server.port, MAIL_USE_TLS=False,
+                      MAIL_USERNAME=None, MAIL_DEFAULT_SENDER='game@example.com', MAIL_RATE_LIMIT=0,
+                      MAIL_RETRY_BASE_SECONDS=30, MAIL_RETRY_MAX_SECONDS=3600, MAIL_MAX_ATTEMPTS=3)
+    return app
+
+
+def _refuse_recipients(smtp_server):
+    async def handle_RCPT(server, session, envelope, address, rcpt_options):
+        return '550 No such user'
+
+    smtp_server.handler.handle_RCPT = handle_RCPT
+
+
+def _unreachable(app):
+    # A port nothing listens on refuses the connection
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        app.config['MAIL_PORT'] = sock.getsockname()[1]
+    app.extensions.pop('smtp_pool', None)
+
+
+def test_enqueue_email_with_repeated_key_queues_once(app, no_mail_workers):
+    first = enqueue_email('Subject', ['one@example.com'], 'Body', idempotency_key='key')
+    second = enqueue_email('Other subject', ['two@example.com'], 'Other body', idempotency_key='key')
+
+    assert second.id == first.id
+    assert OutboundEmail.query.count() == 1
+    assert OutboundEmail.query.one().subject == 'Subject'
+
+
+def test_enqueue_email_without_key_always_queues(app, no_mail_workers):
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+
+    assert OutboundEmail.query.count() == 2
+
+
+def test_enqueue_fan_out_with_repeated_key_queues_once(app, no_mail_workers):
+    recipients = [f'player{index}@example.com' for index in range(5)]
+
+    assert enqueue_fan_out('Subject', recipients, 'Body', idempotency_key='news') == 1
+    assert enqueue_fan_out('Subject', recipients, 'Body', idempotency_key='news') == 0
+
+    assert [email.idempotency_key for email in OutboundEmail.query] == ['news:0']
+
+
+def test_fan_out_splits_bcc_batches(app, no_mail_workers):
+    app.config.update(MAIL_FANOUT_MODE='bcc', MAIL_BATCH_SIZE=50)
+    recipients = [f'player{index:03}@example.com' for index in range(120)]
+
+    assert enqueue_fan_out('Subject', recipients + recipients[:10] + ['', 'not an address'], 'Body') == 3
+
+    emails = OutboundEmail.query.all()
+    assert sorted(len(email.get_recipients()) for email in emails) == [20, 50, 50]
+    assert sorted(address for email in emails for address in email.get_recipients()) == recipients
+    assert all(email.bcc for email in emails)
+
+
+def test_fan_out_sends_personal_messages(app, no_mail_workers):
+    app.config.update(MAIL_FANOUT_MODE='personal', MAIL_BATCH_SIZE=50)
+    recipients = ['one@example.com', 'two@example.com', 'three@example.com']
+
+    assert enqueue_fan_out('Subject', recipients, 'Body', idempotency_key='news') == 3
+
+    emails = OutboundEmail.query.order_by(OutboundEmail.idempotency_key).all()
+    assert [email.get_recipients() for email in emails] == [['one@example.com'], ['three@example.com'],
+                                                             ['two@example.com']]
+    assert [email.idempotency_key for email in emails] == ['news:0', 'news:1', 'news:2']
+    assert not any(email.bcc for email in emails)
+
+
+def test_bcc_batch_hides_recipients(mail_app, smtp_server):
+    recipients = ['one@example.com', 'two@example.com']
+    enqueue_fan_out('Subject', recipients, 'Body')
+
+    assert process_next_email()
+
+    envelope = smtp_server.handler.messages[0]
+    assert sorted(envelope.rcpt_tos) == recipients
+    assert b'To: undisclosed-recipients:;' in envelope.content
+    assert b'one@example.com' not in envelope.content
+    assert OutboundEmail.query.one().status == 'sent'
+
+
+def test_process_next_email_sends_oldest_due_email(mail_app, smtp_server):
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+
+    assert process_next_email()
+    assert not process_next_email()
+
+    email = OutboundEmail.query.one()
+    assert email.status == 'sent'
+    assert email.sent_at is not None
+    assert email.attempts == 1
+    assert smtp_server.handler.messages[0].rcpt_tos == ['one@example.com']
+
+
+def test_temporary_failure_is_retried_with_backoff(mail_app):
+    _unreachable(mail_app)
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+
+    before = datetime.datetime.utcnow()
+    assert process_next_email()
+
+    email = OutboundEmail.query.one()
+    assert email.status == 'pending'
+    assert email.attempts == 1
+    assert email.last_error
+    assert email.next_attempt_at >= before + datetime.timedelta(seconds=30)
+    # Not due again until the delay has passed
+    assert not process_next_email()
+
+
+def test_email_fails_after_max_attempts(mail_app):
+    _unreachable(mail_app)
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+
+    for attempt in range(3):
+        OutboundEmail.query.update({'next_attempt_at': datetime.datetime.utcnow()})
+        db.session.commit()
+        assert process_next_email()
+
+    email = OutboundEmail.query.one()
+    assert email.status == 'failed'
+    assert email.attempts == 3
+
+
+def test_permanent_failure_is_not_retried(mail_app, smtp_server):
+    _refuse_recipients(smtp_server)
+    enqueue_email('Subject', ['one@example.com'], 'Body')
+
+    assert process_next_email()
+
+    email = OutboundEmail.query.one()
+    assert email.status == 'failed'
+    assert email.attempts == 1
+    assert '550' in email.last_error
+
+
+def test_retry_delay_doubles_up_to_limit(app):
+    app.config.update(MAIL_RETRY_BASE_SECONDS=30, MAIL_RETRY_MAX_SECONDS=100)
+
+    assert [retry_delay(attempts).total_seconds() for attempts in range(1, 5)] == [30, 60, 100, 100]
+
+
+def test_resume_outbox_fails_interrupted_emails(app, monkeypatch):
+    woken = []
+    monkeypatch.setattr('app.services.outbox_service.MailWorkers.wake', lambda self, count=1: woken.append(count))
+    enqueue_email('Interrupted', ['one@example.com'], 'Body')
+    enqueue_email('Waiting', ['two@example.com'], 'Body')
+    OutboundEmail.query.filter_by(subject='Interrupted').update({'status': 'sending'})
+    db.session.commit()
+    woken.clear()
+
+    resume_outbox(app)
+
+    interrupted = OutboundEmail.query.filter_by(subject='Interrupted').one()
+    assert interrupted.status == 'failed'
+    assert 'Interrupted' in interrupted.last_error
+    assert OutboundEmail.query.filter_by(subject='Waiting').one().status == 'pending'
+    assert woken == [1]
+
+
+def test_mail_workers_belong_to_their_app(app, no_mail_workers):
+    other_app = create_app('testing')
+
+    assert get_mail_workers(app) is get_mail_workers(app)
+    assert get_mail_workers(app).app is app
+    assert get_mail_workers(other_app).app is other_app
+
+
+def test_mass_email_is_queued_in_hidden_batches(app, team):
+    success, message = send_mass_email_service('News', 'Hello everyone')
+
+    assert success
+    assert message == 'Email queued for 2 players'
+    email = OutboundEmail.query.one()
+    assert email.bcc
+    assert sorted(email.get_recipients()) == ['player0@example.com', 'player1@example.com']
+    assert ActionLog.query.filter_by(action_type='mass_email').one().description == \
+        'Mass email queued for 2 players: News'
@@ -0,0 +1,226 @@
+import io
+import smtplib
+import socket
+import threading
+import time
+
+import pytest
+
+from app.services.smtp_service import RateLimiter, SMTPPool, _send_file
+
+SENDER = 'game@example.com'
+RECIPIENTS = ['one@example.com', 'two@example.com']
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SMTPPool(smtp_server.hostname, smtp_server.port, use_tls=False, size=2)
+    yield pool
+    pool.close()
+
+
+def _message(body):
+    return (
+        'From: game@example.com\r\n'
+        'To: one@example.com\r\n'
+        'Subject: Test\r\n'
+        '\r\n' + body
+    ).encode()
+
+
+def _wire_data(server, send):
+    """Get the bytes a send puts on the wire after the DATA command."""
+    sent = []
+    original_send = server.send
+
+    def record(data):
+        sent.append(data if isinstance(data, bytes) else data.encode('ascii'))
+        original_send(data)
+
+    server.send = record
+    send()
+    data = b''.join(sent)
+    return data[data.index(b'data\r\n') + len(b'data\r\n'):]
+
+
+def test_connection_is_reused(pool, smtp_server):
+    for i in range(10):
+        pool.send(SENDER, RECIPIENTS, _message(f'Message {i}\r\n'))
+
+    stats = pool.stats()
+    assert stats['connections_opened'] == 1
+    assert stats['messages_sent'] == 10
+    assert stats['idle'] == 1
+    assert len(smtp_server.handler.messages) == 10
+    assert len(smtp_server.handler.sessions) == 1
+
+
+def test_connections_are_capped_at_pool_size(pool, smtp_server):
+    def send_some():
+        for i in range(10):
+            pool.send(SENDER, RECIPIENTS, _message(f'Message {i}\r\n'))
+
+    threads = [threading.Thread(target=send_some) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.stats()['connections_opened'] <= 2
+    assert pool.stats()['open'] <= 2
+    assert len(smtp_server.handler.messages) == 40
+
+
+def test_idle_connection_is_checked_with_noop(pool, smtp_server):
+    pool.noop_after = 0
+    pool.send(SENDER, RECIPIENTS, _message('First\r\n'))
+
+    server = pool._idle[0].server
+    noops = []
+    original_noop = server.noop
+    server.noop = lambda: noops.append(1) or original_noop()
+    time.sleep(0.01)
+    pool.send(SENDER, RECIPIENTS, _message('Second\r\n'))
+
+    assert noops == [1]
+    assert pool.stats()['connections_opened'] == 1
+    assert len(smtp_server.handler.sessions) == 1
+
+
+def test_dead_idle_connection_is_replaced(pool, smtp_server):
+    pool.noop_after = 0
+    pool.send(SENDER, RECIPIENTS, _message('First\r\n'))
+
+    pool._idle[0].server.sock.shutdown(socket.SHUT_RDWR)
+    time.sleep(0.01)
+    pool.send(SENDER, RECIPIENTS, _message('Second\r\n'))
+
+    stats = pool.stats()
+    assert stats['connections_opened'] == 2
+    assert stats['reconnects'] == 0
+    assert stats['open'] == 1
+    assert len(smtp_server.handler.messages) == 2
+    assert len(smtp_server.handler.sessions) == 2
+
+
+def test_connection_dropped_mid_send_is_retried(pool, smtp_server):
+    # Too recently used for a NOOP check, so the drop only shows when sending
+    pool.noop_after = 60
+    pool.send(SENDER, RECIPIENTS, _message('First\r\n'))
+
+    pool._idle[0].server.sock.shutdown(socket.SHUT_RDWR)
+    pool.send(SENDER, RECIPIENTS, _message('Second\r\n'))
+
+    stats = pool.stats()
+    assert stats['connections_opened'] == 2
+    assert stats['reconnects'] == 1
+    assert stats['messages_sent'] == 2
+    assert stats['open'] == 1
+    assert [envelope.content for envelope in smtp_server.handler.messages] == [
+        _message('First\r\n'), _message('Second\r\n')
+    ]
+
+
+def test_long_idle_connection_is_closed(pool, smtp_server):
+    pool.send(SENDER, RECIPIENTS, _message('First\r\n'))
+    pool.idle_timeout = 0
+    time.sleep(0.01)
+    pool.send(SENDER, RECIPIENTS, _message('Second\r\n'))
+
+    assert pool.stats()['connections_opened'] == 2
+    assert pool.stats()['open'] == 1
+
+
+def test_refused_recipients_are_returned(pool, smtp_server):
+    def handle_RCPT(server, session, envelope, address, rcpt_options):
+        if address == 'two@example.com':
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def async_handle_RCPT(*args):
+        return handle_RCPT(*args)
+
+    smtp_server.handler.handle_RCPT = async_handle_RCPT
+    refused = pool.send(SENDER, RECIPIENTS, _message('Hello\r\n'))
+
+    assert refused == {'two@example.com': (550, b'No such user')}
+    assert smtp_server.handler.messages[0].rcpt_tos == ['one@example.com']
+
+
+@pytest.mark.parametrize('body', [
+    'Plain line\r\n',
+    '.Leading dot\r\n..Two dots\r\nMiddle . dot\r\n.\r\n',
+    'No final line ending',
+    '.Dot without final line ending',
+    '',
+])
+def test_send_file_matches_sendmail(smtp_server, body):
+    message = _message(body)
+    server = smtplib.SMTP(smtp_server.hostname, smtp_server.port)
+    try:
+        from_sendmail = _wire_data(server, lambda: server.sendmail(SENDER, RECIPIENTS, message))
+        from_file = _wire_data(server, lambda: _send_file(server, SENDER, RECIPIENTS, io.BytesIO(message)))
+    finally:
+        server.quit()
+
+    assert from_file == from_sendmail
+    assert from_file.endswith(b'\r\n.\r\n')
+    for line in from_file.split(b'\r\n')[:-2]:
+        assert not line.startswith(b'.') or line.startswith(b'..')
+
+    sendmail_envelope, file_envelope = smtp_server.handler.messages
+    assert file_envelope.content == sendmail_envelope.content
+    assert file_envelope.rcpt_tos == RECIPIENTS
+
+
+def test_send_file_streams_large_message(pool, smtp_server, monkeypatch):
+    monkeypatch.setattr('app.services.smtp_service.SEND_BUFFER_SIZE', 1024)
+    body = ''.join(f'.line {i}\r\n' for i in range(2000))
+
+    pool.send(SENDER, RECIPIENTS, io.BytesIO(_message(body)))
+
+    assert smtp_server.handler.messages[0].content == _message(body)
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    returned = []
+    for _ in range(6):
+        limiter.wait()
+        returned.append(time.monotonic())
+
+    # Call k may go no earlier than k intervals after the first
+    for k, at in enumerate(returned):
+        assert at - start >= k * limiter.interval - 0.001
+
+
+def test_rate_limiter_is_shared_between_threads():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    returned = []
+    lock = threading.Lock()
+
+    def wait_some():
+        for _ in range(3):
+            limiter.wait()
+            with lock:
+                returned.append(time.monotonic())
+
+    threads = [threading.Thread(target=wait_some) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for k, at in enumerate(sorted(returned)):
+        assert at - start >= k * limiter.interval - 0.001
+
+
+def test_rate_limiter_without_limit_does_not_wait():
+    limiter = RateLimiter(0)
+    start = time.monotonic()
+    for _ in range(100):
+        limiter.wait()
+    assert time.monotonic() - start < 0.05
@@ -0,0 +1,188 @@
+import io
+import os
+from urllib.parse import urlparse
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.services.storage_service import S3Storage, get_storage
+
+BUCKET = 'game-media'
+REGION = 'us-east-1'
+PREFIX = 'media'
+
+VIDEO_KEY = 'blobs/videos/ab/cd/abcd.mp4'
+PHOTO_KEY = 'blobs/photos/12/34/1234.jpg'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A mocked S3 endpoint holding an empty bucket."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name=REGION)
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def storage(s3):
+    return S3Storage(BUCKET, prefix=f'/{PREFIX}/', region=REGION)
+
+
+def _bucket_keys(s3):
+    return sorted(item['Key'] for item in s3.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def test_put_file_uploads_under_prefix_and_removes_local_file(storage, s3, tmp_path):
+    local_file = tmp_path / 'video.mp4'
+    local_file.write_bytes(b'video bytes')
+
+    storage.put_file(VIDEO_KEY, str(local_file))
+
+    assert not local_file.exists()
+    assert _bucket_keys(s3) == [f'{PREFIX}/{VIDEO_KEY}']
+    assert s3.get_object(Bucket=BUCKET, Key=f'{PREFIX}/{VIDEO_KEY}')['Body'].read() == b'video bytes'
+
+
+def test_put_stream_uploads_contents(storage, s3):
+    storage.put_stream(PHOTO_KEY, io.BytesIO(b'photo bytes'))
+
+    assert s3.get_object(Bucket=BUCKET, Key=f'{PREFIX}/{PHOTO_KEY}')['Body'].read() == b'photo bytes'
+
+
+def test_exists_and_size(storage):
+    assert not storage.exists(VIDEO_KEY)
+
+    storage.put_stream(VIDEO_KEY, io.BytesIO(b'x' * 1234))
+
+    assert storage.exists(VIDEO_KEY)
+    assert storage.size(VIDEO_KEY) == 1234
+
+
+def test_open_streams_contents(storage):
+    contents = bytes(range(256)) * 1024
+    storage.put_stream(VIDEO_KEY, io.BytesIO(contents))
+
+    body = storage.open(VIDEO_KEY)
+    try:
+        assert body.read(1000) + body.read() == contents
+    finally:
+        body.close()
+
+
+def test_local_path_is_none(storage):
+    assert storage.local_path(VIDEO_KEY) is None
+
+
+def test_delete_many_skips_missing_keys(storage, s3, monkeypatch):
+    monkeypatch.setattr('app.services.storage_service.S3_DELETE_BATCH', 2)
+    keys = [f'blobs/videos/00/00/{i}.mp4' for i in range(5)]
+    for key in keys:
+        storage.put_stream(key, io.BytesIO(b'x'))
+    storage.put_stream(PHOTO_KEY, io.BytesIO(b'x'))
+
+    deleted = storage.delete_many(keys + ['blobs/videos/00/00/missing.mp4'])
+
+    # S3 reports deleting a missing key as a success
+    assert deleted == 6
+    assert _bucket_keys(s3) == [f'{PREFIX}/{PHOTO_KEY}']
+
+
+def test_delete_prefix_only_deletes_under_prefix(storage, s3):
+    for i in range(3):
+        storage.put_stream(f'blobs/videos/00/00/{i}.mp4', io.BytesIO(b'x'))
+    storage.put_stream(PHOTO_KEY, io.BytesIO(b'x'))
+    s3.put_object(Bucket=BUCKET, Key='other/blobs/videos/kept.mp4', Body=b'x')
+
+    storage.delete_prefix('blobs/videos/')
+
+    assert _bucket_keys(s3) == [f'{PREFIX}/{PHOTO_KEY}', 'other/blobs/videos/kept.mp4']
+
+
+def test_delete_prefix_pages_through_listing(storage, s3):
+    keys = [f'blobs/videos/00/00/{i}.mp4' for i in range(1005)]
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=f'{PREFIX}/{key}', Body=b'')
+
+    storage.delete_prefix('blobs/')
+
+    assert _bucket_keys(s3) == []
+
+
+def test_presigned_url_points_at_key(storage, s3):
+    storage.put_stream(VIDEO_KEY, io.BytesIO(b'video bytes'))
+
+    url = storage.presigned_url(VIDEO_KEY, 600)
+
+    parsed = urlparse(url)
+    assert BUCKET in parsed.netloc + parsed.path
+    assert parsed.path.endswith(f'{PREFIX}/{VIDEO_KEY}')
+    assert 'Expires=' in parsed.query or 'X-Amz-Expires=600' in parsed.query
+
+
+@pytest.fixture
+def s3_app(app, s3):
+    app.config.update(STORAGE_BACKEND='s3', S3_BUCKET=BUCKET, S3_PREFIX=PREFIX, S3_REGION=REGION,
+                      MEDIA_URL_EXPIRY=600, MEDIA_MAX_AGE=3600)
+    app.extensions.pop('media_storage', None)
+    get_storage().put_stream(VIDEO_KEY, io.BytesIO(b'video bytes'))
+    get_storage().put_stream(PHOTO_KEY, io.BytesIO(b'photo bytes'))
+    return app
+
+
+def test_get_storage_builds_s3_storage_once(s3_app):
+    storage = get_storage()
+
+    assert isinstance(storage, S3Storage)
+    assert storage.bucket == BUCKET
+    assert storage.prefix == f'{PREFIX}/'
+    assert get_storage() is storage
+
+
+def test_media_redirects_to_presigned_url(s3_app, player_client):
+    response = player_client.get(f'/media/{VIDEO_KEY}')
+
+    assert response.status_code == 302
+    location = urlparse(response.headers['Location'])
+    assert location.path.endswith(f'{PREFIX}/{VIDEO_KEY}')
+    assert 'X-Amz-Expires=600' in location.query or 'Expires=' in location.query
+    assert response.cache_control.private
+    # Never cached for longer than half the life of the link
+    assert response.cache_control.max_age == 300
+
+
+def test_media_video_needs_login(s3_app, client):
+    response = client.get(f'/media/{VIDEO_KEY}')
+
+    assert response.status_code == 403
+
+
+def test_media_photo_is_public(s3_app, client):
+    response = client.get(f'/media/{PHOTO_KEY}')
+
+    assert response.status_code == 302
+    assert urlparse(response.headers['Location']).path.endswith(f'{PREFIX}/{PHOTO_KEY}')
+
+
+def test_media_prefers_file_still_in_upload_folder(s3_app, player_client):
+    path = os.path.join(s3_app.config['UPLOAD_FOLDER'], VIDEO_KEY)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'processing')
+
+    response = player_client.get(f'/media/{VIDEO_KEY}')
+
+    assert response.status_code == 200
+    assert response.data == b'processing'
+
+
+def test_presigned_url_uses_custom_endpoint(s3):
+    storage = S3Storage(BUCKET, endpoint_url='http://minio.local:9000', region=REGION)
+
+    url = urlparse(storage.presigned_url(VIDEO_KEY, 600))
+
+    assert url.netloc == 'minio.local:9000'
+    assert url.path == f'/{BUCKET}/{VIDEO_KEY}'
@@ -0,0 +1,51 @@
+import pytest
+
+from app.models import db, GameState, Player, Team
+from app.services.admin_service import toggle_team_state
+from app.services.game_service import get_round_outcomes
+
+
+@pytest.fixture
+def ring(app):
+    """A live first round with teams A -> B -> C -> A and team D already out."""
+    teams = {name: Team(name=name, state='alive') for name in 'ABCD'}
+    db.session.add_all(teams.values())
+    db.session.flush()
+    for name, team in teams.items():
+        db.session.add(Player(name=f'{name} Player', email=f'{name.lower()}@example.com', phone='555-0100',
+                              address='1 Main St', team_id=team.id, password_hash='x'))
+    teams['A'].target_id = teams['B'].id
+    teams['B'].target_id = teams['C'].id
+    teams['C'].target_id = teams['A'].id
+    teams['D'].state = 'dead'
+    for player in teams['D'].players:
+        player.state = 'dead'
+    game_state = GameState.query.first()
+    game_state.state = 'live'
+    game_state.round_number = 1
+    db.session.commit()
+    return teams
+
+
+def _names(outcome, teams):
+    return sorted(name for name, team in teams.items() if (team.id, team.name) in outcome)
+
+
+def test_revived_team_joins_ring(ring):
+    toggle_team_state(ring['D'].id)
+
+    targets = {team.target_id for team in ring.values()}
+    assert targets == {team.id for team in ring.values()}
+    assert all(team.target_id != team.id for team in ring.values())
+
+
+def test_team_whose_target_moved_to_revived_team_is_not_eliminated(ring):
+    toggle_team_state(ring['D'].id)
+    anchor = next(name for name, team in ring.items() if team.target_id == ring['D'].id)
+
+    teams_to_revive, teams_to_eliminate = get_round_outcomes(1)
+
+    # The anchor lost its target partway through the round, nobody else killed anything
+    assert _names(teams_to_revive, ring) == [anchor]
+    assert _names(teams_to_eliminate, ring) == sorted(set('ABCD') - {anchor})
+    assert ring[anchor].target_cleared_round == 1